@@ -8,6 +8,8 @@ from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
 import google.generativeai as genai
 
+from .transcript_compactor import TranscriptCompactor, CallTranscript, Utterance
+
 logger = logging.getLogger(__name__)
 
 class DiaryGenerator:
@@ -29,6 +31,9 @@ class DiaryGenerator:
         # Gemini APIの設定
         genai.configure(api_key=self.api_key)
         self.model = genai.GenerativeModel('gemini-1.5-flash')
+        # 会話履歴部分に割り当てるトークン数
+        self.compactor = TranscriptCompactor(
+            token_budget=int(os.environ.get("DIARY_PROMPT_TOKEN_BUDGET", "4000")))
         logger.info("Gemini client initialized successfully")
     
     def generate_diary_entry(
@@ -134,7 +139,7 @@ class DiaryGenerator:
                 logger.warning("会話履歴が見つかりません")
                 return ""
             
-            formatted_lines = []
+            utterances = []
             for conv in conversations:
                 if isinstance(conv, dict):
                     # Firestoreの実際の構造: speaker, message フィールド
@@ -142,22 +147,33 @@ class DiaryGenerator:
                     message = conv.get('message', '')
                     
                     if speaker and message:
-                        speaker_label = 'AI' if speaker.lower() in ['ai', 'assistant'] else 'ユーザー'
-                        formatted_lines.append(f"{speaker_label}: {message}")
+                        role = 'assistant' if speaker.lower() in ['ai', 'assistant'] else 'user'
+                        utterances.append(Utterance(role, message))
                     
                     # 旧形式のサポート: role, text フィールド
                     elif 'role' in conv and 'text' in conv:
-                        role = conv.get('role', '')
-                        text = conv.get('text', '')
-                        role_label = 'AI' if role == 'assistant' else 'ユーザー'
-                        formatted_lines.append(f"{role_label}: {text}")
+                        role = 'assistant' if conv.get('role', '') == 'assistant' else 'user'
+                        utterances.append(Utterance(role, conv.get('text', '')))
                     
                     # messageのみの場合
                     elif message:
-                        formatted_lines.append(message)
+                        utterances.append(Utterance('', message))
                         
                 elif isinstance(conv, str):
-                    formatted_lines.append(conv)
+                    utterances.append(Utterance('', conv))
+            
+            # トークン予算内に圧縮（長時間の通話はフィラー除去・中間省略）
+            call_id = nested_history.get('callID') or conversation_history.get('callID') or ''
+            compacted = self.compactor.compact([CallTranscript(call_id, None, utterances)])
+            
+            formatted_lines = []
+            for call in compacted:
+                for u in call.utterances:
+                    if u.speaker == 'system' or not u.speaker:
+                        formatted_lines.append(u.text)
+                    else:
+                        speaker_label = 'AI' if u.speaker == 'assistant' else 'ユーザー'
+                        formatted_lines.append(f"{speaker_label}: {u.text}")
             
             if not formatted_lines:
                 logger.warning("フォーマット可能な会話データが見つかりません")
@@ -4,9 +4,15 @@ users/{userID}/calls/{callID} 形式
 """
 import os
 import json
+import base64
 from datetime import datetime
 from google.cloud import firestore
-from typing import Dict, Optional, Tuple, Any
+from typing import Dict, Iterator, List, Optional, Tuple, Any
+
+from .transcript_codec import to_conversation
+
+# 1ページあたりの最大件数
+MAX_PAGE_SIZE = 100
 
 class SubcollectionConversationHistoryService:
     """
@@ -19,6 +25,8 @@ class SubcollectionConversationHistoryService:
         """
         project_id = os.environ.get('GOOGLE_CLOUD_PROJECT', 'univac-aiagent')
         self.db = firestore.Client(project=project_id)
+        # 通話履歴の並び順に使うフィールド
+        self.order_field = os.environ.get('CALL_HISTORY_ORDER_FIELD', 'timestamp')
     
     def get_user_info(self, user_id: str) -> Tuple[bool, Optional[Dict], str]:
         """
@@ -65,6 +73,8 @@ class SubcollectionConversationHistoryService:
                 return False, None, "CONVERSATION_NOT_FOUND"
             
             call_data = call_doc.to_dict()
+            # 発信サービスの発言記録（v1/v2）を conversation 形式に変換
+            call_data['conversation'] = to_conversation(call_data)
             
             return True, call_data, "SUCCESS"
             
@@ -128,6 +138,9 @@ class SubcollectionConversationHistoryService:
         """
         指定ユーザーのすべての会話履歴を取得
         
+        全件を1つのレスポンスに含めるため、履歴が多いユーザーには
+        get_user_calls_page（ページング）または iter_user_calls（逐次処理）を使用する
+        
         Args:
             user_id (str): ユーザーID
             
@@ -140,16 +153,8 @@ class SubcollectionConversationHistoryService:
             if not user_success:
                 return False, None, user_error
             
-            # calls サブコレクション内のすべてのドキュメントを取得
-            user_ref = self.db.collection('users').document(user_id)
-            calls_ref = user_ref.collection('calls')
-            calls_docs = calls_ref.order_by('timestamp', direction=firestore.Query.DESCENDING).get()
-            
-            calls_list = []
-            for call_doc in calls_docs:
-                call_data = call_doc.to_dict()
-                call_data['callID'] = call_doc.id  # ドキュメントIDも含める
-                calls_list.append(call_data)
+            # calls サブコレクション内のすべてのドキュメントをページ単位で取得
+            calls_list = list(self.iter_user_calls(user_id))
             
             response_data = {
                 "user_info": {
@@ -167,6 +172,126 @@ class SubcollectionConversationHistoryService:
             print(f"全会話履歴取得エラー: {str(e)}")
             return False, None, "INTERNAL_ERROR"
 
+    @staticmethod
+    def encode_cursor(call_id: str) -> str:
+        """ページカーソルを生成（最後に返した通話のドキュメントID）"""
+        return base64.urlsafe_b64encode(call_id.encode('utf-8')).decode('ascii')
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> str:
+        """ページカーソルから通話のドキュメントIDを取得"""
+        return base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    
+    def _calls_query(self, user_id: str, fields: Optional[List[str]] = None):
+        """通話履歴のクエリ（新しい順）を作成"""
+        calls_ref = self.db.collection('users').document(user_id).collection('calls')
+        query = calls_ref.order_by(self.order_field, direction=firestore.Query.DESCENDING)
+        if fields:
+            # start_after(前ページの最後のドキュメント) には並び順フィールドの値が必要なため常に取得する
+            projection = list(dict.fromkeys([*fields, self.order_field]))
+            # v2 の発言記録を conversation 形式に変換するには版数と通話開始時刻も必要
+            if 'messages' in fields:
+                projection += [f for f in ('schema_version', 'call_started_at') if f not in projection]
+            query = query.select(projection)
+        return query
+    
+    @staticmethod
+    def _to_call_dict(call_doc) -> Dict[str, Any]:
+        call_data = call_doc.to_dict()
+        call_data['callID'] = call_doc.id  # ドキュメントIDも含める
+        # 発言記録（v1/v2）を取得した場合は conversation 形式に変換（fieldsで除外した場合は付けない）
+        if any(key in call_data for key in ('conversation', 'messages', 'transcriptions')):
+            call_data['conversation'] = to_conversation(call_data)
+        return call_data
+    
+    def get_user_calls_page(self, user_id: str, page_size: int = 20, cursor: Optional[str] = None,
+                            fields: Optional[List[str]] = None) -> Tuple[bool, Optional[Dict], str]:
+        """
+        指定ユーザーの会話履歴を1ページ分取得（カーソルベースのページング）
+        
+        Args:
+            user_id (str): ユーザーID
+            page_size (int): 1ページの件数（最大MAX_PAGE_SIZE）
+            cursor (Optional[str]): 前ページのレスポンスのnext_cursor（先頭ページはNone）
+            fields (Optional[List[str]]): 取得するフィールド（Noneの場合はすべて）
+            
+        Returns:
+            Tuple[bool, Optional[Dict], str]: (成功フラグ, ページデータ, エラーコード)
+        """
+        try:
+            if page_size < 1 or page_size > MAX_PAGE_SIZE:
+                return False, None, "INVALID_PAGE_SIZE"
+            
+            query = self._calls_query(user_id, fields)
+            
+            if cursor:
+                try:
+                    last_call_id = self.decode_cursor(cursor)
+                except Exception:
+                    return False, None, "INVALID_CURSOR"
+                
+                # カーソル位置の並び順フィールドのみを読み取って続きから取得
+                last_doc = (self.db.collection('users').document(user_id)
+                            .collection('calls').document(last_call_id)
+                            .get(field_paths=[self.order_field]))
+                if not last_doc.exists:
+                    return False, None, "INVALID_CURSOR"
+                query = query.start_after(last_doc)
+            else:
+                # 先頭ページのみユーザー存在確認
+                user_success, _, user_error = self.get_user_info(user_id)
+                if not user_success:
+                    return False, None, user_error
+            
+            # 次ページの有無を判定するため1件多く取得
+            call_docs = list(query.limit(page_size + 1).stream())
+            has_more = len(call_docs) > page_size
+            call_docs = call_docs[:page_size]
+            
+            calls_list = [self._to_call_dict(call_doc) for call_doc in call_docs]
+            next_cursor = self.encode_cursor(call_docs[-1].id) if has_more and call_docs else None
+            
+            response_data = {
+                "calls": calls_list,
+                "page_size": page_size,
+                "next_cursor": next_cursor,
+                "retrieved_at": datetime.now().isoformat()
+            }
+            
+            return True, response_data, "SUCCESS"
+            
+        except Exception as e:
+            print(f"会話履歴ページ取得エラー: {str(e)}")
+            return False, None, "INTERNAL_ERROR"
+    
+    def iter_user_calls(self, user_id: str, page_size: int = 50,
+                        fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        指定ユーザーの会話履歴を新しい順に1件ずつ返すイテレーター
+        
+        ページ単位で取得するため、履歴の件数にかかわらずメモリ使用量は1ページ分で一定
+        
+        Args:
+            user_id (str): ユーザーID
+            page_size (int): 1回の取得件数
+            fields (Optional[List[str]]): 取得するフィールド（Noneの場合はすべて）
+            
+        Yields:
+            Dict[str, Any]: 会話データ（callIDを含む）
+        """
+        query = self._calls_query(user_id, fields)
+        last_doc = None
+        while True:
+            page_query = query.start_after(last_doc) if last_doc is not None else query
+            call_docs = list(page_query.limit(page_size).stream())
+            for call_doc in call_docs:
+                yield self._to_call_dict(call_doc)
+            
+            if len(call_docs) < page_size:
+                return
+            last_doc = call_docs[-1]
+    
+
 def test_subcollection_service():
     """
     サブコレクション構造対応サービスのテスト
@@ -0,0 +1,51 @@
+"""
+通話ドキュメントの発言記録の読み取り
+
+発信サービス（anpi-call-twilio-outbound）が保存する発言記録を、日記生成で使う
+conversation 形式（[{speaker, message, timestamp}]）に変換する。
+
+- v2（schema_version = 2）: messages = [{s: 話者コード, t: テキスト, o: 通話開始からの経過ミリ秒}]
+- v1: transcriptions = [{speaker, text, timestamp, call_sid, user_id}]
+"""
+
+from datetime import timedelta
+from typing import Any, Dict, List
+
+SPEAKER_NAMES = {"u": "user", "a": "assistant"}
+
+
+def to_conversation(call_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    通話ドキュメントから conversation 形式の発言リストを生成
+
+    Args:
+        call_data (Dict[str, Any]): 通話ドキュメントのデータ
+
+    Returns:
+        List[Dict[str, Any]]: [{speaker, message, timestamp}]（発言記録がない場合は空）
+    """
+    if call_data.get('conversation'):
+        return call_data['conversation']
+
+    if call_data.get('schema_version', 1) >= 2:
+        call_started_at = call_data.get('call_started_at')
+        conversation = []
+        for msg in call_data.get('messages', []):
+            timestamp = None
+            if call_started_at is not None:
+                timestamp = call_started_at + timedelta(milliseconds=msg.get('o', 0))
+            conversation.append({
+                'speaker': SPEAKER_NAMES.get(msg.get('s'), msg.get('s')),
+                'message': msg.get('t', ''),
+                'timestamp': timestamp
+            })
+        return conversation
+
+    return [
+        {
+            'speaker': msg.get('speaker'),
+            'message': msg.get('text', ''),
+            'timestamp': msg.get('timestamp')
+        }
+        for msg in call_data.get('transcriptions', [])
+    ]
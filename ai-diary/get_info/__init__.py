@@ -4,7 +4,7 @@ AI Diary Get Info Package
 このパッケージにはユーザー情報取得に関する処理が含まれています。
 """
 
-from .user_service import get_user_info
+from .user_service import get_user_info, get_users_info
 from .db_connection import test_connection
 
-__all__ = ['get_user_info', 'test_connection'] 
\ No newline at end of file
+__all__ = ['get_user_info', 'get_users_info', 'test_connection'] 
\ No newline at end of file
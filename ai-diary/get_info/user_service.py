@@ -1,16 +1,8 @@
+import os
 from .db_connection import get_db_connection
 from mysql.connector import Error
 
-def get_user_info(user_id):
-    """userIDをもとにユーザー情報を取得する"""
-    connection = None
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        # ユーザー情報を取得
-        query = """
-        SELECT 
+USER_COLUMNS = """
             user_id,
             last_name,
             first_name,
@@ -26,26 +18,48 @@ def get_user_info(user_id):
             birth_date,
             call_time,
             call_weekday,
+            call_weekdays_mask,
             created_at,
             updated_at
-        FROM users 
-        WHERE user_id = %s
-        """
+"""
+
+# call_weekdays_mask のビット順（月=1, 火=2, 水=4, 木=8, 金=16, 土=32, 日=64）
+WEEKDAY_CODES = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+# 一括取得で1クエリのIN句に含めるID数
+USERS_CHUNK_SIZE = int(os.environ.get('USER_LOOKUP_CHUNK_SIZE', '500'))
+
+def _to_user_info(user_info):
+    """usersテーブルの行をレスポンス用の辞書に変換（日時型を文字列に変換）"""
+    if user_info.get('birth_date'):
+        user_info['birth_date'] = user_info['birth_date'].strftime('%Y-%m-%d')
+    if user_info.get('call_time'):
+        user_info['call_time'] = str(user_info['call_time'])
+    mask = user_info.pop('call_weekdays_mask', None) or 0
+    user_info['call_weekdays'] = [code for i, code in enumerate(WEEKDAY_CODES) if mask & (1 << i)]
+    # 曜日マスクのみ設定された利用者は call_weekday が NULL のため、マスクの最初の曜日で補う
+    if not user_info.get('call_weekday') and user_info['call_weekdays']:
+        user_info['call_weekday'] = user_info['call_weekdays'][0]
+    if user_info.get('created_at'):
+        user_info['created_at'] = user_info['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+    if user_info.get('updated_at'):
+        user_info['updated_at'] = user_info['updated_at'].strftime('%Y-%m-%d %H:%M:%S')
+    return user_info
+
+def get_user_info(user_id):
+    """userIDをもとにユーザー情報を取得する"""
+    connection = None
+    try:
+        connection = get_db_connection()
+        cursor = connection.cursor(dictionary=True)
+        
+        # ユーザー情報を取得
+        query = f"SELECT {USER_COLUMNS} FROM users WHERE user_id = %s"
         cursor.execute(query, (user_id,))
         user_info = cursor.fetchone()
         
         if user_info:
-            # 日時型を文字列に変換
-            if user_info.get('birth_date'):
-                user_info['birth_date'] = user_info['birth_date'].strftime('%Y-%m-%d')
-            if user_info.get('call_time'):
-                user_info['call_time'] = str(user_info['call_time'])
-            if user_info.get('created_at'):
-                user_info['created_at'] = user_info['created_at'].strftime('%Y-%m-%d %H:%M:%S')
-            if user_info.get('updated_at'):
-                user_info['updated_at'] = user_info['updated_at'].strftime('%Y-%m-%d %H:%M:%S')
-            
-            return user_info
+            return _to_user_info(user_info)
         else:
             return None
             
@@ -57,6 +71,47 @@ def get_user_info(user_id):
             cursor.close()
             connection.close()
 
+def get_users_info(user_ids, chunk_size=None):
+    """
+    複数のuserIDのユーザー情報を1つの接続でまとめて取得する
+    
+    IN句をchunk_size件ずつに分割するため、N件の取得にかかるクエリ数はN/chunk_size回
+    
+    Args:
+        user_ids: ユーザーIDのリスト（重複は除外）
+        chunk_size: 1クエリあたりのID数（デフォルト: 環境変数USER_LOOKUP_CHUNK_SIZE）
+        
+    Returns:
+        dict: ユーザーIDをキーとするユーザー情報（見つからないIDは含まない）。エラー時はNone
+    """
+    chunk_size = chunk_size or USERS_CHUNK_SIZE
+    unique_ids = list(dict.fromkeys(user_ids))
+    users = {}
+    if not unique_ids:
+        return users
+    
+    connection = None
+    try:
+        connection = get_db_connection()
+        cursor = connection.cursor(dictionary=True)
+        
+        for start in range(0, len(unique_ids), chunk_size):
+            chunk = unique_ids[start:start + chunk_size]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"SELECT {USER_COLUMNS} FROM users WHERE user_id IN ({placeholders})", tuple(chunk))
+            for user_info in cursor.fetchall():
+                users[user_info['user_id']] = _to_user_info(user_info)
+        
+        return users
+        
+    except Error as e:
+        print(f"ユーザー情報一括取得エラー: エラーコード={getattr(e, 'errno', 'N/A')}")
+        return None
+    finally:
+        if connection and connection.is_connected():
+            cursor.close()
+            connection.close()
+
 def test_get_user():
     """ユーザー情報取得のテスト"""
     # テスト用のダミーID（実際のIDに置き換えてテスト）
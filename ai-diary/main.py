@@ -27,6 +27,40 @@ def test_db_connection():
     except Exception as e:
         return {"status": "error", "message": f"Database test failed: {type(e).__name__}"}, 500
 
+@app.route("/users/<user_id>/calls", methods=["GET"])
+def list_user_calls_endpoint(user_id):
+    """会話履歴一覧API（カーソルベースのページング）"""
+    try:
+        try:
+            page_size = int(request.args.get("page_size", 20))
+        except ValueError:
+            return {"status": "error", "message": "page_size must be an integer"}, 400
+        cursor = request.args.get("cursor") or None
+        fields = [f.strip() for f in request.args.get("fields", "").split(",") if f.strip()] or None
+        
+        service = SubcollectionConversationHistoryService()
+        success, page_data, error_code = service.get_user_calls_page(user_id, page_size, cursor, fields)
+        if not success:
+            if error_code in ("INVALID_PAGE_SIZE", "INVALID_CURSOR"):
+                return {"status": "error", "message": f"Bad request: {error_code}"}, 400
+            if error_code == "USER_NOT_FOUND":
+                return {"status": "error", "message": "User not found"}, 404
+            return {"status": "error", "message": f"Failed to get calls: {error_code}"}, 500
+        
+        return {
+            "status": "success",
+            "data": {
+                "userID": user_id,
+                "calls": page_data["calls"],
+                "pageSize": page_data["page_size"],
+                "nextCursor": page_data["next_cursor"]
+            },
+            "message": "Calls retrieved"
+        }
+        
+    except Exception as e:
+        return {"status": "error", "message": f"Internal error: {type(e).__name__}"}, 500
+
 @app.route("/generate-diary", methods=["POST"])
 def generate_diary_endpoint():
     """日記生成API"""
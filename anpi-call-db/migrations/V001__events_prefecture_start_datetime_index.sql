@@ -0,0 +1,8 @@
+-- Migration V001: events の都道府県・開始日時の複合インデックス
+-- Cloud SQL for MySQL 8.4
+-- 対象クエリ: CloudSQLEventRepository.get_upcoming_events_by_prefecture など
+--   WHERE prefecture = ? AND start_datetime BETWEEN ? AND ? ORDER BY start_datetime LIMIT ?
+-- 等価条件の prefecture を先頭、範囲条件とソートに使う start_datetime を後ろに置く
+
+CREATE INDEX idx_events_prefecture_start_datetime
+  ON events (prefecture, start_datetime);
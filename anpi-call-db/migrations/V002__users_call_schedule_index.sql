@@ -0,0 +1,8 @@
+-- Migration V002: users の電話希望曜日・時刻の複合インデックス
+-- Cloud SQL for MySQL 8.4
+-- 対象クエリ: 通話スケジューラーの発信対象ユーザー抽出
+--   WHERE call_weekday = ? AND call_time BETWEEN ? AND ?
+-- 等価条件の call_weekday を先頭、範囲条件の call_time を後ろに置く
+
+CREATE INDEX idx_users_call_weekday_call_time
+  ON users (call_weekday, call_time);
@@ -0,0 +1,67 @@
+-- Migration V003: 発信タイムテーブル（call_timetable）とスケジューラーの処理位置（scheduler_state）
+-- Cloud SQL for MySQL 8.4
+-- 対象クエリ: 通話スケジューラー（timetableモード）の毎分の発信対象抽出
+--   SELECT ... FROM call_timetable JOIN users USING (user_id) WHERE slot_of_week BETWEEN ? AND ?
+--
+-- slot_of_week は週の中の分（月曜 00:00 = 0 〜 日曜 23:59 = 10079）。
+-- users の call_weekday / call_time からトリガーで常に同期するため、アプリ側での更新は不要。
+-- 注意: バイナリログが有効なCloud SQLでトリガーを作成するには、
+--       データベースフラグ log_bin_trust_function_creators=on が必要
+
+CREATE TABLE call_timetable (
+  user_id      CHAR(36)          NOT NULL COMMENT '利用者ID',
+  slot_of_week SMALLINT UNSIGNED NOT NULL COMMENT '発信スロット（週の中の分、月曜00:00=0）',
+  updated_at   TIMESTAMP         NOT NULL
+                    DEFAULT CURRENT_TIMESTAMP
+                    ON UPDATE CURRENT_TIMESTAMP
+                    COMMENT '更新日時（自動）',
+  PRIMARY KEY (user_id),
+  INDEX idx_call_timetable_slot (slot_of_week),
+  CONSTRAINT fk_call_timetable_user FOREIGN KEY (user_id)
+    REFERENCES users (user_id) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB
+  DEFAULT CHARSET=utf8mb4
+  COMMENT='発信タイムテーブル（usersからトリガーで同期）';
+
+CREATE TABLE scheduler_state (
+  name         VARCHAR(64) NOT NULL COMMENT 'スケジューラー名',
+  last_slot_at DATETIME    NOT NULL COMMENT '処理済みの最後の分',
+  updated_at   TIMESTAMP   NOT NULL
+                    DEFAULT CURRENT_TIMESTAMP
+                    ON UPDATE CURRENT_TIMESTAMP
+                    COMMENT '更新日時（自動）',
+  PRIMARY KEY (name)
+) ENGINE=InnoDB
+  DEFAULT CHARSET=utf8mb4
+  COMMENT='スケジューラーの処理位置';
+
+-- 既存ユーザーの取り込み
+INSERT INTO call_timetable (user_id, slot_of_week)
+SELECT user_id,
+       (FIELD(call_weekday, 'mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun') - 1) * 1440
+         + HOUR(call_time) * 60 + MINUTE(call_time)
+  FROM users
+ WHERE call_time IS NOT NULL AND call_weekday IS NOT NULL;
+
+-- users の変更をタイムテーブルに反映（削除・user_idの変更は外部キーで連動）
+CREATE TRIGGER trg_users_call_timetable_insert AFTER INSERT ON users FOR EACH ROW
+  REPLACE INTO call_timetable (user_id, slot_of_week)
+  SELECT NEW.user_id,
+         (FIELD(NEW.call_weekday, 'mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun') - 1) * 1440
+           + HOUR(NEW.call_time) * 60 + MINUTE(NEW.call_time)
+    FROM DUAL
+   WHERE NEW.call_time IS NOT NULL AND NEW.call_weekday IS NOT NULL;
+
+CREATE TRIGGER trg_users_call_timetable_update AFTER UPDATE ON users FOR EACH ROW
+  REPLACE INTO call_timetable (user_id, slot_of_week)
+  SELECT NEW.user_id,
+         (FIELD(NEW.call_weekday, 'mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun') - 1) * 1440
+           + HOUR(NEW.call_time) * 60 + MINUTE(NEW.call_time)
+    FROM DUAL
+   WHERE NEW.call_time IS NOT NULL AND NEW.call_weekday IS NOT NULL
+     AND (NOT (OLD.call_time <=> NEW.call_time) OR NOT (OLD.call_weekday <=> NEW.call_weekday));
+
+CREATE TRIGGER trg_users_call_timetable_unschedule AFTER UPDATE ON users FOR EACH ROW
+  DELETE FROM call_timetable
+   WHERE user_id = NEW.user_id
+     AND (NEW.call_time IS NULL OR NEW.call_weekday IS NULL);
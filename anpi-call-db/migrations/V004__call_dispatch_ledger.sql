@@ -0,0 +1,30 @@
+-- Migration V004: 発信台帳（call_dispatch_ledger）
+-- Cloud SQL for MySQL 8.4
+-- 通話スケジューラーが (利用者, 発信予定の分) ごとに1回だけタスクを登録するための台帳
+--   INSERT IGNORE INTO call_dispatch_ledger (user_id, scheduled_at, ...) で確保し、
+--   挿入できた実行（またはfailed・期限切れのclaimedを更新できた実行）だけがタスクを登録する
+-- 実行の重複・再試行・並列実行があっても同じ利用者に二重に発信しない
+
+CREATE TABLE call_dispatch_ledger (
+  user_id      CHAR(36)      NOT NULL COMMENT '利用者ID',
+  scheduled_at DATETIME      NOT NULL COMMENT '発信予定日時（分単位）',
+  status       ENUM('claimed','enqueued','failed')
+                    NOT NULL DEFAULT 'claimed'
+                    COMMENT '状態（claimed: 登録中, enqueued: 登録済み, failed: 登録失敗）',
+  task_name    VARCHAR(500)           COMMENT 'Cloud Tasksのタスク名',
+  attempts     INT UNSIGNED  NOT NULL DEFAULT 1 COMMENT '登録の試行回数',
+  last_error   VARCHAR(1000)          COMMENT '最後のエラー内容',
+  claimed_at   TIMESTAMP     NOT NULL
+                    DEFAULT CURRENT_TIMESTAMP
+                    COMMENT '確保日時',
+  updated_at   TIMESTAMP     NOT NULL
+                    DEFAULT CURRENT_TIMESTAMP
+                    ON UPDATE CURRENT_TIMESTAMP
+                    COMMENT '更新日時（自動）',
+  PRIMARY KEY (user_id, scheduled_at),
+  INDEX idx_call_dispatch_ledger_scheduled_at (scheduled_at),
+  CONSTRAINT fk_call_dispatch_ledger_user FOREIGN KEY (user_id)
+    REFERENCES users (user_id) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB
+  DEFAULT CHARSET=utf8mb4
+  COMMENT='発信台帳（利用者・発信予定ごとのタスク登録状況）';
@@ -0,0 +1,84 @@
+-- Migration V005: 電話希望曜日の複数指定（call_weekdays_mask）
+-- Cloud SQL for MySQL 8.4
+-- 電話希望曜日を曜日ごとのビットの組み合わせで保持する（月=1, 火=2, 水=4, 木=8, 金=16, 土=32, 日=64、毎日=127）
+-- 対象クエリ: 通話スケジューラーの発信対象ユーザー抽出
+--   WHERE call_time BETWEEN ? AND ? AND call_weekdays_mask & ? <> 0
+-- 時刻の範囲条件でインデックスを引き、曜日の判定はインデックス内の call_weekdays_mask で行う
+-- （曜日の指定が増えても、読み取る範囲は実行対象範囲の時刻に設定したユーザーだけ）
+--
+-- call_weekday（ENUM）は既存の登録処理のために残し、変更時はトリガーで call_weekdays_mask に反映する
+-- call_timetable はユーザー・曜日ごとに1行（主キーを (user_id, slot_of_week) に変更）
+-- 注意: バイナリログが有効なCloud SQLでトリガーを作成するには、
+--       データベースフラグ log_bin_trust_function_creators=on が必要
+
+ALTER TABLE users
+  ADD COLUMN call_weekdays_mask TINYINT UNSIGNED DEFAULT NULL
+    COMMENT '電話希望曜日（ビットマスク: 月=1, 火=2, 水=4, 木=8, 金=16, 土=32, 日=64）'
+    AFTER call_weekday;
+
+UPDATE users
+   SET call_weekdays_mask = 1 << (FIELD(call_weekday, 'mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun') - 1)
+ WHERE call_weekday IS NOT NULL;
+
+CREATE INDEX idx_users_call_time_weekdays
+  ON users (call_time, call_weekdays_mask);
+
+-- V002 の (call_weekday, call_time) はスケジューラーで使用しなくなったため削除
+DROP INDEX idx_users_call_weekday_call_time ON users;
+
+-- call_weekday だけを更新する既存の処理のために、ENUMの変更を call_weekdays_mask に反映
+CREATE TRIGGER trg_users_call_weekdays_mask_insert BEFORE INSERT ON users FOR EACH ROW
+  SET NEW.call_weekdays_mask = IF(
+    NEW.call_weekdays_mask IS NULL AND NEW.call_weekday IS NOT NULL,
+    1 << (FIELD(NEW.call_weekday, 'mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun') - 1),
+    NEW.call_weekdays_mask
+  );
+
+CREATE TRIGGER trg_users_call_weekdays_mask_update BEFORE UPDATE ON users FOR EACH ROW
+  SET NEW.call_weekdays_mask = IF(
+    NOT (OLD.call_weekday <=> NEW.call_weekday) AND OLD.call_weekdays_mask <=> NEW.call_weekdays_mask,
+    IF(NEW.call_weekday IS NULL, NULL,
+       1 << (FIELD(NEW.call_weekday, 'mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun') - 1)),
+    NEW.call_weekdays_mask
+  );
+
+-- 発信タイムテーブルをユーザー・曜日ごとの行に変更
+DROP TRIGGER trg_users_call_timetable_insert;
+DROP TRIGGER trg_users_call_timetable_update;
+DROP TRIGGER trg_users_call_timetable_unschedule;
+
+ALTER TABLE call_timetable
+  DROP PRIMARY KEY,
+  ADD PRIMARY KEY (user_id, slot_of_week);
+
+DELETE FROM call_timetable;
+
+INSERT INTO call_timetable (user_id, slot_of_week)
+SELECT u.user_id, d.n * 1440 + HOUR(u.call_time) * 60 + MINUTE(u.call_time)
+  FROM users u
+  JOIN (SELECT 0 AS n UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3
+        UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6) d
+    ON u.call_weekdays_mask & (1 << d.n)
+ WHERE u.call_time IS NOT NULL;
+
+CREATE TRIGGER trg_users_call_timetable_insert AFTER INSERT ON users FOR EACH ROW
+  INSERT INTO call_timetable (user_id, slot_of_week)
+  SELECT NEW.user_id, d.n * 1440 + HOUR(NEW.call_time) * 60 + MINUTE(NEW.call_time)
+    FROM (SELECT 0 AS n UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3
+          UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6) d
+   WHERE NEW.call_time IS NOT NULL AND NEW.call_weekdays_mask & (1 << d.n);
+
+-- 変更時は既存のスロットを削除してから（clear）、新しい曜日・時刻のスロットを追加する（update）
+CREATE TRIGGER trg_users_call_timetable_clear AFTER UPDATE ON users FOR EACH ROW
+  DELETE FROM call_timetable
+   WHERE user_id = NEW.user_id
+     AND (NOT (OLD.call_time <=> NEW.call_time) OR NOT (OLD.call_weekdays_mask <=> NEW.call_weekdays_mask));
+
+CREATE TRIGGER trg_users_call_timetable_update AFTER UPDATE ON users FOR EACH ROW
+  FOLLOWS trg_users_call_timetable_clear
+  INSERT INTO call_timetable (user_id, slot_of_week)
+  SELECT NEW.user_id, d.n * 1440 + HOUR(NEW.call_time) * 60 + MINUTE(NEW.call_time)
+    FROM (SELECT 0 AS n UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3
+          UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6) d
+   WHERE NEW.call_time IS NOT NULL AND NEW.call_weekdays_mask & (1 << d.n)
+     AND (NOT (OLD.call_time <=> NEW.call_time) OR NOT (OLD.call_weekdays_mask <=> NEW.call_weekdays_mask));
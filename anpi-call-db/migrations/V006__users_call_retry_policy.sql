@@ -0,0 +1,19 @@
+-- Migration V006: 利用者ごとの再発信ポリシー
+-- Cloud SQL for MySQL 8.4
+-- 発信に失敗した場合・応答がなかった場合（busy / no-answer / failed）の再発信の設定
+-- 通話スケジューラーがタスク登録時に読み込み、タスクAPI（anpi-cloud-run）が再発信タスクを遅延実行で登録する
+-- NULL のカラムはタスクAPIの環境変数のデフォルト（CALL_RETRY_* / CALL_QUIET_HOURS_*）を使う
+
+ALTER TABLE users
+  ADD COLUMN call_retry_max_attempts TINYINT UNSIGNED DEFAULT NULL
+    COMMENT '最大発信回数（初回を含む。1 = 再発信しない）'
+    AFTER call_weekdays_mask,
+  ADD COLUMN call_retry_interval_minutes SMALLINT UNSIGNED DEFAULT NULL
+    COMMENT '最初の再発信までの間隔（分）。以降は倍々に延ばす'
+    AFTER call_retry_max_attempts,
+  ADD COLUMN call_quiet_start TIME DEFAULT NULL
+    COMMENT '再発信しない時間帯の開始時刻'
+    AFTER call_retry_interval_minutes,
+  ADD COLUMN call_quiet_end TIME DEFAULT NULL
+    COMMENT '再発信しない時間帯の終了時刻（開始より前の場合は日付をまたぐ）'
+    AFTER call_quiet_start;
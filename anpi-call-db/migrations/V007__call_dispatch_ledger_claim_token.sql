@@ -0,0 +1,13 @@
+-- Migration V007: 発信台帳の確保トークン（call_dispatch_ledger.claim_token）
+-- Cloud SQL for MySQL 8.4
+-- 通話スケジューラーが発信予定をまとめて確保するためのトークン
+--   1. INSERT IGNORE INTO call_dispatch_ledger (user_id, scheduled_at, status, claim_token) VALUES (...), (...), ...
+--   2. UPDATE ... SET claim_token = ? WHERE (user_id, scheduled_at) IN (...) AND (failed または期限切れの claimed)
+--   3. SELECT user_id, scheduled_at ... WHERE claim_token = ? AND (user_id, scheduled_at) IN (...)
+-- 複数行の INSERT IGNORE では挿入できた行が分からないため、実行ごとのトークンで自分が確保した行を判別する
+-- 登録結果の記録もトークンが一致する行だけを更新し、期限切れで他の実行に確保し直された行は上書きしない
+
+ALTER TABLE call_dispatch_ledger
+  ADD COLUMN claim_token CHAR(32) DEFAULT NULL
+    COMMENT '確保した実行のトークン'
+    AFTER status;
@@ -0,0 +1,92 @@
+#!/bin/bash
+
+# マイグレーション実行スクリプト - スキーマ変更の適用
+# Cloud SQL for MySQL 8.4
+# 高齢者向け安否確認＋イベント案内アプリ
+#
+# migrations/V{番号}__{説明}.sql を番号順に実行し、適用済みのバージョンを
+# schema_migrations テーブルに記録する（適用済みのファイルは再実行しない）
+#
+# 使い方:
+#   ./run-migrations.sh           # 未適用のマイグレーションを実行
+#   ./run-migrations.sh --status  # 適用状況の表示のみ
+
+set -e  # エラー時に停止
+
+# === カラーコード ===
+RED='\033[0;31m'
+GREEN='\033[0;32m'
+YELLOW='\033[1;33m'
+BLUE='\033[0;34m'
+NC='\033[0m' # No Color
+
+# config.envファイルの読み込み（基本設定）
+if [[ -f "config.env" ]]; then
+    export $(cat config.env | grep -v '^#' | grep -v '^$' | xargs)
+else
+    echo -e "${RED}config.envファイルが見つかりません${NC}"
+    exit 1
+fi
+
+# .envファイルの読み込み（パスワード情報）
+if [[ -f ".env" ]]; then
+    export $(cat .env | grep -v '^#' | grep -v '^$' | xargs)
+else
+    echo -e "${RED}.envファイルが見つかりません${NC}"
+    exit 1
+fi
+
+if [[ -z "$DEFAULT_PASSWORD" ]]; then
+    echo -e "${RED}.envファイルからパスワードを取得できませんでした${NC}"
+    exit 1
+fi
+
+STATUS_ONLY=false
+if [[ "$1" == "--status" ]]; then
+    STATUS_ONLY=true
+fi
+
+mysql_exec() {
+    mysql -h $DB_HOST -P $DB_PORT -u $DEFAULT_USER -p"$DEFAULT_PASSWORD" --ssl-mode=$SSL_MODE "$@" $DB_NAME
+}
+
+echo -e "${GREEN}=== マイグレーション実行開始 ===${NC}"
+
+# 適用履歴テーブルの作成
+mysql_exec <<'SQL'
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version     VARCHAR(16)  PRIMARY KEY COMMENT 'バージョン（例: V001）',
+  description VARCHAR(255) NOT NULL    COMMENT 'マイグレーションファイル名',
+  applied_at  TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '適用日時'
+) ENGINE=InnoDB
+  DEFAULT CHARSET=utf8mb4
+  COMMENT='スキーママイグレーション適用履歴';
+SQL
+
+APPLIED=$(mysql_exec -N -B -e "SELECT version FROM schema_migrations")
+
+for file_path in $(ls migrations/V*__*.sql | sort); do
+    file_name=$(basename "$file_path")
+    version="${file_name%%__*}"
+
+    if echo "$APPLIED" | grep -qx "$version"; then
+        echo -e "${BLUE}適用済み: ${file_name}${NC}"
+        continue
+    fi
+
+    if [[ "$STATUS_ONLY" == "true" ]]; then
+        echo -e "${YELLOW}未適用: ${file_name}${NC}"
+        continue
+    fi
+
+    echo -e "${YELLOW}実行中: ${file_name}${NC}"
+    if mysql_exec < "$file_path"; then
+        mysql_exec -e "INSERT INTO schema_migrations (version, description) VALUES ('${version}', '${file_name}')"
+        echo -e "${GREEN}✓ ${file_name} の実行が完了しました${NC}"
+    else
+        echo -e "${RED}✗ ${file_name} の実行でエラーが発生しました${NC}"
+        exit 1
+    fi
+done
+
+echo -e "${GREEN}=== マイグレーション実行完了 ===${NC}"
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+インデックス利用の検証ハーネス
+
+ローカルのMySQLに検証用データベースを作成し、ddl/ と migrations/ を適用した上で
+合成データを大量に投入し、主要クエリの EXPLAIN が想定したインデックスを使うことを確認する。
+クエリの変更でフルスキャンに戻った場合は終了コード1で失敗する。
+
+使い方:
+    # ローカルMySQL（例: docker run -e MYSQL_ROOT_PASSWORD=root -p 3306:3306 mysql:8.4）
+    pip install mysql-connector-python
+    python test/explain_check.py --users 100000 --events 50000
+
+環境変数:
+    MYSQL_HOST / MYSQL_PORT / MYSQL_USER / MYSQL_PASSWORD : 接続先（デフォルト: 127.0.0.1:3306 root/root）
+"""
+
+import os
+import re
+import sys
+import glob
+import time
+import uuid
+import random
+import argparse
+from datetime import datetime, timedelta, time as dt_time
+
+import mysql.connector
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PREFECTURES = [
+    "北海道", "青森県", "岩手県", "宮城県", "秋田県", "山形県", "福島県", "茨城県", "栃木県", "群馬県",
+    "埼玉県", "千葉県", "東京都", "神奈川県", "新潟県", "富山県", "石川県", "福井県", "山梨県", "長野県",
+    "岐阜県", "静岡県", "愛知県", "三重県", "滋賀県", "京都府", "大阪府", "兵庫県", "奈良県", "和歌山県",
+    "鳥取県", "島根県", "岡山県", "広島県", "山口県", "徳島県", "香川県", "愛媛県", "高知県", "福岡県",
+    "佐賀県", "長崎県", "熊本県", "大分県", "宮崎県", "鹿児島県", "沖縄県",
+]
+WEEKDAYS = ["sun", "mon", "tue", "wed", "thu", "fri", "sat"]
+# 電話希望曜日の組み合わせ（ビットマスク）: 1曜日のみ / 平日 / 毎日 / 月水金
+WEEKDAYS_MASKS = [None] * 6 + [0b0011111, 0b1111111, 0b0010101]
+
+# (名前, SQL, パラメータ, 使うべきインデックス, ソートにfilesortを許容するか)
+# クエリを追加・変更した場合はここに検証を追加する
+NOW = datetime(2025, 7, 1, 9, 0, 0)
+CHECKS = [
+    (
+        "events: 都道府県別の今後のイベント（get_upcoming_events_by_prefecture）",
+        "SELECT * FROM events WHERE prefecture = %s AND start_datetime >= %s AND start_datetime <= %s "
+        "ORDER BY start_datetime LIMIT 100",
+        ("東京都", NOW + timedelta(weeks=1), NOW + timedelta(weeks=4)),
+        "idx_events_prefecture_start_datetime",
+        False,
+    ),
+    (
+        "users: 曜日・時刻による発信対象の抽出（スケジューラー）",
+        "SELECT user_id, last_name, first_name, phone_number, call_time, call_weekdays_mask FROM users "
+        "WHERE (call_time BETWEEN %s AND %s AND call_weekdays_mask & %s <> 0)",
+        (dt_time(8, 55), dt_time(9, 5), 1 << 1),
+        "idx_users_call_time_weekdays",
+        True,
+    ),
+    (
+        "users: 日付をまたぐ実行対象範囲の抽出（スケジューラー iter_due_users）",
+        "SELECT user_id, last_name, first_name, phone_number, call_time, call_weekdays_mask FROM users "
+        "WHERE (call_time BETWEEN %s AND %s AND call_weekdays_mask & %s <> 0) "
+        "OR (call_time BETWEEN %s AND %s AND call_weekdays_mask & %s <> 0)",
+        (dt_time(23, 57), dt_time(23, 59, 59), 1 << 0, dt_time(0, 0), dt_time(0, 7), 1 << 1),
+        "idx_users_call_time_weekdays",
+        True,
+    ),
+    (
+        "call_timetable: 発信スロットの抽出（スケジューラー timetableモード）",
+        "SELECT t.user_id, t.slot_of_week FROM call_timetable t WHERE t.slot_of_week BETWEEN %s AND %s",
+        (1 * 1440 + 9 * 60, 1 * 1440 + 9 * 60 + 14),
+        "idx_call_timetable_slot",
+        True,
+    ),
+]
+
+
+def connect(database=None):
+    return mysql.connector.connect(
+        host=os.getenv("MYSQL_HOST", "127.0.0.1"),
+        port=int(os.getenv("MYSQL_PORT", "3306")),
+        user=os.getenv("MYSQL_USER", "root"),
+        password=os.getenv("MYSQL_PASSWORD", "root"),
+        database=database,
+    )
+
+
+def run_sql_file(cursor, path):
+    """SQLファイルを実行（USE文は検証用データベースを使うため除外）"""
+    with open(path, encoding="utf-8") as f:
+        sql = f.read()
+    sql = re.sub(r"^\s*--.*$", "", sql, flags=re.MULTILINE)
+    for statement in sql.split(";"):
+        statement = statement.strip()
+        if not statement or statement.upper().startswith("USE "):
+            continue
+        cursor.execute(statement)
+        if cursor.with_rows:
+            cursor.fetchall()
+
+
+def setup_schema(database):
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+    cursor.execute(f"CREATE DATABASE `{database}` DEFAULT CHARSET utf8mb4")
+    cursor.execute(f"USE `{database}`")
+
+    for path in sorted(glob.glob(os.path.join(BASE_DIR, "ddl", "*.sql"))):
+        run_sql_file(cursor, path)
+    for path in sorted(glob.glob(os.path.join(BASE_DIR, "migrations", "V*__*.sql"))):
+        print(f"マイグレーション適用: {os.path.basename(path)}")
+        run_sql_file(cursor, path)
+
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def seed(database, user_count, event_count, batch_size):
+    """合成データをバッチで投入"""
+    rng = random.Random(42)
+    conn = connect(database)
+    cursor = conn.cursor()
+
+    started = time.time()
+    user_sql = (
+        "INSERT INTO users (user_id, last_name, first_name, prefecture, phone_number, gender, "
+        "birth_date, call_time, call_weekday, call_weekdays_mask) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+    )
+    rows = []
+    for i in range(user_count):
+        rows.append((
+            str(uuid.UUID(int=rng.getrandbits(128))),
+            "検証", f"利用者{i}",
+            rng.choice(PREFECTURES),
+            f"090-{rng.randint(0, 9999):04d}-{rng.randint(0, 9999):04d}",
+            rng.choice(["male", "female"]),
+            datetime(1930, 1, 1) + timedelta(days=rng.randint(0, 365 * 30)),
+            dt_time(rng.randint(0, 23), rng.randint(0, 59)),
+            rng.choice(WEEKDAYS),
+            rng.choice(WEEKDAYS_MASKS),  # NULLの場合はトリガーでcall_weekdayから設定される
+        ))
+        if len(rows) >= batch_size:
+            cursor.executemany(user_sql, rows)
+            conn.commit()
+            rows = []
+    if rows:
+        cursor.executemany(user_sql, rows)
+        conn.commit()
+
+    event_sql = (
+        "INSERT INTO events (event_id, title, start_datetime, end_datetime, prefecture) "
+        "VALUES (%s, %s, %s, %s, %s)"
+    )
+    rows = []
+    for i in range(event_count):
+        start = NOW + timedelta(minutes=rng.randint(-365 * 24 * 60, 365 * 24 * 60))
+        rows.append((
+            str(uuid.UUID(int=rng.getrandbits(128))),
+            f"検証イベント{i}",
+            start,
+            start + timedelta(hours=2),
+            rng.choice(PREFECTURES),
+        ))
+        if len(rows) >= batch_size:
+            cursor.executemany(event_sql, rows)
+            conn.commit()
+            rows = []
+    if rows:
+        cursor.executemany(event_sql, rows)
+        conn.commit()
+
+    # 統計情報を更新してオプティマイザに実データ量を反映
+    for table in ("users", "events", "call_timetable"):
+        cursor.execute(f"ANALYZE TABLE {table}")
+        cursor.fetchall()
+
+    print(f"データ投入完了: users={user_count}, events={event_count} ({time.time() - started:.1f}秒)")
+    cursor.close()
+    conn.close()
+
+
+def check_explain(database):
+    """各クエリのEXPLAINを検証し、失敗した件数を返す"""
+    conn = connect(database)
+    cursor = conn.cursor(dictionary=True)
+    failures = 0
+
+    for name, sql, params, expected_index, allow_filesort in CHECKS:
+        cursor.execute("EXPLAIN " + sql, params)
+        plan = cursor.fetchall()
+        row = plan[0]
+        key = row.get("key")
+        access_type = row.get("type")
+        extra = row.get("Extra") or ""
+
+        problems = []
+        if key != expected_index:
+            problems.append(f"インデックス不一致（想定: {expected_index}, 実際: {key}）")
+        if access_type == "ALL":
+            problems.append("フルスキャン（type=ALL）")
+        if not allow_filesort and "filesort" in extra:
+            problems.append("filesortが発生")
+
+        status = "NG" if problems else "OK"
+        print(f"[{status}] {name}")
+        print(f"      type={access_type}, key={key}, rows={row.get('rows')}, Extra={extra}")
+        for problem in problems:
+            print(f"      - {problem}")
+        failures += 1 if problems else 0
+
+    cursor.close()
+    conn.close()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAINによるインデックス利用の検証")
+    parser.add_argument("--database", default="anpi_explain_check", help="検証用データベース名（実行ごとに作り直す）")
+    parser.add_argument("--users", type=int, default=100000, help="投入するユーザー数")
+    parser.add_argument("--events", type=int, default=50000, help="投入するイベント数")
+    parser.add_argument("--batch-size", type=int, default=5000, help="一括INSERTの件数")
+    parser.add_argument("--keep", action="store_true", help="検証後にデータベースを削除しない")
+    args = parser.parse_args()
+
+    setup_schema(args.database)
+    seed(args.database, args.users, args.events, args.batch_size)
+    failures = check_explain(args.database)
+
+    if not args.keep:
+        conn = connect()
+        conn.cursor().execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+        conn.close()
+
+    if failures:
+        print(f"{failures}件のクエリが想定したインデックスを使用していません")
+        sys.exit(1)
+    print("すべてのクエリが想定したインデックスを使用しています")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+タスク登録の並列実行
+
+実行対象ユーザーごとのタスクAPI呼び出しを、同時実行数を制限したスレッドプールで並列に行う。
+HTTP接続はセッションのコネクションプールで再利用し、一時的なエラー（接続エラー・429・5xx）は
+リクエスト単位で指数バックオフにより再試行する。
+"""
+
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_http_session(pool_size, max_retries, backoff_seconds):
+    """コネクションプールと再試行を設定したHTTPセッションを作成する
+
+    Args:
+        pool_size: ホストごとに保持する接続数（同時実行数以上にする）
+        max_retries: 1リクエストあたりの最大再試行回数
+        backoff_seconds: 再試行の待機時間の基準（秒）。試行ごとに倍になる
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_seconds,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET', 'POST']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_http_session():
+    """ジョブ内で共有するHTTPセッションを取得する（初回呼び出し時に作成）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_http_session(
+                    pool_size=dispatch_concurrency(),
+                    max_retries=int(os.environ.get('TASK_API_MAX_RETRIES', '3')),
+                    backoff_seconds=float(os.environ.get('TASK_API_BACKOFF_SECONDS', '0.5'))
+                )
+    return _session
+
+
+def dispatch_concurrency():
+    """タスク登録の同時実行数（環境変数TASK_API_CONCURRENCY）"""
+    return max(1, int(os.environ.get('TASK_API_CONCURRENCY', '16')))
+
+
+def _percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(ratio * (len(values) - 1))))]
+
+
+@dataclass
+class DispatchReport:
+    """タスク登録の実行結果"""
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    wall_seconds: float = 0.0
+    latencies: list = field(default_factory=list)
+    failures: list = field(default_factory=list)
+
+    @property
+    def throughput(self):
+        """1秒あたりの処理件数"""
+        return self.total / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    def summary(self):
+        """ログ出力用の集計"""
+        return {
+            'total': self.total,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'wall_seconds': round(self.wall_seconds, 3),
+            'throughput_per_sec': round(self.throughput, 1),
+            'latency_p50_ms': round(_percentile(self.latencies, 0.50) * 1000, 1) if self.latencies else None,
+            'latency_p95_ms': round(_percentile(self.latencies, 0.95) * 1000, 1) if self.latencies else None,
+        }
+
+
+def dispatch(items, send, concurrency=None):
+    """itemsの各要素に対してsendを並列に実行する
+
+    Args:
+        items: 処理対象のリスト
+        send: 1件を処理する関数 (item) -> result。例外は失敗として記録する
+        concurrency: 同時実行数（省略時は環境変数TASK_API_CONCURRENCY）
+
+    Returns:
+        tuple: (成功した結果のリスト, DispatchReport)
+    """
+    concurrency = concurrency or dispatch_concurrency()
+    report = DispatchReport(total=len(items))
+    results = []
+    if not items:
+        return results, report
+
+    def _timed(item):
+        started = time.perf_counter()
+        result = send(item)
+        return result, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as executor:
+        futures = {executor.submit(_timed, item): item for item in items}
+        for future in as_completed(futures):
+            try:
+                result, latency = future.result()
+                results.append(result)
+                report.latencies.append(latency)
+                report.succeeded += 1
+            except Exception as e:
+                report.failed += 1
+                report.failures.append((futures[future], str(e)))
+    report.wall_seconds = time.perf_counter() - started
+    return results, report
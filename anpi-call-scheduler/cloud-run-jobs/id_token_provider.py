@@ -0,0 +1,155 @@
+"""
+IDトークンの取得とキャッシュ
+
+タスクAPI（Cloud Run）の呼び出しに使うIDトークンを1回だけ取得し、有効期限の少し前までキャッシュする。
+複数のスレッドから同時に呼び出しても、取得処理は1回に限られる。
+
+トークンの取得元:
+- metadata: メタデータサーバー（Cloud Run上で実行する場合）
+- gcloud  : gcloud auth print-identity-token（ローカル開発環境）
+- auto    : Cloud Run上ならmetadata、それ以外はgcloud（デフォルト）
+"""
+
+import os
+import json
+import time
+import base64
+import logging
+import threading
+import subprocess
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+METADATA_IDENTITY_URL = (
+    "http://metadata.google.internal/computeMetadata/v1/instance/service-accounts/default/identity"
+)
+
+
+def fetch_from_metadata_server(audience):
+    """メタデータサーバーからIDトークンを取得する（Cloud Run上で実行する場合）"""
+    response = requests.get(
+        METADATA_IDENTITY_URL,
+        params={'audience': audience, 'format': 'full'},
+        headers={'Metadata-Flavor': 'Google'},
+        timeout=5
+    )
+    response.raise_for_status()
+    return response.text.strip()
+
+
+def fetch_from_gcloud(audience):
+    """gcloudコマンドでIDトークンを取得する（ローカル開発環境）
+
+    ユーザーアカウントではaudienceを指定できないため、gcloudの既定のトークンを使用する
+    """
+    try:
+        result = subprocess.run(
+            ['gcloud', 'auth', 'print-identity-token'],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return result.stdout.strip()
+    except subprocess.CalledProcessError as e:
+        logger.error(f"認証トークンの取得に失敗しました: {e}")
+        raise
+
+
+def is_cloud_run():
+    """Cloud Run（Jobs / Services）上で実行しているか判定する"""
+    return (
+        os.environ.get('K_SERVICE') is not None or
+        os.environ.get('CLOUD_RUN_JOB') is not None or
+        os.environ.get('K_CONFIGURATION') is not None
+    )
+
+
+SOURCES = {
+    'metadata': fetch_from_metadata_server,
+    'gcloud': fetch_from_gcloud,
+}
+
+
+def token_expiry(token):
+    """JWTのexpクレーム（UNIX時刻）を取得する。解析できない場合はNone"""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except (IndexError, KeyError, ValueError, TypeError):
+        return None
+
+
+class IdTokenProvider:
+    """IDトークンをキャッシュして提供する（スレッドセーフ）"""
+
+    def __init__(self, audience, source=None, refresh_margin_seconds=None, default_ttl_seconds=300):
+        """
+        Args:
+            audience: トークンの対象（呼び出し先のURL）
+            source: トークン取得関数 (audience) -> token、または 'auto' / 'metadata' / 'gcloud'
+                    （省略時は環境変数ID_TOKEN_SOURCE、デフォルト: auto）
+            refresh_margin_seconds: 有効期限の何秒前に再取得するか（環境変数ID_TOKEN_REFRESH_MARGIN_SECONDS）
+            default_ttl_seconds: 有効期限を解析できないトークンのキャッシュ秒数
+        """
+        self.audience = audience
+        self.fetch = self._resolve_source(source or os.environ.get('ID_TOKEN_SOURCE', 'auto'))
+        self.refresh_margin_seconds = (
+            refresh_margin_seconds if refresh_margin_seconds is not None
+            else int(os.environ.get('ID_TOKEN_REFRESH_MARGIN_SECONDS', '300'))
+        )
+        self.default_ttl_seconds = default_ttl_seconds
+        self._lock = threading.Lock()
+        self._token = None
+        self._refresh_at = 0.0
+
+    @staticmethod
+    def _resolve_source(source):
+        if callable(source):
+            return source
+        if source == 'auto':
+            return fetch_from_metadata_server if is_cloud_run() else fetch_from_gcloud
+        if source not in SOURCES:
+            raise ValueError(f"不正なトークン取得元: {source}")
+        return SOURCES[source]
+
+    def get_token(self):
+        """IDトークンを取得する（キャッシュが有効ならそのまま返す）"""
+        token = self._token
+        if token is not None and time.time() < self._refresh_at:
+            return token
+
+        with self._lock:
+            # 待機中に他のスレッドが取得していればそれを使う
+            if self._token is not None and time.time() < self._refresh_at:
+                return self._token
+
+            started = time.perf_counter()
+            token = self.fetch(self.audience)
+            expiry = token_expiry(token)
+            now = time.time()
+            if expiry is None:
+                self._refresh_at = now + self.default_ttl_seconds
+            else:
+                self._refresh_at = max(now, expiry - self.refresh_margin_seconds)
+            self._token = token
+            logger.info(
+                f"IDトークンを取得しました（{(time.perf_counter() - started) * 1000:.0f}ms, "
+                f"再取得まで{self._refresh_at - now:.0f}秒）")
+            return token
+
+    def invalidate(self, stale_token):
+        """
+        キャッシュを破棄する（認証エラー時に再取得させる）
+
+        Args:
+            stale_token: 認証エラーになったトークン。キャッシュがこのトークンの場合のみ破棄する
+                         （並行する401で、他のスレッドが取得し直したトークンまで捨てないため）
+        """
+        with self._lock:
+            if self._token != stale_token:
+                return
+            self._token = None
+            self._refresh_at = 0.0
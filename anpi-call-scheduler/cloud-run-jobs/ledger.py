@@ -0,0 +1,193 @@
+"""
+発信台帳による重複発信の防止
+
+(利用者, 発信予定の分) を主キーとする call_dispatch_ledger（anpi-call-db/migrations/V004__call_dispatch_ledger.sql）に
+INSERT IGNORE で行を確保できた実行だけがタスクを登録する（実行対象の発信予定はまとめて確保・記録する）。
+タスク名も (利用者, 発信予定の分) から決定的に生成するため、台帳の更新前にジョブが停止して
+再登録した場合でも、Cloud Tasks側で同じタスクの二重登録が拒否される。
+
+登録に失敗した発信予定・登録中のまま停止した発信予定は、各実行の最初に iter_retryable で拾い直して再登録する
+（同じ発信予定が実行対象範囲に入るのを待たない）。
+発信予定から許容時間（IMMEDIATE_CALL_TOLERANCE_MINUTES）以上過ぎた発信予定は再登録しない。
+"""
+
+import os
+import uuid
+import hashlib
+import logging
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+CLAIMED = 'claimed'
+ENQUEUED = 'enqueued'
+FAILED = 'failed'
+
+
+def task_id_for(user_id, scheduled_at):
+    """(利用者, 発信予定の分) から決定的なCloud TasksのタスクIDを生成する
+
+    先頭にハッシュを置き、タスク名が連番にならないようにする（Cloud Tasksの推奨）
+    """
+    key = f"{user_id}-{scheduled_at.strftime('%Y%m%d%H%M')}"
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]
+    return f"{digest}-anpi-call-{key}"
+
+
+def _max_attempts(max_attempts=None):
+    return max_attempts or int(os.environ.get('DISPATCH_MAX_ATTEMPTS', '5'))
+
+
+def _claim_timeout_seconds(claim_timeout_seconds=None):
+    return claim_timeout_seconds or int(os.environ.get('DISPATCH_CLAIM_TIMEOUT_SECONDS', '300'))
+
+
+def _batch_size(batch_size=None):
+    return batch_size or int(os.environ.get('DISPATCH_LEDGER_BATCH_SIZE', '500'))
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def claim_many(connection, keys, claim_timeout_seconds=None, max_attempts=None, batch_size=None):
+    """発信予定をまとめて確保する
+
+    次のいずれかの場合に確保できる
+    - まだ台帳に行がない（INSERT IGNOREで挿入できた）
+    - 前回の登録が失敗した（failed）
+    - 前回の実行が登録中のまま停止した（claimedのまま claim_timeout_seconds 秒以上経過）
+    ただし試行回数が max_attempts に達した発信予定は確保しない
+
+    batch_size 件ごとに、複数行の INSERT IGNORE・再確保の UPDATE・確保できた行の SELECT の3クエリで処理する。
+    確保した行にはこの実行のトークンを記録し、自分が確保した行を判別する
+
+    Args:
+        connection: DB接続
+        keys: [(利用者ID, 発信予定日時（分単位）), ...]
+        claim_timeout_seconds: 登録中の確保を期限切れとみなす秒数（環境変数DISPATCH_CLAIM_TIMEOUT_SECONDS）
+        max_attempts: 登録の最大試行回数（環境変数DISPATCH_MAX_ATTEMPTS）
+        batch_size: 1クエリで処理する発信予定の数（環境変数DISPATCH_LEDGER_BATCH_SIZE）
+
+    Returns:
+        tuple: (確保トークン, 確保できた (利用者ID, 発信予定日時) の集合)
+    """
+    claim_timeout_seconds = _claim_timeout_seconds(claim_timeout_seconds)
+    max_attempts = _max_attempts(max_attempts)
+    token = uuid.uuid4().hex
+    claimed = set()
+
+    cursor = connection.cursor()
+    try:
+        for chunk in _chunks(list(dict.fromkeys(keys)), _batch_size(batch_size)):
+            key_params = [value for key in chunk for value in key]
+            in_keys = ", ".join(["(%s, %s)"] * len(chunk))
+
+            cursor.execute(
+                "INSERT IGNORE INTO call_dispatch_ledger (user_id, scheduled_at, status, claim_token) VALUES "
+                + ", ".join(["(%s, %s, %s, %s)"] * len(chunk)),
+                [value for user_id, scheduled_at in chunk for value in (user_id, scheduled_at, CLAIMED, token)]
+            )
+            cursor.execute(
+                f"""
+                UPDATE call_dispatch_ledger
+                   SET status = %s, claim_token = %s, attempts = attempts + 1,
+                       claimed_at = CURRENT_TIMESTAMP, last_error = NULL
+                 WHERE (user_id, scheduled_at) IN ({in_keys})
+                   AND attempts < %s
+                   AND (status = %s
+                        OR (status = %s AND claimed_at < CURRENT_TIMESTAMP - INTERVAL %s SECOND))
+                """,
+                [CLAIMED, token] + key_params + [max_attempts, FAILED, CLAIMED, claim_timeout_seconds]
+            )
+            cursor.execute(
+                f"SELECT user_id, scheduled_at FROM call_dispatch_ledger "
+                f"WHERE claim_token = %s AND (user_id, scheduled_at) IN ({in_keys})",
+                [token] + key_params
+            )
+            claimed.update((user_id, scheduled_at) for user_id, scheduled_at in cursor.fetchall())
+        return token, claimed
+    finally:
+        cursor.close()
+
+
+def _mark_many(connection, token, status, column, rows, batch_size=None):
+    """確保トークンが一致する行の状態と column をまとめて更新する（rows: [(利用者ID, 発信予定日時, 値), ...]）"""
+    cursor = connection.cursor()
+    try:
+        for chunk in _chunks(list(rows), _batch_size(batch_size)):
+            cases = " ".join(["WHEN user_id = %s AND scheduled_at = %s THEN %s"] * len(chunk))
+            in_keys = ", ".join(["(%s, %s)"] * len(chunk))
+            cursor.execute(
+                f"""
+                UPDATE call_dispatch_ledger
+                   SET status = %s, {column} = CASE {cases} END
+                 WHERE claim_token = %s AND (user_id, scheduled_at) IN ({in_keys})
+                """,
+                [status]
+                + [value for row in chunk for value in row]
+                + [token]
+                + [value for user_id, scheduled_at, _ in chunk for value in (user_id, scheduled_at)]
+            )
+    finally:
+        cursor.close()
+
+
+def mark_enqueued_many(connection, token, rows, batch_size=None):
+    """タスク登録済みとして記録する（rows: [(利用者ID, 発信予定日時, タスク名), ...]）"""
+    _mark_many(connection, token, ENQUEUED, 'task_name', rows, batch_size)
+
+
+def mark_failed_many(connection, token, rows, batch_size=None):
+    """タスク登録失敗として記録する（次の実行で再度確保できる。rows: [(利用者ID, 発信予定日時, エラー), ...]）"""
+    _mark_many(
+        connection, token, FAILED, 'last_error',
+        [(user_id, scheduled_at, str(error)[:1000]) for user_id, scheduled_at, error in rows],
+        batch_size)
+
+
+def iter_retryable(connection, now, lookback_minutes=None, claim_timeout_seconds=None, max_attempts=None, shard=None):
+    """再登録が必要な発信予定（登録失敗・登録中のまま停止）を利用者情報とともに取得する
+
+    Args:
+        connection: DB接続
+        now: 現在日時
+        lookback_minutes: 再登録する発信予定の範囲（現在から何分前まで。省略時は環境変数IMMEDIATE_CALL_TOLERANCE_MINUTES）
+                          これより前の発信予定は、利用者の希望時刻から大きく遅れて発信しないよう再登録しない
+        claim_timeout_seconds: 登録中の確保を期限切れとみなす秒数
+        max_attempts: 登録の最大試行回数（達した発信予定は再登録しない）
+        shard: 担当するユーザーの分割（sharding.Shard）。省略時は全ユーザー
+
+    Yields:
+        dict: ユーザー情報（scheduled_atを含む）
+    """
+    lookback_minutes = lookback_minutes or int(os.environ.get('IMMEDIATE_CALL_TOLERANCE_MINUTES', '5'))
+    shard_condition, shard_params = shard.sql_condition('l.user_id') if shard else ("", [])
+    query = f"""
+    SELECT u.user_id, u.last_name, u.first_name, u.phone_number,
+           u.call_time, u.call_weekday, u.call_weekdays_mask,
+           u.call_retry_max_attempts, u.call_retry_interval_minutes, u.call_quiet_start, u.call_quiet_end,
+           l.scheduled_at, l.status AS ledger_status, l.attempts AS ledger_attempts
+      FROM call_dispatch_ledger l
+      JOIN users u ON u.user_id = l.user_id
+     WHERE l.scheduled_at >= %s
+       AND l.attempts < %s
+       AND (l.status = %s
+            OR (l.status = %s AND l.claimed_at < CURRENT_TIMESTAMP - INTERVAL %s SECOND)){shard_condition}
+    """
+    params = [
+        now - timedelta(minutes=lookback_minutes),
+        _max_attempts(max_attempts),
+        FAILED,
+        CLAIMED,
+        _claim_timeout_seconds(claim_timeout_seconds),
+    ] + shard_params
+
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(query, params)
+        for row in cursor.fetchall():
+            yield row
+    finally:
+        cursor.close()
@@ -6,14 +6,22 @@
 
 import os
 import sys
+import argparse
 import logging
 from datetime import datetime, timedelta, time
 import json
+from concurrent.futures import ThreadPoolExecutor
 import requests
-import subprocess
 import mysql.connector
 from mysql.connector import Error
 
+from dispatcher import dispatch, get_http_session
+from id_token_provider import IdTokenProvider
+import ledger
+import pacing
+import timetable
+from sharding import Shard
+
 def setup_logging():
     """ログ設定を初期化"""
     log_level = os.environ.get('LOG_LEVEL', 'info').upper()
@@ -38,44 +46,45 @@ def setup_logging():
 
 logger = setup_logging()
 
+# タスクAPI（Cloud Tasksへのタスク登録）
+DEFAULT_TASK_API_BASE_URL = 'https://taskhandler-hkzk5xnm7q-uc.a.run.app'
+TASK_API_BASE_URL = os.environ.get('TASK_API_BASE_URL', DEFAULT_TASK_API_BASE_URL)
+
+# IDトークンはジョブ全体で1回だけ取得し、有効期限の少し前までキャッシュする
+id_token_provider = IdTokenProvider(audience=os.environ.get('ID_TOKEN_AUDIENCE', TASK_API_BASE_URL))
+
 def get_auth_token():
-    """Google Cloud認証トークンを取得する"""
-    try:
-        result = subprocess.run(
-            ['gcloud', 'auth', 'print-identity-token'],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        logger.error(f"認証トークンの取得に失敗しました: {e}")
-        raise
+    """Google Cloud認証トークン（IDトークン）を取得する"""
+    return id_token_provider.get_token()
 
-def call_task_api(phone_number, delay_seconds=0, queue_name="my-queue"):
+def _auth_headers(token):
+    """タスクAPIのリクエストヘッダー"""
+    return {
+        'Content-Type': 'application/json',
+        'Authorization': f'Bearer {token}'
+    }
+
+def call_task_api(phone_number, delay_seconds=0, queue_name="my-queue", session=None, task_id=None, user_id=None, retry_policy=None):
     """タスクAPIを呼び出して安否確認タスクを作成する
     
     Args:
         phone_number: 電話番号
         delay_seconds: 遅延時間（秒）
         queue_name: キュー名
+        session: HTTPセッション（省略時はジョブ内で共有するセッション）
+        task_id: Cloud TasksのタスクID（同じIDのタスクは二重に登録されない）
+        user_id: 利用者ID
+        retry_policy: 利用者ごとの再発信ポリシー（retry_policy_forの戻り値）
     
     Returns:
         dict: APIレスポンス
     """
     logger.info(f"タスクAPI呼び出し中: {phone_number} (キュー: {queue_name})")
+    session = session or get_http_session()
+    timeout = float(os.environ.get('TASK_API_TIMEOUT_SECONDS', '10'))
     
     # APIエンドポイント
-    api_url = "https://taskhandler-hkzk5xnm7q-uc.a.run.app/enqueue-task"
-    
-    # 認証トークンを取得
-    auth_token = get_auth_token()
-    
-    # リクエストヘッダー
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {auth_token}'
-    }
+    api_url = f"{TASK_API_BASE_URL}/enqueue-task"
     
     # リクエストボディ
     payload = {
@@ -83,10 +92,24 @@ def call_task_api(phone_number, delay_seconds=0, queue_name="my-queue"):
         'delay_seconds': delay_seconds,
         'queue_name': queue_name
     }
+    if task_id:
+        payload['task_id'] = task_id
+    if user_id:
+        payload['user_id'] = user_id
+    if retry_policy:
+        payload['retry_policy'] = retry_policy
     
     try:
         # APIリクエストを送信
-        response = requests.post(api_url, headers=headers, json=payload, timeout=30)
+        # 接続エラー・429・5xxはセッションのアダプターが指数バックオフで再試行する
+        token = get_auth_token()
+        response = session.post(api_url, headers=_auth_headers(token), json=payload, timeout=timeout)
+        if response.status_code == 401:
+            # トークンが失効していた場合は再取得して1回だけ再送する
+            # （他のスレッドが取得し直した新しいトークンは破棄しない）
+            logger.warning("タスクAPIの認証に失敗したため、IDトークンを再取得します")
+            id_token_provider.invalidate(token)
+            response = session.post(api_url, headers=_auth_headers(get_auth_token()), json=payload, timeout=timeout)
         response.raise_for_status()
         
         logger.info(f"タスクAPI呼び出し成功: {phone_number} (キュー: {queue_name})")
@@ -140,7 +163,7 @@ def get_db_connection():
         raise
 
 def get_users_from_db():
-    """DBからユーザー情報を取得する"""
+    """DBからユーザー情報を取得する（発信設定のある全ユーザー。即時実行の判定にはiter_due_usersを使用）"""
     logger.info("データベースからユーザー情報を取得中...")
     
     connection = None
@@ -151,10 +174,10 @@ def get_users_from_db():
         # 電話希望時刻と曜日が設定されているユーザーを取得
         query = """
         SELECT user_id, last_name, first_name, phone_number, 
-               call_time, call_weekday
+               call_time, call_weekday, call_weekdays_mask
         FROM users 
         WHERE call_time IS NOT NULL 
-          AND call_weekday IS NOT NULL
+          AND call_weekdays_mask <> 0
         """
         
         cursor.execute(query)
@@ -164,7 +187,7 @@ def get_users_from_db():
         
         # デバッグ情報：取得したユーザーの詳細をログ出力
         for user in users:
-            logger.debug(f"ユーザー情報: ID={user['user_id']}, 名前={user['last_name']} {user['first_name']}, 曜日={user['call_weekday']}, 時刻={user['call_time']}")
+            logger.debug(f"ユーザー情報: ID={user['user_id']}, 名前={user['last_name']} {user['first_name']}, 曜日={format_weekdays(user['call_weekdays_mask'])}, 時刻={user['call_time']}")
         
         return users
         
@@ -178,143 +201,464 @@ def get_users_from_db():
 
 
 
-def should_call_now(call_weekday, call_time, tolerance_minutes=5):
+WEEKDAY_CODES = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+def weekday_bit(weekday):
+    """曜日 ('mon', 'tue', etc.) のビット（月=1, 火=2, ... 日=64。users.call_weekdays_maskと同じ）"""
+    return 1 << WEEKDAY_CODES.index(weekday)
+
+def to_weekdays_mask(call_weekdays):
+    """電話希望曜日をビットマスクに変換する（ビットマスクの整数、曜日1つ、曜日のリストに対応）"""
+    if call_weekdays is None:
+        return 0
+    if isinstance(call_weekdays, int):
+        return call_weekdays
+    if isinstance(call_weekdays, str):
+        call_weekdays = [call_weekdays]
+    mask = 0
+    for weekday in call_weekdays:
+        if weekday not in WEEKDAY_CODES:
+            logger.warning(f"不正な曜日指定: {weekday}")
+            continue
+        mask |= weekday_bit(weekday)
+    return mask
+
+def format_weekdays(call_weekdays_mask):
+    """ログ出力用の曜日表記（例: 'mon,wed,fri'）"""
+    mask = to_weekdays_mask(call_weekdays_mask)
+    return ','.join(weekday for weekday in WEEKDAY_CODES if mask & weekday_bit(weekday))
+
+def to_time(call_time):
+    """DBから取得した時刻（timeまたはtimedelta）をtimeオブジェクトに変換する"""
+    if isinstance(call_time, timedelta):
+        total_seconds = int(call_time.total_seconds())
+        hours = total_seconds // 3600
+        minutes = (total_seconds % 3600) // 60
+        seconds = total_seconds % 60
+        return time(hours, minutes, seconds)
+    return call_time
+
+def due_windows(now, tolerance_minutes=5):
+    """現在時刻の前後tolerance_minutes分の実行対象範囲を、曜日ごとの時刻範囲に分割する
+    
+    日付をまたぐ範囲（例: 00:02の前後5分）は前日の23:57〜23:59:59と当日の00:00〜00:07に分割する
+    
+    Args:
+        now: 現在日時
+        tolerance_minutes: 許容時間（分）
+    
+    Returns:
+        list: [(曜日 ('mon', 'tue', etc.), 開始時刻, 終了時刻), ...]
+    """
+    window_start = now - timedelta(minutes=tolerance_minutes)
+    window_end = now + timedelta(minutes=tolerance_minutes)
+    
+    windows = []
+    day = window_start.date()
+    while day <= window_end.date():
+        day_start = datetime.combine(day, time.min)
+        day_end = datetime.combine(day, time.max)
+        windows.append((
+            WEEKDAY_CODES[day.weekday()],
+            max(window_start, day_start).time(),
+            min(window_end, day_end).time()
+        ))
+        day += timedelta(days=1)
+    return windows
+
+def should_call_now(call_weekdays, call_time, tolerance_minutes=5, now=None):
     """現在時刻に基づいて即座に電話をかけるべきかどうかを判定する
     
     Args:
-        call_weekday: 指定曜日 ('mon', 'tue', etc.)
+        call_weekdays: 指定曜日（call_weekdays_maskのビットマスク、または 'mon', 'tue', etc. / そのリスト）
         call_time: 指定時刻 (time object or timedelta)
         tolerance_minutes: 許容時間（分）。指定時刻の前後この時間内なら実行対象
+        now: 現在日時（省略時はdatetime.now()）
     
     Returns:
         bool: 今すぐ電話をかけるべきならTrue
     """
-    # 曜日のマッピング
-    weekday_map = {
-        'sun': 6, 'mon': 0, 'tue': 1, 'wed': 2,
-        'thu': 3, 'fri': 4, 'sat': 5
-    }
+    mask = to_weekdays_mask(call_weekdays)
+    if not mask:
+        return False
     
-    # call_timeがtimedeltaの場合、timeオブジェクトに変換
-    if isinstance(call_time, timedelta):
-        total_seconds = int(call_time.total_seconds())
-        hours = total_seconds // 3600
-        minutes = (total_seconds % 3600) // 60
-        seconds = total_seconds % 60
-        call_time = time(hours, minutes, seconds)
+    call_time = to_time(call_time)
+    now = now or datetime.now()
     
-    current_datetime = datetime.now()
-    current_weekday = current_datetime.weekday()
-    current_time = current_datetime.time()
+    # 指定時刻の tolerance_minutes 分前から tolerance_minutes 分後まで（日付をまたぐ場合を含む）
+    for weekday, start, end in due_windows(now, tolerance_minutes):
+        if mask & weekday_bit(weekday) and start <= call_time <= end:
+            logger.debug(f"許容時間内({tolerance_minutes}分): 即時実行対象 (現在: {now}, 指定: {format_weekdays(mask)} {call_time})")
+            return True
     
-    target_weekday = weekday_map.get(call_weekday)
-    if target_weekday is None:
-        logger.warning(f"不正な曜日指定: {call_weekday}")
-        return False
+    return False
+
+def scheduled_at_for(call_weekdays, call_time, now, tolerance_minutes=5):
+    """実行対象範囲内で指定曜日・時刻に該当する発信予定日時（分単位）を求める
     
-    # 今日が指定曜日でない場合は即時実行しない
-    if current_weekday != target_weekday:
-        logger.debug(f"今日({current_weekday})は指定曜日({target_weekday})ではありません")
-        return False
+    同じ発信予定は許容時間内の複数回の実行で同じ日時になるため、発信台帳のキーに使用する
+    
+    Returns:
+        datetime: 発信予定日時。実行対象範囲内に該当しない場合はNone
+    """
+    mask = to_weekdays_mask(call_weekdays)
+    call_time = to_time(call_time)
+    for offset in (-1, 0, 1):
+        day = now.date() + timedelta(days=offset)
+        if not mask & weekday_bit(WEEKDAY_CODES[day.weekday()]):
+            continue
+        scheduled_at = datetime.combine(day, call_time)
+        if abs(scheduled_at - now) <= timedelta(minutes=tolerance_minutes):
+            return scheduled_at.replace(second=0, microsecond=0)
+    return None
+
+def iter_due_users(now, tolerance_minutes=5, batch_size=None, shard=None):
+    """実行対象範囲に指定時刻が入るユーザーをDBから逐次取得する
     
-    # 指定時刻をdatetimeに変換
-    target_datetime = datetime.combine(current_datetime.date(), call_time)
+    曜日・時刻の絞り込みはSQL側で行い（idx_users_call_time_weekdaysで時刻の範囲を引き、
+    曜日はインデックス内のビットマスクで判定）、結果はバッファリングしないカーソルからbatch_size件ずつ読み込む
     
-    # 現在時刻と指定時刻の差分を計算（秒単位）
-    time_diff_seconds = (current_datetime - target_datetime).total_seconds()
-    time_diff_minutes = time_diff_seconds / 60
+    Args:
+        now: 現在日時
+        tolerance_minutes: 許容時間（分）
+        batch_size: 1回に読み込む件数（環境変数DUE_USERS_FETCH_SIZE）
+        shard: 担当するユーザーの分割（省略時は全ユーザー）
     
-    logger.debug(f"時刻差分: {time_diff_minutes:.2f}分 (現在: {current_datetime.time()}, 指定: {call_time})")
+    Yields:
+        dict: ユーザー情報
+    """
+    batch_size = batch_size or int(os.environ.get('DUE_USERS_FETCH_SIZE', '500'))
+    windows = due_windows(now, tolerance_minutes)
+    
+    conditions = " OR ".join(["(call_time BETWEEN %s AND %s AND call_weekdays_mask & %s <> 0)"] * len(windows))
+    shard_condition, shard_params = shard.sql_condition() if shard else ("", [])
+    query = f"""
+    SELECT user_id, last_name, first_name, phone_number,
+           call_time, call_weekday, call_weekdays_mask,
+           call_retry_max_attempts, call_retry_interval_minutes, call_quiet_start, call_quiet_end
+    FROM users
+    WHERE ({conditions}){shard_condition}
+    """
+    params = [
+        value
+        for weekday, start, end in windows
+        for value in (start, end, weekday_bit(weekday))
+    ] + shard_params
     
-    # 許容時間内で実行対象かチェック
-    # 指定時刻の tolerance_minutes 分前から tolerance_minutes 分後まで
-    if -tolerance_minutes <= time_diff_minutes <= tolerance_minutes:
-        logger.debug(f"許容時間内({tolerance_minutes}分): 即時実行対象")
-        return True
+    connection = None
+    cursor = None
+    try:
+        connection = get_db_connection()
+        cursor = connection.cursor(dictionary=True, buffered=False)
+        cursor.execute(query, params)
+        
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+        
+    except Error as e:
+        logger.error(f"実行対象ユーザー取得エラー: {e}")
+        raise
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if connection and connection.is_connected():
+            connection.close()
+
+def get_timetable_call_users(now, shard=None):
+    """発信タイムテーブルから、前回の実行以降〜現在の分に発信予定のユーザーを取得する（timetableモード）
     
-    logger.debug(f"許容時間外: 即時実行対象外")
-    return False
+    処理位置はここでは進めない。タスクの登録後に advance_timetable で進める
+    
+    Args:
+        now: 判定に使う現在日時
+        shard: 担当するユーザーの分割（シャードごとに処理位置を持つ）
+    """
+    shard = shard or Shard()
+    batch_size = int(os.environ.get('DUE_USERS_FETCH_SIZE', '500'))
+    connection = None
+    try:
+        connection = get_db_connection()
+        pending = timetable.pending_minutes(connection, now, name=shard.state_name(timetable.SCHEDULER_NAME))
+        if pending is None:
+            logger.info("未処理のスロットはありません")
+            return []
+        
+        after, until = pending
+        logger.info(f"処理対象スロット: {timetable.format_range(after, until)}")
+        
+        users = []
+        for user in timetable.iter_slot_users(connection, timetable.slot_ranges(after, until), batch_size, shard):
+            user['scheduled_at'] = timetable.slot_datetime(user['slot_of_week'], after)
+            users.append(user)
+            logger.info(f"即時実行対象: {user['last_name']} {user['first_name']} (予定: {user['scheduled_at']})")
+        
+        logger.info(f"即時実行対象ユーザー数: {len(users)}")
+        return users
+        
+    except Error as e:
+        logger.error(f"タイムテーブル取得エラー: {e}")
+        raise
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
 
-def get_immediate_call_users():
-    """現在時刻に基づいて即座に電話をかけるべきユーザーを取得する"""
+def advance_timetable(now, shard=None):
+    """timetableモードの処理位置を現在の分まで進める（タスクの登録が終わった後に呼び出す）"""
+    if os.environ.get('SCHEDULER_MODE', 'window') != 'timetable':
+        return
+    shard = shard or Shard()
+    connection = None
+    try:
+        connection = get_db_connection()
+        timetable.advance_minutes(
+            connection, now.replace(second=0, microsecond=0), name=shard.state_name(timetable.SCHEDULER_NAME)
+        )
+    except Error as e:
+        logger.error(f"処理位置の更新エラー: {e}")
+        raise
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+
+def get_immediate_call_users(now=None, shard=None):
+    """現在時刻に基づいて即座に電話をかけるべきユーザーを取得する
+    
+    Args:
+        now: 判定に使う現在日時（省略時はdatetime.now()）
+        shard: 担当するユーザーの分割（省略時は全ユーザー）
+    """
     logger.info("即時実行対象ユーザーを確認中...")
+    now = now or datetime.now()
+    
+    if os.environ.get('SCHEDULER_MODE', 'window') == 'timetable':
+        return get_timetable_call_users(now, shard)
     
     # 即時実行の許容時間を環境変数から取得（デフォルト5分）
     tolerance_minutes = int(os.environ.get('IMMEDIATE_CALL_TOLERANCE_MINUTES', '5'))
     logger.info(f"即時実行許容時間: {tolerance_minutes}分")
     
-    # データベースからユーザー情報を取得
-    users = get_users_from_db()
+    # 実行対象範囲のユーザーのみをデータベースから取得
     immediate_users = []
-    
-    for user in users:
-        try:
-            if should_call_now(user['call_weekday'], user['call_time'], tolerance_minutes):
-                immediate_users.append(user)
-                logger.info(f"即時実行対象: {user['last_name']} {user['first_name']} (曜日: {user['call_weekday']}, 時刻: {user['call_time']})")
-        except Exception as e:
-            logger.error(f"ユーザー {user['user_id']} の即時実行判定エラー: {e}")
-            continue
+    for user in iter_due_users(now, tolerance_minutes, shard=shard):
+        user['scheduled_at'] = scheduled_at_for(user['call_weekdays_mask'], user['call_time'], now, tolerance_minutes)
+        immediate_users.append(user)
+        logger.info(f"即時実行対象: {user['last_name']} {user['first_name']} (曜日: {format_weekdays(user['call_weekdays_mask'])}, 時刻: {user['call_time']})")
     
     logger.info(f"即時実行対象ユーザー数: {len(immediate_users)}")
     return immediate_users
 
-def create_immediate_tasks():
-    """即時実行すべきユーザーのタスクを作成する"""
+def normalize_phone_number(phone_number):
+    """日本の電話番号形式に調整する（+81で始まる形式）"""
+    if phone_number.startswith('0'):
+        # 0で始まる場合は+81に置き換え
+        return '+81' + phone_number[1:]
+    if not phone_number.startswith('+'):
+        # +がない場合は+81を追加
+        return '+81' + phone_number
+    return phone_number
+
+def retry_policy_for(user):
+    """タスクAPIに渡す再発信ポリシー（未設定の項目は省略し、タスクAPIのデフォルトを使う）"""
+    policy = {
+        'max_attempts': user.get('call_retry_max_attempts'),
+        'interval_minutes': user.get('call_retry_interval_minutes'),
+        'quiet_start': user.get('call_quiet_start'),
+        'quiet_end': user.get('call_quiet_end'),
+    }
+    for key in ('quiet_start', 'quiet_end'):
+        if policy[key] is not None:
+            policy[key] = to_time(policy[key]).strftime('%H:%M')
+    return {key: value for key, value in policy.items() if value is not None}
+
+def create_immediate_tasks(now=None, shard=None):
+    """即時実行すべきユーザーのタスクを作成する
+    
+    Args:
+        now: 判定に使う現在日時（省略時はdatetime.now()）
+        shard: 担当するユーザーの分割（省略時は全ユーザー）
+    """
     logger.info("即時実行タスクの作成を開始")
+    current_time = now or datetime.now()
+    shard = shard or Shard()
+    
+    ledger_enabled = os.environ.get('DISPATCH_LEDGER_ENABLED', 'true').lower() == 'true'
     
     # 即時実行対象ユーザーを取得
-    immediate_users = get_immediate_call_users()
+    immediate_users = get_immediate_call_users(current_time, shard)
+    if ledger_enabled:
+        # 前回までに登録に失敗した・登録中のまま停止した発信予定も再登録する
+        immediate_users = _merge_users(immediate_users, get_retry_users(current_time, shard))
     
     if not immediate_users:
         logger.info("即時実行対象のユーザーはいません")
+        advance_timetable(current_time, shard)
         return []
     
-    created_tasks = []
-    current_time = datetime.now()
+    created_tasks, report = _create_tasks(immediate_users, current_time, shard)
     
-    for user in immediate_users:
-        try:
-            # 電話番号の形式を確認・調整
-            phone_number = user['phone_number']
-            
-            # 日本の電話番号形式に調整（+81で始まる形式）
-            if phone_number.startswith('0'):
-                # 0で始まる場合は+81に置き換え
-                phone_number = '+81' + phone_number[1:]
-            elif not phone_number.startswith('+'):
-                # +がない場合は+81を追加
-                phone_number = '+81' + phone_number
-            
-            logger.info(f"即時タスク作成中: {user['last_name']} {user['first_name']} ({phone_number})")
-            
-            # タスクAPIを呼び出し（即時実行なのでdelay_seconds=0）
-            response = call_task_api(
-                phone_number=phone_number,
-                delay_seconds=0,
-                queue_name="my-queue"
+    # 処理位置はタスクの登録が終わってから進める
+    # 台帳を使う場合、登録に失敗した発信予定は次の実行で台帳から再登録される
+    # 台帳を使わない場合は処理位置を進めず、次の実行で同じ範囲を処理する（登録済みのタスクはタスク名で除外される）
+    if report.failures and not ledger_enabled:
+        logger.warning(f"タスク登録に失敗した発信予定があるため、処理位置を進めません: {len(report.failures)}件")
+    else:
+        advance_timetable(current_time, shard)
+    return created_tasks
+
+def get_retry_users(now, shard=None):
+    """発信台帳から再登録が必要な発信予定（登録失敗・登録中のまま停止）のユーザーを取得する"""
+    connection = None
+    try:
+        connection = get_db_connection()
+        users = list(ledger.iter_retryable(connection, now, shard=shard))
+        for user in users:
+            logger.info(
+                f"再登録対象: {user['last_name']} {user['first_name']} "
+                f"(予定: {user['scheduled_at']}, 状態: {user['ledger_status']}, 試行: {user['ledger_attempts']}回)"
             )
-            
-            created_tasks.append({
-                'user_id': user['user_id'],
-                'phone_number': phone_number,
-                'execution_time': current_time,
-                'user_name': f"{user['last_name']} {user['first_name']}",
-                'api_response': response
-            })
-            
-            logger.info(f"即時タスク作成完了: {user['last_name']} {user['first_name']} -> {phone_number}")
-            
-        except Exception as e:
-            logger.error(f"即時タスク作成エラー (ユーザーID: {user['user_id']}): {str(e)}")
-            continue
+        if users:
+            logger.info(f"再登録対象の発信予定: {len(users)}件")
+        return users
+    except Error as e:
+        logger.error(f"再登録対象の取得エラー: {e}")
+        raise
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+
+def _merge_users(users, retry_users):
+    """実行対象ユーザーに再登録対象を加える（同じ発信予定は1件にまとめる）"""
+    keys = {(user['user_id'], user['scheduled_at']) for user in users}
+    return users + [user for user in retry_users if (user['user_id'], user['scheduled_at']) not in keys]
+
+def _create_tasks(immediate_users, current_time, shard):
+    """発信台帳で確保できたユーザーのタスクを登録し、結果を台帳に記録する
     
-    logger.info(f"即時実行タスク作成完了: {len(created_tasks)}件")
-    return created_tasks
+    Returns:
+        tuple: (作成したタスクのリスト, DispatchReport)
+    """
+    if os.environ.get('DISPATCH_LEDGER_ENABLED', 'true').lower() != 'true':
+        return _dispatch_tasks(immediate_users, current_time, shard)
+    
+    # 発信台帳で (利用者, 発信予定) を確保できたユーザーだけタスクを登録する
+    # 実行の重複・再試行・許容時間内の再実行で同じ発信予定が二重に登録されるのを防ぐ
+    connection = None
+    try:
+        connection = get_db_connection()
+        token, claimed_keys = ledger.claim_many(
+            connection, [(user['user_id'], user['scheduled_at']) for user in immediate_users])
+        claimed_users = [
+            user for user in immediate_users
+            if (user['user_id'], user['scheduled_at']) in claimed_keys
+        ]
+        skipped = len(immediate_users) - len(claimed_users)
+        if skipped:
+            logger.info(f"登録済み・登録中の発信予定をスキップ: {skipped}件")
+        
+        created_tasks, report = _dispatch_tasks(claimed_users, current_time, shard)
+        
+        # 登録結果はまとめて台帳に記録する
+        ledger.mark_enqueued_many(connection, token, [
+            (task['user_id'], task['scheduled_at'], task['api_response'].get('task_name'))
+            for task in created_tasks
+        ])
+        ledger.mark_failed_many(connection, token, [
+            (user['user_id'], user['scheduled_at'], error) for user, error in report.failures
+        ])
+        return created_tasks, report
+        
+    except Error as e:
+        logger.error(f"発信台帳の更新エラー: {e}")
+        raise
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+
+def plan_delays(users, current_time, shard):
+    """容量の設定に合わせてユーザーごとの遅延時間を決める（PACING_ENABLED=falseの場合は全員0秒）
+    
+    Args:
+        users: 実行対象ユーザー
+        current_time: 実行時刻
+        shard: 担当するユーザーの分割（容量はシャード数で等分する）
+    
+    Returns:
+        list: [(ユーザー, 遅延時間（秒）), ...]
+    """
+    if os.environ.get('PACING_ENABLED', 'true').lower() != 'true':
+        return [(user, 0) for user in users]
+    
+    tolerance_minutes = int(os.environ.get('IMMEDIATE_CALL_TOLERANCE_MINUTES', '5'))
+    capacity = pacing.PacingCapacity.from_env(default_max_delay_seconds=tolerance_minutes * 60).for_shards(shard.count)
+    flagged_user_ids = pacing.fetch_flagged_user_ids(get_http_session())
+    
+    planned, report = pacing.plan(users, current_time, capacity, flagged_user_ids)
+    logger.info(f"発信の平準化: {report.summary()}")
+    return planned
+
+def _dispatch_tasks(users, current_time, shard):
+    """ユーザーごとのタスクを並列に登録する
+    
+    Args:
+        users: 実行対象ユーザー
+        current_time: 実行時刻
+        shard: 担当するユーザーの分割
+    
+    Returns:
+        tuple: (作成したタスクのリスト, DispatchReport)
+    """
+    planned = plan_delays(users, current_time, shard)
+    planned_at = datetime.now()
+    
+    def create_task(item):
+        user, planned_delay = item
+        phone_number = normalize_phone_number(user['phone_number'])
+        # 遅延時間は平準化した時点からの秒数なので、登録までの経過時間を差し引く
+        delay_seconds = max(0, planned_delay - int((datetime.now() - planned_at).total_seconds()))
+        logger.info(f"即時タスク作成中: {user['last_name']} {user['first_name']} ({phone_number}, {delay_seconds}秒後)")
+        
+        # タスクIDは (利用者, 発信予定) から決定的に生成し、Cloud Tasks側でも二重登録を防ぐ
+        response = call_task_api(
+            phone_number=phone_number,
+            delay_seconds=delay_seconds,
+            queue_name="my-queue",
+            task_id=ledger.task_id_for(user['user_id'], user['scheduled_at']),
+            user_id=user['user_id'],
+            retry_policy=retry_policy_for(user)
+        )
+        
+        logger.info(f"即時タスク作成完了: {user['last_name']} {user['first_name']} -> {phone_number} ({response.get('status')})")
+        return {
+            'user_id': user['user_id'],
+            'phone_number': phone_number,
+            'execution_time': current_time,
+            'scheduled_at': user['scheduled_at'],
+            'user_name': f"{user['last_name']} {user['first_name']}",
+            'delay_seconds': delay_seconds,
+            'api_response': response
+        }
+    
+    # 同時実行数を制限して並列にタスクを登録
+    created_tasks, report = dispatch(planned, create_task)
+    report.failures = [(user, error) for (user, _), error in report.failures]
+    for user, error in report.failures:
+        logger.error(f"即時タスク作成エラー (ユーザーID: {user['user_id']}): {error}")
+    
+    logger.info(f"即時実行タスク作成完了: {len(created_tasks)}件 {report.summary()}")
+    return created_tasks, report
 
-def main():
-    """メイン処理"""
+def main(shard=None):
+    """メイン処理
+    
+    Args:
+        shard: 担当するユーザーの分割（省略時はCloud Run Jobのタスク番号・タスク数から決める）
+    """
     logger.info("=== 安否確認呼び出しスケジューラー 即時実行処理開始 ===")
+    shard = shard or Shard.from_env()
     
     # 環境変数の確認
     project_id = os.environ.get('GOOGLE_CLOUD_PROJECT', 'unknown')
@@ -326,16 +670,17 @@ def main():
     logger.info(f"ジョブ名: {job_name}")
     logger.info(f"実行ID: {execution_id}")
     logger.info(f"環境: {environment}")
+    logger.info(f"シャード: {shard}")
     
-    # 現在の時刻を表示
-    current_time = datetime.now().isoformat()
-    logger.info(f"実行時刻: {current_time}")
+    # 現在の時刻を表示（以降の判定はすべてこの時刻を基準にする）
+    now = datetime.now()
+    logger.info(f"実行時刻: {now.isoformat()}")
     
     # 即時実行処理
     logger.info("=== 即時実行対象者の処理を開始 ===")
     immediate_tasks_count = 0
     try:
-        immediate_tasks = create_immediate_tasks()
+        immediate_tasks = create_immediate_tasks(now, shard)
         immediate_tasks_count = len(immediate_tasks)
         logger.info(f"即時実行対象者処理完了: {immediate_tasks_count}件のタスクを作成")
         
@@ -354,9 +699,68 @@ def main():
     
     return 0
 
+def simulate_shards(shard_count):
+    """shard_count個のシャードを1プロセス内で並列に実行する（ローカルでの動作確認用）
+    
+    Cloud Run Jobの各タスクと同様に同じ実行時刻で各シャードを処理し、
+    シャード間でユーザーが重複していないこと、各ユーザーが担当のシャードで処理されたことを確認する
+    
+    実際にタスクAPIを呼び出し、発信台帳・処理位置も更新するため、本番のタスクAPIでは実行しない
+    （TASK_API_BASE_URL に模擬タスクAPI（scripts/fake_task_api.py）などを、DB_* に検証用のデータベースを指定する）
+    
+    Returns:
+        int: 終了コード（重複・エラーがあれば1、タスクAPIが未指定の場合は2）
+    """
+    if TASK_API_BASE_URL == DEFAULT_TASK_API_BASE_URL:
+        logger.error(
+            "本番のタスクAPIに発信タスクが登録されるため、シミュレーションを中止します。"
+            "TASK_API_BASE_URL に模擬タスクAPI（scripts/fake_task_api.py）などを指定してください"
+        )
+        return 2
+    
+    logger.info(f"=== {shard_count}シャードのシミュレーションを開始 (タスクAPI: {TASK_API_BASE_URL}) ===")
+    now = datetime.now()
+    shards = [Shard(index, shard_count) for index in range(shard_count)]
+    
+    with ThreadPoolExecutor(max_workers=shard_count) as executor:
+        futures = {shard: executor.submit(create_immediate_tasks, now, shard) for shard in shards}
+    
+    result = 0
+    seen = {}
+    for shard, future in futures.items():
+        try:
+            tasks = future.result()
+        except Exception as e:
+            logger.error(f"シャード {shard} でエラーが発生: {str(e)}")
+            result = 1
+            continue
+        
+        logger.info(f"シャード {shard}: {len(tasks)}件のタスクを作成")
+        for task in tasks:
+            if not shard.owns(task['user_id']):
+                logger.error(f"担当外のユーザーを処理しました: {task['user_id']} (シャード {shard})")
+                result = 1
+            if task['user_id'] in seen:
+                logger.error(f"ユーザーが重複しています: {task['user_id']} (シャード {seen[task['user_id']]} と {shard})")
+                result = 1
+            seen[task['user_id']] = shard
+    
+    logger.info(f"=== シミュレーション終了: 合計 {len(seen)}件 ===")
+    return result
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="安否確認呼び出しスケジューラー")
+    parser.add_argument("--simulate-shards", type=int, metavar="N",
+                        help="N個のシャードを1プロセス内で並列に実行する（ローカルでの動作確認用）")
+    return parser.parse_args()
+
 if __name__ == "__main__":
     """Cloud Run Jobとしてバッチ処理を実行"""
     try:
+        args = parse_args()
+        if args.simulate_shards:
+            sys.exit(simulate_shards(args.simulate_shards))
+        
         logger.info("Cloud Run Jobとしてバッチ処理を開始")
         
         # バッチ処理を実行
@@ -0,0 +1,199 @@
+"""
+発信の平準化（ペーシング）
+
+同じ時刻（例: 10:00ちょうど）に発信予定が集中すると、遅延なしで一斉にタスクが登録され、
+Twilioの発信レート（calls per second）、OpenAI Realtimeの同時接続数、
+発信サービスのインスタンス数を超える瞬間的なピークが発生する。
+
+ここでは設定した容量の範囲に収まるように、実行対象ユーザーごとの遅延時間（delay_seconds）を決める。
+- 発信予定が未来のユーザーは、発信予定時刻より前には発信しない
+- 各時点で発信できるユーザーの中から、優先度の高い順（要注意ユーザー → 発信予定が早い順 = 取りこぼし・再登録を優先）に発信時刻を割り当てる
+  （発信予定が未来の要注意ユーザーが、発信できる他のユーザーを待たせることはない）
+- 1秒あたりの発信数と、通話の想定時間から見積もった同時通話数の両方が上限を超えないようにする
+- 平準化の範囲（PACING_MAX_DELAY_SECONDS）に収まらない場合も発信は取りやめず、範囲外として集計する
+"""
+
+import os
+import math
+import heapq
+import logging
+from dataclasses import dataclass, field, replace
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PacingCapacity:
+    """発信の容量"""
+    calls_per_second: float = 1.0
+    max_concurrent_calls: int = 10
+    expected_call_seconds: float = 180.0
+    max_delay_seconds: float = 300.0
+
+    @classmethod
+    def from_env(cls, default_max_delay_seconds=300):
+        """環境変数から容量を読み込む"""
+        return cls(
+            calls_per_second=float(os.environ.get('CALLS_PER_SECOND', '1')),
+            max_concurrent_calls=int(os.environ.get('MAX_CONCURRENT_CALLS', '10')),
+            expected_call_seconds=float(os.environ.get('EXPECTED_CALL_SECONDS', '180')),
+            max_delay_seconds=float(os.environ.get('PACING_MAX_DELAY_SECONDS', str(default_max_delay_seconds)))
+        )
+
+    def for_shards(self, shard_count):
+        """シャードごとの容量（全体の容量をシャード数で等分する）"""
+        if shard_count <= 1:
+            return self
+        return replace(
+            self,
+            calls_per_second=self.calls_per_second / shard_count,
+            max_concurrent_calls=max(1, self.max_concurrent_calls // shard_count)
+        )
+
+
+def _percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(ratio * (len(values) - 1))))]
+
+
+@dataclass
+class PacingReport:
+    """平準化の結果"""
+    total: int = 0
+    prioritized: int = 0
+    overdue: int = 0
+    over_window: int = 0
+    peak_concurrency: int = 0
+    peak_calls_per_second: int = 0
+    delays: list = field(default_factory=list)
+
+    def summary(self):
+        """ログ出力用の集計"""
+        return {
+            'total': self.total,
+            'prioritized': self.prioritized,
+            'overdue': self.overdue,
+            'over_window': self.over_window,
+            'peak_concurrency': self.peak_concurrency,
+            'peak_calls_per_second': self.peak_calls_per_second,
+            'delay_p50_seconds': _percentile(self.delays, 0.50) if self.delays else None,
+            'delay_p95_seconds': _percentile(self.delays, 0.95) if self.delays else None,
+            'delay_max_seconds': max(self.delays) if self.delays else None,
+        }
+
+
+def priority_key(user, now, flagged_user_ids):
+    """同じ時点で発信できるユーザーの並び替えキー（小さいほど先に発信）
+
+    要注意ユーザーを先頭にし、その中では発信予定が早い順（発信予定を過ぎているユーザーが先）にする
+    """
+    flagged = user['user_id'] in flagged_user_ids
+    scheduled_at = user.get('scheduled_at') or now
+    return (0 if flagged else 1, scheduled_at, user['user_id'])
+
+
+def plan(users, now, capacity, flagged_user_ids=frozenset()):
+    """実行対象ユーザーごとの発信までの秒数を決める
+
+    Args:
+        users: 実行対象ユーザー（scheduled_atを参照する）
+        now: 現在日時
+        capacity: PacingCapacity
+        flagged_user_ids: 優先して発信する要注意ユーザーのID
+
+    Returns:
+        tuple: ([(ユーザー, 発信までの秒数), ...]（発信順）, PacingReport)
+    """
+    report = PacingReport(total=len(users))
+
+    # 発信予定時刻（現在からの秒数）が早い順に並べ、発信できる時点になったユーザーから優先度順に選ぶ
+    pending = []
+    for index, user in enumerate(users):
+        scheduled_at = user.get('scheduled_at') or now
+        not_before = max(0.0, (scheduled_at - now).total_seconds())
+        pending.append((not_before, index))
+    pending.sort()
+    pending_index = 0
+    ready = []  # 発信できるユーザーの (優先度, 添字) のヒープ
+
+    interval = 1.0 / capacity.calls_per_second if capacity.calls_per_second > 0 else 0.0
+    in_flight = []  # 通話中の終了見込み（秒）のヒープ
+    starts_per_second = {}
+    next_start = 0.0
+    planned = []
+
+    while pending_index < len(pending) or ready:
+        # 同時通話数の上限に達している場合は、最も早く終わる通話の終了まで待つ
+        while in_flight and in_flight[0] <= next_start:
+            heapq.heappop(in_flight)
+        if len(in_flight) >= capacity.max_concurrent_calls:
+            next_start = max(next_start, heapq.heappop(in_flight))
+            while in_flight and in_flight[0] <= next_start:
+                heapq.heappop(in_flight)
+
+        while pending_index < len(pending) and pending[pending_index][0] <= next_start:
+            index = pending[pending_index][1]
+            heapq.heappush(ready, (priority_key(users[index], now, flagged_user_ids), index))
+            pending_index += 1
+        if not ready:
+            # 発信できるユーザーがいない場合は、次に発信予定時刻になるユーザーまで進める
+            next_start = pending[pending_index][0]
+            continue
+
+        _, index = heapq.heappop(ready)
+        user = users[index]
+        scheduled_at = user.get('scheduled_at') or now
+        start = next_start
+
+        heapq.heappush(in_flight, start + capacity.expected_call_seconds)
+        next_start = start + interval
+
+        delay = math.ceil(start)
+        planned.append((user, delay))
+
+        starts_per_second[delay] = starts_per_second.get(delay, 0) + 1
+        report.peak_concurrency = max(report.peak_concurrency, len(in_flight))
+        report.delays.append(delay)
+        if user['user_id'] in flagged_user_ids:
+            report.prioritized += 1
+        if scheduled_at < now.replace(second=0, microsecond=0):
+            report.overdue += 1
+        # 発信予定時刻（過ぎている場合は現在）からの平準化による遅れで判定する
+        if start - max(0.0, (scheduled_at - now).total_seconds()) > capacity.max_delay_seconds:
+            report.over_window += 1
+
+    report.peak_calls_per_second = max(starts_per_second.values()) if starts_per_second else 0
+    if report.over_window:
+        logger.warning(
+            f"平準化の範囲（{capacity.max_delay_seconds:.0f}秒）に収まらない発信があります: {report.over_window}件 "
+            "（容量の設定を見直してください）"
+        )
+    return planned, report
+
+
+def fetch_flagged_user_ids(session, url=None, timeout=None):
+    """要注意ユーザー（要観察・異常）のIDを取得する
+
+    発信サービスの要注意ユーザー一覧API（GET /client/call/watchlist）を呼び出す。
+    URL（環境変数WATCHLIST_API_URL）が未設定の場合や取得に失敗した場合は空集合を返す（優先度なしで平準化する）
+
+    Args:
+        session: HTTPセッション
+        url: 要注意ユーザー一覧APIのURL
+        timeout: タイムアウト（秒）
+    """
+    url = url or os.environ.get('WATCHLIST_API_URL')
+    if not url:
+        return frozenset()
+
+    timeout = timeout or float(os.environ.get('TASK_API_TIMEOUT_SECONDS', '10'))
+    try:
+        response = session.get(url, timeout=timeout)
+        response.raise_for_status()
+        watchlist = response.json().get('watchlist') or {}
+        return frozenset(entry['user_id'] for entries in watchlist.values() for entry in entries)
+    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+        logger.warning(f"要注意ユーザー一覧の取得に失敗したため、優先度なしで平準化します: {e}")
+        return frozenset()
@@ -0,0 +1,58 @@
+"""
+Cloud Run Jobのタスク並列実行によるユーザーの分割処理
+
+Cloud Run Jobは --tasks で指定した数のタスクを並列に実行し、各タスクに
+CLOUD_RUN_TASK_INDEX（0始まり）と CLOUD_RUN_TASK_COUNT を渡す。
+各タスク（シャード）は CRC32(user_id) をタスク数で割った余りが自分の番号と一致するユーザーだけを処理する。
+MySQLの CRC32() と Python の zlib.crc32() は同じ値になるため、SQLでの絞り込みとPythonでの判定が一致する。
+"""
+
+import os
+import zlib
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Shard:
+    """処理するユーザーの分割（index番目 / count個）"""
+    index: int = 0
+    count: int = 1
+
+    def __post_init__(self):
+        if self.count < 1 or not 0 <= self.index < self.count:
+            raise ValueError(f"不正なシャード指定です: {self.index}/{self.count}")
+
+    @classmethod
+    def from_env(cls):
+        """Cloud Run Jobのタスク番号・タスク数から作成する（未設定時は分割なし）"""
+        return cls(
+            index=int(os.environ.get('CLOUD_RUN_TASK_INDEX', '0')),
+            count=int(os.environ.get('CLOUD_RUN_TASK_COUNT', '1'))
+        )
+
+    @property
+    def is_sharded(self):
+        return self.count > 1
+
+    def sql_condition(self, column='user_id'):
+        """SQLの絞り込み条件とパラメーター（分割なしの場合は空）
+
+        Returns:
+            tuple: (" AND MOD(CRC32(user_id), %s) = %s", [count, index]) または ("", [])
+        """
+        if not self.is_sharded:
+            return "", []
+        return f" AND MOD(CRC32({column}), %s) = %s", [self.count, self.index]
+
+    def owns(self, user_id):
+        """ユーザーがこのシャードの担当かどうか（sql_conditionと同じ判定）"""
+        return zlib.crc32(user_id.encode('utf-8')) % self.count == self.index
+
+    def state_name(self, name):
+        """シャードごとの処理位置の名前（scheduler_state.name）"""
+        if not self.is_sharded:
+            return name
+        return f"{name}#{self.index}of{self.count}"
+
+    def __str__(self):
+        return f"{self.index + 1}/{self.count}"
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+発信の平準化（pacing.plan）の検証
+
+使い方:
+    pip install -r requirements.txt pytest
+    python -m pytest test/pacing_check.py
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pacing import PacingCapacity, plan  # noqa: E402
+
+NOW = datetime(2025, 1, 6, 10, 0, 0)
+
+
+def _user(user_id, offset_seconds=0):
+    return {'user_id': user_id, 'scheduled_at': NOW + timedelta(seconds=offset_seconds)}
+
+
+def _delays(planned):
+    return {user['user_id']: delay for user, delay in planned}
+
+
+def test_future_flagged_user_does_not_block_due_users():
+    """発信予定が未来の要注意ユーザーは、発信できる他のユーザーを待たせない"""
+    users = [_user('flagged', 300)] + [_user(f'user-{i}') for i in range(5)]
+
+    planned, report = plan(users, NOW, PacingCapacity(), flagged_user_ids=frozenset({'flagged'}))
+
+    delays = _delays(planned)
+    assert [delays[f'user-{i}'] for i in range(5)] == [0, 1, 2, 3, 4]
+    assert delays['flagged'] == 300
+    assert report.over_window == 0
+    assert report.prioritized == 1
+
+
+def test_flagged_user_goes_first_among_due_users():
+    """同じ時点で発信できるユーザーの中では要注意ユーザーを先に発信する"""
+    users = [_user('user-0', -60), _user('user-1'), _user('flagged')]
+
+    planned, _ = plan(users, NOW, PacingCapacity(), flagged_user_ids=frozenset({'flagged'}))
+
+    assert [user['user_id'] for user, _ in planned] == ['flagged', 'user-0', 'user-1']
+    assert [delay for _, delay in planned] == [0, 1, 2]
+
+
+def test_concurrency_limit_delays_until_a_call_ends():
+    """同時通話数の上限に達した場合は、最も早く終わる通話の終了まで待つ"""
+    capacity = PacingCapacity(calls_per_second=10, max_concurrent_calls=2, expected_call_seconds=60)
+    users = [_user(f'user-{i}') for i in range(3)]
+
+    planned, report = plan(users, NOW, capacity)
+
+    assert [delay for _, delay in planned] == [0, 1, 60]
+    assert report.peak_concurrency == 2
+
+
+if __name__ == "__main__":
+    test_future_flagged_user_does_not_block_due_users()
+    test_flagged_user_goes_first_among_due_users()
+    test_concurrency_limit_delays_until_a_call_ends()
+    print("OK")
@@ -0,0 +1,164 @@
+"""
+発信タイムテーブルによる実行対象ユーザーの抽出（timetableモード）
+
+users の発信曜日・時刻は、トリガーで call_timetable（週の中の分 slot_of_week、指定曜日ごとに1行）に同期されている
+（anpi-call-db/migrations/V003__call_timetable.sql, V005__users_call_weekdays_mask.sql）。
+各実行では scheduler_state に記録した「処理済みの最後の分」の次の分から現在の分までを対象とし、
+その範囲のスロットだけをインデックスで引く。
+
+- 処理位置はタスクの登録が終わってから進める（advance_minutes）。登録の途中でジョブが停止・失敗した場合は、
+  次の実行で同じ範囲をもう一度処理する（実行が遅れても、失敗しても取りこぼさない）
+- 同じ範囲を複数回処理しても、発信台帳（ledger.py）とタスク名で同じ発信予定は1回だけ登録される
+"""
+
+import os
+import logging
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+SCHEDULER_NAME = 'anpi-call-scheduler'
+
+
+def slot_of_week(dt):
+    """日時を週の中の分（月曜 00:00 = 0）に変換する"""
+    return dt.weekday() * MINUTES_PER_DAY + dt.hour * 60 + dt.minute
+
+
+def slot_ranges(after, until):
+    """after の次の分から until の分までのスロット範囲を求める（週の境目をまたぐ場合は分割）
+
+    Args:
+        after: 処理済みの最後の分
+        until: 今回処理する最後の分
+
+    Returns:
+        list: [(開始スロット, 終了スロット), ...]（両端を含む）
+    """
+    minutes = int((until - after).total_seconds() // 60)
+    if minutes <= 0:
+        return []
+    if minutes >= MINUTES_PER_WEEK:
+        return [(0, MINUTES_PER_WEEK - 1)]
+
+    start = slot_of_week(after + timedelta(minutes=1))
+    end = slot_of_week(until)
+    if start <= end:
+        return [(start, end)]
+    return [(start, MINUTES_PER_WEEK - 1), (0, end)]
+
+
+def pending_minutes(connection, now, max_catchup_minutes=None, name=SCHEDULER_NAME):
+    """未処理の分の範囲を求める（処理位置は進めない）
+
+    Args:
+        connection: DB接続
+        now: 現在日時
+        max_catchup_minutes: さかのぼって処理する最大の分数（環境変数TIMETABLE_MAX_CATCHUP_MINUTES）
+        name: 処理位置の名前（シャードごとに別の処理位置を持つ）
+
+    Returns:
+        tuple: (処理済みの最後の分, 今回処理する最後の分)。処理する分がない場合はNone
+    """
+    max_catchup_minutes = max_catchup_minutes or int(os.environ.get('TIMETABLE_MAX_CATCHUP_MINUTES', '60'))
+    until = now.replace(second=0, microsecond=0)
+    oldest = until - timedelta(minutes=max_catchup_minutes)
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT last_slot_at FROM scheduler_state WHERE name = %s", (name,))
+        row = cursor.fetchone()
+        if row is None:
+            # 初回は現在の分のみを処理する
+            after = until - timedelta(minutes=1)
+            cursor.execute(
+                "INSERT IGNORE INTO scheduler_state (name, last_slot_at) VALUES (%s, %s)",
+                (name, after)
+            )
+            connection.commit()
+            return after, until
+
+        after = row[0]
+        if after >= until:
+            return None
+        if after < oldest:
+            logger.warning(f"未処理の期間が長いため {after} 〜 {oldest} のスロットをスキップします")
+            after = oldest
+        return after, until
+    finally:
+        cursor.close()
+
+
+def advance_minutes(connection, until, name=SCHEDULER_NAME):
+    """タスクの登録が終わった分まで処理位置を進める（後から終わった実行が処理位置を戻さない）
+
+    Args:
+        connection: DB接続
+        until: 処理した最後の分（pending_minutesの戻り値）
+        name: 処理位置の名前
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "UPDATE scheduler_state SET last_slot_at = GREATEST(last_slot_at, %s) WHERE name = %s",
+            (until, name)
+        )
+        connection.commit()
+    finally:
+        cursor.close()
+
+
+def iter_slot_users(connection, ranges, batch_size=500, shard=None):
+    """スロット範囲に含まれるユーザーを逐次取得する
+
+    Args:
+        connection: DB接続
+        ranges: slot_rangesの戻り値
+        batch_size: 1回に読み込む件数
+        shard: 担当するユーザーの分割（sharding.Shard）。省略時は全ユーザー
+
+    Yields:
+        dict: ユーザー情報（slot_of_weekを含む）
+    """
+    if not ranges:
+        return
+
+    conditions = " OR ".join(["t.slot_of_week BETWEEN %s AND %s"] * len(ranges))
+    shard_condition, shard_params = shard.sql_condition('t.user_id') if shard else ("", [])
+    query = f"""
+    SELECT u.user_id, u.last_name, u.first_name, u.phone_number,
+           u.call_time, u.call_weekday, u.call_weekdays_mask,
+           u.call_retry_max_attempts, u.call_retry_interval_minutes, u.call_quiet_start, u.call_quiet_end,
+           t.slot_of_week
+    FROM call_timetable t
+    JOIN users u ON u.user_id = t.user_id
+    WHERE ({conditions}){shard_condition}
+    """
+    params = [value for slot_range in ranges for value in slot_range] + shard_params
+
+    cursor = connection.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+    finally:
+        cursor.close()
+
+
+def slot_datetime(slot, after):
+    """スロットが after の次の分以降で最初に該当する日時（発信予定日時）を求める"""
+    first = after + timedelta(minutes=1)
+    offset = (slot - slot_of_week(first)) % MINUTES_PER_WEEK
+    return first + timedelta(minutes=offset)
+
+
+def format_range(after, until):
+    """ログ出力用の範囲表記"""
+    return f"{(after + timedelta(minutes=1)).strftime('%a %H:%M')} 〜 {until.strftime('%a %H:%M')}"
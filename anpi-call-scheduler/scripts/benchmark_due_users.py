@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+即時実行対象ユーザー抽出のベンチマーク
+
+合成ユーザー（デフォルト100万件）を投入した検証用データベースで、次の2つの方式を比較する。
+
+- python: 発信設定のある全ユーザーを取得し、Pythonでshould_call_nowを評価（従来の方式）
+- sql   : 曜日・時刻の範囲をSQLで絞り込み、バッファリングしないカーソルで逐次取得（iter_due_users）
+
+日付をまたぐ時刻を含む複数の基準時刻で計測し、両方式の抽出結果が一致することも確認する。
+スキーマの作成と合成データの投入は anpi-call-db/test/explain_check.py を利用する。
+
+使い方:
+    # ローカルMySQL（例: docker run -e MYSQL_ROOT_PASSWORD=root -p 3306:3306 mysql:8.0）
+    pip install -r cloud-run-jobs/requirements.txt
+    python scripts/benchmark_due_users.py --users 1000000
+
+環境変数:
+    MYSQL_HOST / MYSQL_PORT / MYSQL_USER / MYSQL_PASSWORD : 接続先（デフォルト: 127.0.0.1:3306 root/root）
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tracemalloc
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "cloud-run-jobs"))
+sys.path.insert(0, os.path.join(os.path.dirname(BASE_DIR), "anpi-call-db", "test"))
+
+import explain_check  # noqa: E402
+
+# 基準時刻（2025-07-01は火曜日）。日付をまたぐ範囲を含める
+SAMPLE_TIMES = [
+    datetime(2025, 7, 1, 9, 0, 0),
+    datetime(2025, 7, 1, 18, 30, 0),
+    datetime(2025, 7, 1, 0, 2, 0),
+    datetime(2025, 7, 1, 23, 58, 0),
+]
+
+
+def measure(func):
+    """処理時間とPythonヒープの最大確保量を計測"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="即時実行対象ユーザー抽出のベンチマーク")
+    parser.add_argument("--database", default="anpi_due_users_bench", help="検証用データベース名（実行ごとに作り直す）")
+    parser.add_argument("--users", type=int, default=1000000, help="投入するユーザー数")
+    parser.add_argument("--batch-size", type=int, default=5000, help="一括INSERTの件数")
+    parser.add_argument("--tolerance", type=int, default=5, help="許容時間（分）")
+    parser.add_argument("--keep", action="store_true", help="計測後にデータベースを削除しない")
+    args = parser.parse_args()
+
+    explain_check.setup_schema(args.database)
+    explain_check.seed(args.database, args.users, 0, args.batch_size)
+
+    # スケジューラーの接続先を検証用データベースに向ける
+    os.environ.update({
+        "DB_HOST": os.getenv("MYSQL_HOST", "127.0.0.1"),
+        "DB_PORT": os.getenv("MYSQL_PORT", "3306"),
+        "DB_USER": os.getenv("MYSQL_USER", "root"),
+        "DB_PASSWORD": os.getenv("MYSQL_PASSWORD", "root"),
+        "DB_NAME": args.database,
+    })
+    import main as scheduler
+    # ユーザーごとのデバッグログで計測がぶれないようにする
+    scheduler.logger.setLevel(logging.WARNING)
+
+    def python_filter(now):
+        return [
+            user for user in scheduler.get_users_from_db()
+            if scheduler.should_call_now(user["call_weekdays_mask"], user["call_time"], args.tolerance, now)
+        ]
+
+    def sql_filter(now):
+        return list(scheduler.iter_due_users(now, args.tolerance))
+
+    print(f"{'now':<20}{'method':<8}{'due':>8}{'seconds':>10}{'peak MiB':>10}")
+    mismatches = 0
+    for now in SAMPLE_TIMES:
+        results = {}
+        for name, func in (("python", python_filter), ("sql", sql_filter)):
+            users, elapsed, peak = measure(lambda: func(now))
+            results[name] = {user["user_id"] for user in users}
+            print(f"{now.strftime('%a %H:%M'):<20}{name:<8}{len(users):>8}{elapsed:>10.3f}{peak / 1024 / 1024:>10.1f}")
+        if results["python"] != results["sql"]:
+            mismatches += 1
+            print(f"      - 抽出結果が一致しません（python: {len(results['python'])}件, sql: {len(results['sql'])}件）")
+
+    if not args.keep:
+        conn = explain_check.connect()
+        conn.cursor().execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+        conn.close()
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
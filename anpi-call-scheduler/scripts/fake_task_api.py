@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+タスクAPI（anpi-cloud-run の /enqueue-task）の模擬サーバー
+
+スケジューラーのシミュレーション・負荷確認用。Cloud Tasksにはタスクを登録せず、受け付けたリクエストを記録する。
+本物と同じく task_id が同じリクエストは二重に登録せず status=duplicate を返す。
+応答の遅延（--latency-ms）と一時的なエラー（--error-rate、503を返す）を指定できる。
+
+使い方:
+    # 単体で起動し、スケジューラーの TASK_API_BASE_URL に指定する
+    python scripts/fake_task_api.py --port 8085
+    TASK_API_BASE_URL=http://127.0.0.1:8085 python cloud-run-jobs/main.py  # Authorizationヘッダーは検証しない
+
+    # simulate_scheduler.py からはスレッドで起動して利用する
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeTaskApi:
+    """受け付けたタスクを記録する模擬タスクAPI"""
+
+    def __init__(self, latency_ms=0.0, error_rate=0.0, seed=42):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.tasks = {}  # task_id -> 記録
+        self.duplicates = 0
+        self.errors = 0
+        self.requests = 0
+        # シミュレーションの仮想時刻（simulate_scheduler.py が実行ごとに設定する）
+        self.virtual_now = None
+        self._server = None
+
+    @staticmethod
+    def scheduled_at_of(task_id):
+        """タスクIDから発信予定日時を取り出す（ledger.task_id_for の末尾 YYYYMMDDHHMM）"""
+        try:
+            return datetime.strptime(task_id[-12:], '%Y%m%d%H%M')
+        except (TypeError, ValueError):
+            return None
+
+    def enqueue(self, payload):
+        """/enqueue-task の処理。(HTTPステータス, レスポンス) を返す"""
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+        with self._lock:
+            self.requests += 1
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.errors += 1
+                return 503, {"detail": "simulated error"}
+
+            task_id = payload.get("task_id") or f"anonymous-{self.requests}"
+            if task_id in self.tasks:
+                self.duplicates += 1
+                return 200, {"task_name": task_id, "status": "duplicate", "scheduled_time": None}
+
+            self.tasks[task_id] = {
+                "user_id": payload.get("user_id"),
+                "phone_number": payload.get("recipient_phone_number"),
+                "delay_seconds": int(payload.get("delay_seconds") or 0),
+                "scheduled_at": self.scheduled_at_of(task_id),
+                "enqueued_at": self.virtual_now,
+            }
+        return 200, {"task_name": task_id, "status": "enqueued", "scheduled_time": None}
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != "/enqueue-task":
+                    self._respond(404, {"detail": "Not Found"})
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._respond(400, {"detail": "invalid json"})
+                    return
+                self._respond(*api.enqueue(payload))
+
+            def do_GET(self):
+                if self.path == "/health":
+                    self._respond(200, {"status": "healthy"})
+                else:
+                    self._respond(404, {"detail": "Not Found"})
+
+            def _respond(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self, host="127.0.0.1", port=0):
+        """バックグラウンドのスレッドで起動し、ベースURLを返す（port=0は空きポート）"""
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="タスクAPIの模擬サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8085)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="応答の遅延（ミリ秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="503を返す割合（0〜1）")
+    args = parser.parse_args()
+
+    api = FakeTaskApi(latency_ms=args.latency_ms, error_rate=args.error_rate)
+    base_url = api.start(args.host, args.port)
+    print(f"模擬タスクAPIを起動しました: {base_url}/enqueue-task")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.stop()
+        print(f"受付: {api.requests}件, 登録: {len(api.tasks)}件, 重複: {api.duplicates}件, エラー: {api.errors}件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+スケジューラーのシミュレーション
+
+検証用データベースに合成ユーザーを一括投入し、仮想時刻で1日分（--hours で変更可）のスケジューラー実行を
+模擬タスクAPI（fake_task_api.py）に対して行い、次の値を出力する。
+
+- users evaluated/sec : 1回の実行で全ユーザーの発信要否を判定したとみなした、1秒あたりの判定ユーザー数
+                        （ユーザー数 × 実行回数 ÷ 実行時間の合計）
+- enqueue latency     : タスクAPI呼び出し1回の応答時間（p50/p95/p99）
+- call lateness       : 発信予定時刻から、登録時刻＋遅延時間（平準化後の発信時刻）までの遅れ
+- missed              : 実行対象範囲内の発信予定のうち、タスクが登録されなかった件数
+- doubled             : 同じ発信予定に2件以上のタスクが登録された件数
+                        （タスク名の重複で拒否されたリクエスト数も別に出力する）
+- unexpected          : 発信予定ではない日時に登録されたタスクの件数
+
+スケジューラー（cloud-run-jobs/main.py）は仮想時刻を now として create_immediate_tasks を呼び出す。
+DB（発信台帳・timetableモードの処理位置を含む）と並列登録・平準化は本番と同じ処理を使う。
+発信の平準化の容量（CALLS_PER_SECOND / MAX_CONCURRENT_CALLS など）は本番と同じ環境変数で指定する。
+スキーマの作成は anpi-call-db/test/explain_check.py を利用する。
+
+使い方:
+    # ローカルMySQL（例: docker run -e MYSQL_ROOT_PASSWORD=root -p 3306:3306 mysql:8.4 --local-infile=1）
+    pip install -r cloud-run-jobs/requirements.txt
+    python scripts/simulate_scheduler.py --users 100000 --mode window --interval 5
+    python scripts/simulate_scheduler.py --users 1000000 --bulk-load --mode timetable --interval 1 --shards 4
+
+環境変数:
+    MYSQL_HOST / MYSQL_PORT / MYSQL_USER / MYSQL_PASSWORD : 接続先（デフォルト: 127.0.0.1:3306 root/root）
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import uuid
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta, time as dt_time
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "cloud-run-jobs"))
+sys.path.insert(0, os.path.join(os.path.dirname(BASE_DIR), "anpi-call-db", "test"))
+
+import explain_check  # noqa: E402
+from fake_task_api import FakeTaskApi  # noqa: E402
+
+WEEKDAY_CODES = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+USER_COLUMNS = ("user_id", "last_name", "first_name", "phone_number", "call_time", "call_weekday", "call_weekdays_mask")
+
+# 2025-07-01は火曜日
+DEFAULT_START = "2025-07-01T00:00"
+
+
+def connect(database=None, allow_local_infile=False):
+    return mysql.connector.connect(
+        host=os.getenv("MYSQL_HOST", "127.0.0.1"),
+        port=int(os.getenv("MYSQL_PORT", "3306")),
+        user=os.getenv("MYSQL_USER", "root"),
+        password=os.getenv("MYSQL_PASSWORD", "root"),
+        database=database,
+        allow_local_infile=allow_local_infile,
+    )
+
+
+def synthetic_users(count, seed=42, round_ratio=0.5):
+    """合成ユーザーの行を生成する
+
+    round_ratio の割合のユーザーは 8〜20時のちょうど（xx:00）を希望時刻にし、発信の集中を再現する。
+    曜日は 1曜日のみ 60% / 平日 20% / 毎日 10% / 月水金 10%。
+    """
+    rng = random.Random(seed)
+    for i in range(count):
+        if rng.random() < round_ratio:
+            call_time = dt_time(rng.randint(8, 20), 0)
+        else:
+            call_time = dt_time(rng.randint(7, 20), rng.randint(0, 59))
+
+        p = rng.random()
+        if p < 0.6:
+            mask = 1 << rng.randrange(7)
+        elif p < 0.8:
+            mask = 0b0011111
+        elif p < 0.9:
+            mask = 0b1111111
+        else:
+            mask = 0b0010101
+
+        yield (
+            str(uuid.UUID(int=rng.getrandbits(128))),
+            "シミュ", f"利用者{i}",
+            f"090{rng.randint(0, 99999999):08d}",
+            call_time,
+            WEEKDAY_CODES[(mask & -mask).bit_length() - 1],
+            mask,
+        )
+
+
+def _load_csv(cursor, rows):
+    """LOAD DATA LOCAL INFILE で一括投入する"""
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", encoding="utf-8", delete=False) as f:
+        csv.writer(f, lineterminator="\n").writerows(rows)
+        path = f.name
+    try:
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE users CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\\n' "
+            f"({', '.join(USER_COLUMNS)})",
+            (path,)
+        )
+    finally:
+        os.unlink(path)
+
+
+def generate_users(database, count, batch_size, bulk_load=False, seed=42, round_ratio=0.5):
+    """合成ユーザーをバッチで投入する
+
+    Args:
+        bulk_load: TrueならLOAD DATA LOCAL INFILE（サーバーの local_infile=ON が必要）、
+                   失敗した場合とFalseの場合はexecutemany
+
+    Returns:
+        tuple: ([(user_id, 希望時刻（分）, 曜日マスク), ...], 投入方式, 秒数)
+    """
+    conn = connect(database, allow_local_infile=bulk_load)
+    cursor = conn.cursor()
+    insert_sql = (
+        f"INSERT INTO users ({', '.join(USER_COLUMNS)}) "
+        f"VALUES ({', '.join(['%s'] * len(USER_COLUMNS))})"
+    )
+    method = "load-data" if bulk_load else "executemany"
+
+    def flush(rows):
+        nonlocal method
+        if method == "load-data":
+            try:
+                _load_csv(cursor, rows)
+                conn.commit()
+                return
+            except mysql.connector.Error as e:
+                print(f"LOAD DATA LOCAL INFILE が使えないため executemany で投入します: {e}")
+                conn.rollback()
+                method = "executemany"
+        cursor.executemany(insert_sql, rows)
+        conn.commit()
+
+    truth = []
+    rows = []
+    started = time.perf_counter()
+    for row in synthetic_users(count, seed, round_ratio):
+        rows.append(row)
+        truth.append((row[0], row[4].hour * 60 + row[4].minute, row[6]))
+        if len(rows) >= batch_size:
+            flush(rows)
+            rows = []
+    if rows:
+        flush(rows)
+    elapsed = time.perf_counter() - started
+
+    for table in ("users", "call_timetable"):
+        cursor.execute(f"ANALYZE TABLE {table}")
+        cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return truth, method, elapsed
+
+
+class VirtualClock:
+    """スケジューラーの実行時刻（仮想時刻）を生成する
+
+    Cloud Schedulerの起動時刻 start, start+interval, ... に、ジョブの起動遅延 offset_seconds を加えた時刻を返す
+    """
+
+    def __init__(self, start, interval_minutes, duration, offset_seconds=0):
+        self.start = start
+        self.interval = timedelta(minutes=interval_minutes)
+        self.end = start + duration
+        self.offset = timedelta(seconds=offset_seconds)
+
+    def __iter__(self):
+        tick = self.start
+        while tick < self.end:
+            yield tick + self.offset
+            tick += self.interval
+
+
+def occurrences(truth, first, last):
+    """[first, last] に含まれる発信予定 (user_id, 日時) の集合"""
+    result = set()
+    day = first.date()
+    while day <= last.date():
+        bit = 1 << day.weekday()
+        midnight = datetime.combine(day, dt_time.min)
+        for user_id, minute, mask in truth:
+            if mask & bit:
+                scheduled_at = midnight + timedelta(minutes=minute)
+                if first <= scheduled_at <= last:
+                    result.add((user_id, scheduled_at))
+        day += timedelta(days=1)
+    return result
+
+
+def percentile(values, ratio):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(ratio * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="スケジューラーのシミュレーション")
+    parser.add_argument("--database", default="anpi_scheduler_simulation", help="検証用データベース名（実行ごとに作り直す）")
+    parser.add_argument("--users", type=int, default=100000, help="合成ユーザー数")
+    parser.add_argument("--batch-size", type=int, default=10000, help="一括投入の件数")
+    parser.add_argument("--bulk-load", action="store_true", help="LOAD DATA LOCAL INFILEで投入する")
+    parser.add_argument("--round-ratio", type=float, default=0.5, help="ちょうどの時刻（xx:00）を希望するユーザーの割合")
+    parser.add_argument("--mode", choices=["window", "timetable"], default="window", help="SCHEDULER_MODE")
+    parser.add_argument("--start", default=DEFAULT_START, help="仮想時刻の開始（ISO形式）")
+    parser.add_argument("--hours", type=float, default=24, help="シミュレーションする時間数")
+    parser.add_argument("--interval", type=int, default=5, help="スケジューラーの実行間隔（分）")
+    parser.add_argument("--offset-seconds", type=int, default=5, help="Cloud Schedulerの起動からジョブ実行までの遅れ（秒）")
+    parser.add_argument("--tolerance", type=int, default=5, help="IMMEDIATE_CALL_TOLERANCE_MINUTES（windowモード）")
+    parser.add_argument("--shards", type=int, default=1, help="並列に実行するシャード数")
+    parser.add_argument("--api-latency-ms", type=float, default=20.0, help="模擬タスクAPIの応答遅延（ミリ秒）")
+    parser.add_argument("--api-error-rate", type=float, default=0.0, help="模擬タスクAPIが503を返す割合")
+    parser.add_argument("--json", help="結果をJSONで保存するファイル")
+    parser.add_argument("--keep", action="store_true", help="終了後にデータベースを削除しない")
+    args = parser.parse_args()
+
+    explain_check.setup_schema(args.database)
+    truth, method, generate_seconds = generate_users(
+        args.database, args.users, args.batch_size, args.bulk_load, round_ratio=args.round_ratio
+    )
+    print(f"合成ユーザー投入: {args.users}件 / {generate_seconds:.1f}秒 "
+          f"({args.users / generate_seconds:,.0f}件/秒, {method})")
+
+    api = FakeTaskApi(latency_ms=args.api_latency_ms, error_rate=args.api_error_rate)
+    base_url = api.start()
+
+    # スケジューラーの接続先を検証用データベースと模擬タスクAPIに向ける（main のimport前に設定する）
+    os.environ.update({
+        "DB_HOST": os.getenv("MYSQL_HOST", "127.0.0.1"),
+        "DB_PORT": os.getenv("MYSQL_PORT", "3306"),
+        "DB_USER": os.getenv("MYSQL_USER", "root"),
+        "DB_PASSWORD": os.getenv("MYSQL_PASSWORD", "root"),
+        "DB_NAME": args.database,
+        "TASK_API_BASE_URL": base_url,
+        "TASK_API_BACKOFF_SECONDS": os.getenv("TASK_API_BACKOFF_SECONDS", "0.05"),
+        "SCHEDULER_MODE": args.mode,
+        "IMMEDIATE_CALL_TOLERANCE_MINUTES": str(args.tolerance),
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "warning"),
+    })
+    import main as scheduler
+    import dispatcher
+    from id_token_provider import IdTokenProvider
+
+    # 模擬タスクAPIは認証を検証しないため、固定のトークンを使う
+    scheduler.id_token_provider = IdTokenProvider(base_url, source=lambda audience: "simulation")
+
+    enqueue_latencies = []
+    dispatcher.get_http_session().hooks["response"].append(
+        lambda response, *hook_args, **hook_kwargs: enqueue_latencies.append(response.elapsed.total_seconds())
+    )
+
+    start = datetime.fromisoformat(args.start)
+    clock = VirtualClock(start, args.interval, timedelta(hours=args.hours), args.offset_seconds)
+    shards = [scheduler.Shard(index, args.shards) for index in range(args.shards)]
+
+    tick_seconds = []
+    run_errors = 0
+    ticks = []
+    with ThreadPoolExecutor(max_workers=args.shards) as executor:
+        for now in clock:
+            api.virtual_now = now
+            started = time.perf_counter()
+            futures = [executor.submit(scheduler.create_immediate_tasks, now, shard) for shard in shards]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    run_errors += 1
+                    print(f"{now.isoformat()} の実行でエラーが発生: {e}")
+            tick_seconds.append(time.perf_counter() - started)
+            ticks.append(now)
+    api.stop()
+
+    # 期待値: 実行対象範囲に入った発信予定（windowモードは前後の許容時間、timetableモードは各実行の分まで）
+    first, last = ticks[0].replace(second=0, microsecond=0), ticks[-1].replace(second=0, microsecond=0)
+    if args.mode == "window":
+        first, last = first - timedelta(minutes=args.tolerance), last + timedelta(minutes=args.tolerance)
+    expected = occurrences(truth, first, last)
+    possible = occurrences(truth, first - timedelta(days=1), last + timedelta(days=1))
+
+    accepted = {}
+    lateness = []
+    for task in api.tasks.values():
+        key = (task["user_id"], task["scheduled_at"])
+        accepted[key] = accepted.get(key, 0) + 1
+        if task["enqueued_at"] is not None and task["scheduled_at"] is not None:
+            called_at = task["enqueued_at"] + timedelta(seconds=task["delay_seconds"])
+            lateness.append((called_at - task["scheduled_at"]).total_seconds())
+
+    missed = len(expected - accepted.keys())
+    doubled = sum(1 for count in accepted.values() if count > 1)
+    unexpected = sum(1 for key in accepted if key not in possible)
+    wall_seconds = sum(tick_seconds)
+
+    report = {
+        "mode": args.mode,
+        "users": args.users,
+        "shards": args.shards,
+        "runs": len(ticks),
+        "interval_minutes": args.interval,
+        "generate_users_per_sec": round(args.users / generate_seconds),
+        "wall_seconds": round(wall_seconds, 2),
+        "run_seconds_p50": round(percentile(tick_seconds, 0.50), 3),
+        "run_seconds_max": round(max(tick_seconds), 3),
+        "users_evaluated_per_sec": round(args.users * len(ticks) / wall_seconds) if wall_seconds else None,
+        "enqueued": len(api.tasks),
+        "enqueued_per_sec": round(len(api.tasks) / wall_seconds, 1) if wall_seconds else None,
+        "enqueue_latency_ms_p50": round(percentile(enqueue_latencies, 0.50) * 1000, 1) if enqueue_latencies else None,
+        "enqueue_latency_ms_p95": round(percentile(enqueue_latencies, 0.95) * 1000, 1) if enqueue_latencies else None,
+        "enqueue_latency_ms_p99": round(percentile(enqueue_latencies, 0.99) * 1000, 1) if enqueue_latencies else None,
+        "call_lateness_seconds_p50": percentile(lateness, 0.50),
+        "call_lateness_seconds_p95": percentile(lateness, 0.95),
+        "call_lateness_seconds_max": max(lateness) if lateness else None,
+        "expected": len(expected),
+        "missed": missed,
+        "doubled": doubled,
+        "unexpected": unexpected,
+        "duplicate_requests_rejected": api.duplicates,
+        "api_errors": api.errors,
+        "run_errors": run_errors,
+    }
+
+    print()
+    for key, value in report.items():
+        print(f"{key:<32}{value}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if not args.keep:
+        conn = connect()
+        conn.cursor().execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+        conn.close()
+
+    if missed or doubled or unexpected:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,14 @@ import os
 import json
 import base64
 import asyncio
+import time
 import logging
 from datetime import date, datetime
 from typing import Dict, Any, Optional
 import websockets
 from websockets.protocol import State
 from agents.event_agent import EventAgent
+from analysis.live_risk_monitor import LiveRiskMonitor
 from models.openai_event_types import OpenAIEventType
 from models.server_event_types import ServerEventType
 from repositories.cloudsql_user_repository import CloudSQLUserRepository
@@ -87,21 +89,31 @@ class CallAgent:
                 - イベントを探すときは、search_events関数でイベント情報を検索する
                 - ツール呼び出し前に「少々お待ちください」など一言添える"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        user_repository: Optional[CloudSQLUserRepository] = None,
+        transcription_repository: Optional[FirestoreTranscriptionRepository] = None,
+        event_agent: Optional[EventAgent] = None,
+    ):
         self.name = "通話エージェント"
         self.user_id = None
         # CloudSQLUserRepositoryを使用
-        self.user_repository = CloudSQLUserRepository()
-        # FirestoreTranscriptionRepositoryを使用
-        self.transcription_repository = FirestoreTranscriptionRepository()
+        self.user_repository = user_repository or CloudSQLUserRepository()
+        # FirestoreTranscriptionRepositoryを使用（Firestoreクライアントはプロセスで共有）
+        self.transcription_repository = transcription_repository or FirestoreTranscriptionRepository()
         self.user: Optional[User] = None
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.openai_ws: Optional[Any] = None
-        self.event_agent = EventAgent()
+        self.event_agent = event_agent or EventAgent()
         self.conversation_history = []
         self.accumulated_audio = bytearray()
         self.session_ready = False
         self.last_assistant_item = None
+        # 通話中のリアルタイム危険検知（ユーザーIDが分かる通話のみ）
+        self.live_risk_enabled = os.getenv("LIVE_RISK_ENABLED", "true").lower() == "true"
+        self.risk_monitor: Optional[LiveRiskMonitor] = None
+        # 発話終了時刻（item_idごと）。危険検知の遅延計測に使用
+        self.speech_stopped_at: Dict[str, float] = {}
         self.logger = logging.getLogger(
             f"{__name__}.{self.__class__.__name__}")
 
@@ -335,11 +347,21 @@ class CallAgent:
 
         elif event_type == OpenAIEventType.CONVERSATION_ITEM_INPUT_AUDIO_TRANSCRIPTION_COMPLETED:
             user_transcript = event.get("transcript", "")
+            spoken_at = self.speech_stopped_at.pop(event.get("item_id"), None)
             if user_transcript:
+                # 危険検知は辞書判定のみ同期で行い、通知は非同期で送信される
+                if self.risk_monitor:
+                    self.risk_monitor.observe(user_transcript, spoken_at)
+
                 # Firestoreリポジトリに文字起こしを追加（自動保存付き）
                 await self.transcription_repository.add_transcription("user", user_transcript)
                 self.logger.info(f"User transcription: {user_transcript}")
 
+        elif event_type == OpenAIEventType.INPUT_AUDIO_BUFFER_SPEECH_STOPPED:
+            item_id = event.get("item_id")
+            if item_id and self.risk_monitor:
+                self.speech_stopped_at[item_id] = time.perf_counter()
+
         elif event_type == OpenAIEventType.RESPONSE_DONE:
             # Reset last_assistant_item when response is complete
             self.last_assistant_item = None
@@ -431,6 +453,8 @@ class CallAgent:
 
         if user_id:
             self.user_id = user_id
+            if self.live_risk_enabled:
+                self.risk_monitor = LiveRiskMonitor(user_id, call_sid)
             # ユーザー情報を取得
             self.user = await self.user_repository.get_user_by_id(user_id)
             if self.user:
@@ -461,6 +485,10 @@ class CallAgent:
         # Firestoreリポジトリのリソースをクリーンアップ（自動的に最終保存される）
         await self.transcription_repository.close()
 
+        # 送信中の通話中アラートを待機
+        if self.risk_monitor:
+            await self.risk_monitor.close()
+
         # OpenAI WebSocket接続をクローズ
         if self.openai_ws and self.openai_ws.state != State.CLOSED:
             await self.openai_ws.close()
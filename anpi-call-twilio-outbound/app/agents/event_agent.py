@@ -1,5 +1,5 @@
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from agents.event_selector_agent import EventSelectorAgent
 from models.schemas import User
 from repositories.cloudsql_event_repository import CloudSQLEventRepository
@@ -11,11 +11,13 @@ logger = logging.getLogger(__name__)
 class EventAgent:
     """高齢者におすすめのイベントを提案するエージェント"""
 
-    def __init__(self, event_data_path: str = None, max_filter_count: int = 100):
+    def __init__(self, event_data_path: str = None, max_filter_count: int = 100,
+                 event_selector: Optional[EventSelectorAgent] = None,
+                 event_repository: Optional[CloudSQLEventRepository] = None):
         self.name = "イベント提案エージェント"
-        self.event_selector = EventSelectorAgent()
+        self.event_selector = event_selector or EventSelectorAgent()
         # CloudSQLEventRepositoryを使用
-        self.event_repository = CloudSQLEventRepository()
+        self.event_repository = event_repository or CloudSQLEventRepository()
         self.max_filter_count = max_filter_count
 
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -1,9 +1,10 @@
 import logging
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from datetime import date
 from models.schemas import User, Event
 from openai import OpenAI
+from utils.clients import clients
 
 logger = logging.getLogger(__name__)
 
@@ -11,10 +12,11 @@ logger = logging.getLogger(__name__)
 class EventSelectorAgent:
     """イベント選定専門エージェント - OpenAI APIを使用"""
 
-    def __init__(self):
+    def __init__(self, client: Optional[OpenAI] = None):
         self.name = "イベント選定エージェント"
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        self.client = OpenAI(api_key=self.openai_api_key) if OpenAI else None
+        # OpenAIクライアントはプロセスで共有する
+        self.client = client or (clients.openai() if OpenAI else None)
 
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         logger.info(f"Event selector input: {input_data}")
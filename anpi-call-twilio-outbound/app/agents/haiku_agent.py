@@ -1,15 +1,18 @@
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from openai import OpenAI
+from utils.clients import clients
 
 
 class HaikuAgent:
     """俳句を作成するエージェント"""
 
-    def __init__(self):
+    def __init__(self, client: Optional[OpenAI] = None):
         self.name = "俳句エージェント"
-        if OpenAI:
-            self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        if client:
+            self.client = client
+        elif OpenAI:
+            self.client = clients.openai()
         else:
             self.client = None
 
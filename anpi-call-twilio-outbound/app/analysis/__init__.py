@@ -1,5 +1,6 @@
 """Analysis modules for call checking."""
 
 from .check_call import CallChecker
+from .live_risk_monitor import LiveRiskMonitor
 
-__all__ = ["CallChecker"]
\ No newline at end of file
+__all__ = ["CallChecker", "LiveRiskMonitor"]
\ No newline at end of file
@@ -4,14 +4,16 @@ import os
 import logging
 from datetime import datetime, timedelta
 from typing import List, Optional
-from openai import OpenAI
+from openai import AsyncOpenAI
 from pydantic import BaseModel
 
 from repositories.firestore_call_repository import FirestoreCallRepository
 from repositories.firestore_call_check_repository import FirestoreCallCheckRepository
-from repositories.webhook_notification_repository import WebhookNotificationRepository
+from notification.policy import NotificationPolicy, ACTION_SUPPRESS, ACTION_DIGEST
 from models.call import Call
 from models.call_check import CallCheckResult, OpenAICallAnalysisResult, SeverityLevel, Evidence
+from utils.transcript_compactor import TranscriptCompactor, CallTranscript, Utterance
+from utils.clients import clients
 
 logger = logging.getLogger(__name__)
 
@@ -19,15 +21,30 @@ logger = logging.getLogger(__name__)
 class CallChecker:
     """通話内容をチェックするクラス"""
 
-    def __init__(self, project_id: Optional[str] = None):
+    def __init__(
+        self,
+        project_id: Optional[str] = None,
+        call_repository: Optional[FirestoreCallRepository] = None,
+        check_repository: Optional[FirestoreCallCheckRepository] = None,
+        notification_policy: Optional[NotificationPolicy] = None,
+        openai_client: Optional[AsyncOpenAI] = None,
+    ):
         """
         Args:
             project_id: GCPプロジェクトID
+            call_repository: 通話データリポジトリ
+            check_repository: チェック結果リポジトリ
+            notification_policy: 通知ポリシーエンジン
+            openai_client: OpenAIの非同期クライアント（省略時はプロセス共有のクライアント）
         """
-        self.call_repository = FirestoreCallRepository(project_id)
-        self.check_repository = FirestoreCallCheckRepository(project_id)
-        self.notification_repository = WebhookNotificationRepository()
-        self.openai_client = OpenAI()
+        self.call_repository = call_repository or FirestoreCallRepository(project_id)
+        self.check_repository = check_repository or FirestoreCallCheckRepository(project_id)
+        self.notification_policy = notification_policy or NotificationPolicy()
+        # 発信サービスのイベントループ（通話の音声中継）を止めないよう非同期クライアントを使う
+        self.openai_client = openai_client or clients.async_openai()
+        # 分析プロンプトの会話履歴部分に割り当てるトークン数
+        self.compactor = TranscriptCompactor(
+            token_budget=int(os.getenv("ANALYSIS_PROMPT_TOKEN_BUDGET", "6000")))
 
     async def check_user_calls(self, user_id: str, n: Optional[int] = 10, save_result: bool = True) -> tuple[CallCheckResult, Optional[str]]:
         """
@@ -73,12 +90,20 @@ class CallChecker:
             )
 
             check_id = None
+            save_error = None
             if save_result:
-                check_id = await self.check_repository.save_check_result(user_id, result)
+                try:
+                    check_id = await self.check_repository.save_check_result(user_id, result)
+                except Exception as e:
+                    # 保存（集計の更新）に失敗しても、分析できた結果の通知は送る（ジョブは再試行して保存し直す）
+                    logger.error(f"チェック結果保存エラー（通知は送信します） user_id: {user_id}, error: {e}")
+                    save_error = e
 
             # 異常時の通知送信
             await self._send_notification_if_needed(user_id, result)
 
+            if save_error is not None:
+                result.error = f"チェック結果の保存に失敗しました: {save_error}"
             return result, check_id
 
         except Exception as e:
@@ -89,13 +114,16 @@ class CallChecker:
                 detected_issues=[],
                 evidence=[],
                 source_calls=[],
-                analyzed_at=datetime.now()
+                analyzed_at=datetime.now(),
+                error=str(e)
             )
 
             check_id = None
             if save_result:
                 try:
-                    check_id = await self.check_repository.save_check_result(user_id, result)
+                    # 分析できなかった結果で最新の重要度を上書きしないよう集計は更新しない
+                    check_id = await self.check_repository.save_check_result(
+                        user_id, result, update_rollups=False)
                 except:
                     pass  # エラー時は保存失敗しても続行
 
@@ -114,7 +142,7 @@ class CallChecker:
             logger.debug("=== OpenAI分析プロンプト終了 ===")
 
             # OpenAI APIを呼び出し（Pydantic response_formatを使用）
-            response = self.openai_client.beta.chat.completions.parse(
+            response = await self.openai_client.beta.chat.completions.parse(
                 model="gpt-4o-mini",
                 messages=[
                     {
@@ -170,29 +198,39 @@ severity_levelを判定してください。
             return response.choices[0].message.parsed
 
         except Exception as e:
+            # 通常として返すと最新の重要度が上書きされるため、呼び出し元のエラー処理（集計を更新しない）に任せる
             logger.error(f"OpenAI分析エラー: {e}")
-            return OpenAICallAnalysisResult(
-                reason="分析中にエラーが発生しました",
-                severity_level=SeverityLevel.NORMAL,
-                detected_issues=[],
-                evidence=[]
-            )
+            raise
 
     def _create_analysis_prompt(self, calls: List[Call]) -> str:
-        """分析用のプロンプトを作成"""
+        """分析用のプロンプトを作成（会話履歴はトークン予算内に圧縮）"""
         prompt_parts = ["以下の通話内容を分析してください。発言を引用する際は、必ず通話IDを含めてください：\n"]
 
-        # 古い順に並び替え（時系列順）
-        sorted_calls = sorted(calls, key=lambda c: c.call_started_at)
+        transcripts = [
+            CallTranscript(
+                call_id=call.call_id,
+                started_at=call.call_started_at,
+                utterances=[Utterance(msg.speaker, msg.text)
+                            for msg in call.transcriptions]
+            )
+            for call in calls
+        ]
+
+        # 圧縮結果は古い順（時系列順）で返る
+        compacted_calls = self.compactor.compact(transcripts)
 
-        for i, call in enumerate(sorted_calls, 1):
-            call_date = call.call_started_at.strftime("%Y-%m-%d %H:%M")
+        for i, call in enumerate(compacted_calls, 1):
+            call_date = call.started_at.strftime("%Y-%m-%d %H:%M")
             # 最新の通話かどうかを明示
-            time_note = " (最新)" if i == len(sorted_calls) else ""
+            time_note = " (最新)" if call.is_latest else ""
+            omitted_note = f" ※{call.omitted_count}件の発言を省略" if call.omitted_count else ""
             prompt_parts.append(
-                f"\n【通話 {i}】 通話ID: {call.call_id}, 日時: {call_date}{time_note}")
+                f"\n【通話 {i}】 通話ID: {call.call_id}, 日時: {call_date}{time_note}{omitted_note}")
 
-            for msg in call.transcriptions:
+            for msg in call.utterances:
+                if msg.speaker == "system":
+                    prompt_parts.append(msg.text)
+                    continue
                 speaker_label = "利用者" if msg.speaker == "user" else "オペレーター"
                 prompt_parts.append(f"{speaker_label}: {msg.text}")
 
@@ -214,17 +252,25 @@ severity_levelを判定してください。
 
             # 指定レベル以上の場合のみ通知
             if result.severity_level.level >= min_notification_level.level:
-                notification_result = await self.notification_repository.send_call_check_notification(user_id, result)
+                # 重複抑制・エスカレーション・ダイジェストの判定はポリシーエンジンに委譲
+                notification_result = await self.notification_policy.process(user_id, result)
+                action = notification_result.get("action")
 
-                if notification_result.get("success"):
+                if action == ACTION_SUPPRESS:
+                    logger.info(
+                        f"通知抑制（同一内容を通知済み）: user_id={user_id}, severity_level={result.severity_level}")
+                elif action == ACTION_DIGEST:
+                    logger.info(
+                        f"ダイジェスト通知に追加: user_id={user_id}, severity_level={result.severity_level}")
+                elif notification_result.get("success"):
                     logger.info(
                         f"通知成功: user_id={user_id}, severity_level={result.severity_level}")
                 else:
                     logger.warning(
-                        f"通知失敗: user_id={user_id}, severity_level={result.severity_level}")
+                        f"通知失敗（アウトボックスから再送予定）: user_id={user_id}, severity_level={result.severity_level}, outbox_id={notification_result.get('outbox_id')}")
             else:
                 logger.debug(
-                    f"通知対象外: user_id={user_id}, severity_level={result.severity_level} (対象: {notification_levels})")
+                    f"通知対象外: user_id={user_id}, severity_level={result.severity_level} (対象: {min_level_name}以上)")
 
         except Exception as e:
             logger.error(
@@ -0,0 +1,279 @@
+"""通話中のリアルタイム危険検知
+
+ユーザー発言の文字起こし完了イベントごとに、直近の会話を対象として危険度を逐次判定する。
+
+1. ローカルの辞書（正規表現）で危険兆候を検出（LLM呼び出しなし）
+2. 異常の兆候を検出した場合、または要観察の兆候が一定数たまった場合に、非同期でLLMに直近の会話の再判定を依頼する
+   辞書の一致だけでは「孫が転んだ」「テレビで倒れた人を見た」なども一致するため、LLMで異常と確認できた場合のみ通知する
+   （LLMを無効にした場合は、救急車の要請など明示的な緊急要請（IMMEDIATE_PATTERNS）のみ通知する）
+3. 異常と判定した時点で、通話終了を待たずに通知パイプラインへ送る（1通話につき1回）
+   結果は集計（重要度別インデックス）を更新せずに保存し、ウォッチリストへの反映は通話終了後のチェックで確定する
+"""
+
+import os
+import re
+import time
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Deque, List, Optional, Set, Tuple
+
+from openai import AsyncOpenAI
+
+from models.call_check import CallCheckResult, Evidence, OpenAICallAnalysisResult, SeverityLevel
+from notification.policy import NotificationPolicy
+from repositories.firestore_call_check_repository import FirestoreCallCheckRepository
+from utils.clients import clients
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 危険兆候の辞書（パターン, 重要度, 検出内容）
+RISK_LEXICON: List[Tuple[str, SeverityLevel, str]] = [
+    (r"倒れ", SeverityLevel.ABNORMAL, "転倒・倒れた"),
+    (r"転ん", SeverityLevel.ABNORMAL, "転倒"),
+    (r"(動け|起き上がれ|立て|歩け)(ない|ません|なく)", SeverityLevel.ABNORMAL, "動けない"),
+    (r"(胸|頭|お腹|腹)が(すごく|とても|ひどく)?痛", SeverityLevel.ABNORMAL, "激しい痛み"),
+    (r"(息が苦し|息ができ|呼吸が(苦し|でき))", SeverityLevel.ABNORMAL, "呼吸困難"),
+    (r"救急車", SeverityLevel.ABNORMAL, "救急要請"),
+    (r"(血が(止まら|出て)|吐血)", SeverityLevel.ABNORMAL, "出血"),
+    (r"(死にたい|消えたい|生きていても|自殺)", SeverityLevel.ABNORMAL, "自殺念慮"),
+    (r"(殴られ|叩かれ|蹴られ|お金を(取られ|盗られ))", SeverityLevel.ABNORMAL, "虐待・犯罪被害の疑い"),
+    (r"(ここがどこ|自分の名前が)(か)?(わから|分から)", SeverityLevel.ABNORMAL, "見当識障害"),
+    (r"(食欲が(ない|なく)|食べられ(ない|なく)|ご飯を食べてない)", SeverityLevel.OBSERVATION, "食欲低下"),
+    (r"(眠れ(ない|なく)|寝られ(ない|なく))", SeverityLevel.OBSERVATION, "睡眠障害"),
+    (r"(寂し|さみし|誰とも話して)", SeverityLevel.OBSERVATION, "孤立感"),
+    (r"(物忘れ|忘れっぽ|思い出せ(ない|なく))", SeverityLevel.OBSERVATION, "物忘れ"),
+    (r"(めまい|ふらふら|ふらつ)", SeverityLevel.OBSERVATION, "めまい・ふらつき"),
+    (r"(だるい|しんどい|体が重い)", SeverityLevel.OBSERVATION, "倦怠感"),
+]
+
+# LLMの確認を待たずに通知する明示的な緊急要請
+IMMEDIATE_PATTERNS: List[Tuple[str, str]] = [
+    (r"救急車を?(呼んで|よんで|お願い)", "救急要請"),
+]
+
+# 一致箇所の直後がこれらで始まる場合は否定表現とみなす（例: 「倒れてない」「転んでいません」）
+_NEGATION_PATTERN = re.compile(r"^(て|で)?(い)?(ない|ません|なかった|ませんでした|はいない|はいません)")
+
+_COMPILED_LEXICON = [(re.compile(pattern), level, label) for pattern, level, label in RISK_LEXICON]
+_COMPILED_IMMEDIATE = [(re.compile(pattern), label) for pattern, label in IMMEDIATE_PATTERNS]
+
+
+@dataclass
+class RiskSignal:
+    """辞書で検出した危険兆候"""
+    label: str
+    severity_level: SeverityLevel
+    statement: str
+
+
+def match_risk_signals(text: str) -> List[RiskSignal]:
+    """
+    発言から危険兆候を検出
+
+    Args:
+        text: ユーザーの発言
+
+    Returns:
+        List[RiskSignal]: 検出した兆候（否定表現は除外）
+    """
+    signals = []
+    for pattern, level, label in _COMPILED_LEXICON:
+        for match in pattern.finditer(text):
+            if _NEGATION_PATTERN.match(text[match.end():]):
+                continue
+            signals.append(RiskSignal(label, level, text))
+            break
+    return signals
+
+
+def match_immediate_signals(text: str) -> List[RiskSignal]:
+    """発言から明示的な緊急要請を検出（LLMの確認なしで通知する）"""
+    signals = []
+    for pattern, label in _COMPILED_IMMEDIATE:
+        match = pattern.search(text)
+        # 「救急車を呼んでない」などの否定表現は除外
+        if match and not _NEGATION_PATTERN.match(text[match.end():]):
+            signals.append(RiskSignal(label, SeverityLevel.ABNORMAL, text))
+    return signals
+
+
+class LiveRiskMonitor:
+    """1通話分の危険度を逐次判定するモニター"""
+
+    def __init__(
+        self,
+        user_id: str,
+        call_sid: str,
+        notification_policy: Optional[NotificationPolicy] = None,
+        check_repository: Optional[FirestoreCallCheckRepository] = None,
+        llm_enabled: Optional[bool] = None,
+        llm_client: Optional[AsyncOpenAI] = None,
+    ):
+        """
+        Args:
+            user_id: ユーザーID
+            call_sid: 通話ID
+            notification_policy: 通知ポリシーエンジン
+            check_repository: チェック結果リポジトリ
+            llm_enabled: LLMによる再判定を行うか（環境変数LIVE_RISK_LLM_ENABLED）
+            llm_client: OpenAIの非同期クライアント（省略時はプロセス共有のクライアント）
+        """
+        self.user_id = user_id
+        self.call_sid = call_sid
+        self.notification_policy = notification_policy or NotificationPolicy()
+        self.check_repository = check_repository or FirestoreCallCheckRepository()
+        self.llm_enabled = llm_enabled if llm_enabled is not None else (
+            os.getenv("LIVE_RISK_LLM_ENABLED", "true").lower() == "true")
+        self.llm_model = os.getenv("LIVE_RISK_LLM_MODEL", "gpt-4o-mini")
+        self.llm_min_signals = int(os.getenv("LIVE_RISK_LLM_MIN_SIGNALS", "2"))
+        self.llm_client = (llm_client or clients.async_openai()) if self.llm_enabled else None
+
+        self.window: Deque[str] = deque(maxlen=int(os.getenv("LIVE_RISK_WINDOW_UTTERANCES", "8")))
+        self.observation_signals: List[RiskSignal] = []
+        self.alerted = False
+        self._llm_in_flight = False
+        self._llm_pending = False
+        self._llm_checked_signals = 0
+        self._tasks: Set[asyncio.Task] = set()
+
+    def observe(self, text: str, spoken_at: Optional[float] = None) -> Optional[SeverityLevel]:
+        """
+        ユーザー発言を1件取り込み、判定する（通話処理をブロックしないよう通知は非同期で実行）
+
+        Args:
+            text: ユーザーの発言
+            spoken_at: 発話終了時刻（time.perf_counter()の値）。遅延計測に使用
+
+        Returns:
+            Optional[SeverityLevel]: 今回の発言で検出した最大の重要度（検出なしはNone）
+        """
+        received_at = time.perf_counter()
+        spoken_at = spoken_at or received_at
+        self.window.append(text)
+
+        immediate = match_immediate_signals(text)
+        signals = match_risk_signals(text)
+        metrics.observe("live_risk_lexicon_seconds", time.perf_counter() - received_at)
+        if immediate:
+            metrics.increment("live_risk_signals_total", level=SeverityLevel.ABNORMAL.name, label="immediate")
+            self._spawn(self._alert(immediate, "immediate", spoken_at))
+            return SeverityLevel.ABNORMAL
+        if not signals:
+            return None
+
+        for signal in signals:
+            metrics.increment("live_risk_signals_total",
+                              level=signal.severity_level.name, label=signal.label)
+
+        # 異常の兆候は1件でもLLMで確認する（辞書の一致だけでは通知しない）
+        abnormal = any(s.severity_level == SeverityLevel.ABNORMAL for s in signals)
+        self.observation_signals.extend(signals)
+        if abnormal or len(self.observation_signals) - self._llm_checked_signals >= self.llm_min_signals:
+            self._request_llm_check(spoken_at)
+        return SeverityLevel.ABNORMAL if abnormal else SeverityLevel.OBSERVATION
+
+    def _request_llm_check(self, spoken_at: float) -> None:
+        """LLMによる再判定を依頼（実行中の場合は完了後にもう一度判定する）"""
+        if not self.llm_enabled or self.alerted:
+            return
+        if self._llm_in_flight:
+            self._llm_pending = True
+            return
+        self._llm_in_flight = True
+        self._llm_checked_signals = len(self.observation_signals)
+        self._spawn(self._escalate_with_llm(spoken_at))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _escalate_with_llm(self, spoken_at: float) -> None:
+        """異常の兆候・続いた要観察の兆候を検出した場合に、直近の会話をLLMで再判定"""
+        try:
+            started = time.perf_counter()
+            conversation = "\n".join(f"ユーザー: {text}" for text in self.window)
+            response = await self.llm_client.beta.chat.completions.parse(
+                model=self.llm_model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": f"""あなたは高齢者の安否確認通話を、通話中にリアルタイムで監視しています。
+以下は通話中のユーザーの直近の発言です。ユーザー本人に緊急対応が必要な事案（生命に関わる健康問題、重度の認知機能障害、虐待や犯罪被害の疑い、自殺念慮）の場合のみ「異常」と判定してください。
+家族・知人やテレビなど本人以外の出来事、過去の出来事で現在は問題がない場合は「異常」にしないでください。
+判断の根拠となった発言を引用し、通話IDには「{self.call_sid}」、発言者には「user」を指定してください。"""
+                    },
+                    {"role": "user", "content": conversation}
+                ],
+                response_format=OpenAICallAnalysisResult
+            )
+            metrics.observe("live_risk_llm_seconds", time.perf_counter() - started)
+
+            analysis = response.choices[0].message.parsed
+            if analysis and analysis.severity_level == SeverityLevel.ABNORMAL:
+                signals = [RiskSignal(issue, SeverityLevel.ABNORMAL, "") for issue in analysis.detected_issues]
+                await self._alert(signals, "llm", spoken_at, analysis)
+        except Exception as e:
+            metrics.increment("live_risk_llm_errors_total")
+            logger.error(f"通話中リスク再判定エラー: user_id={self.user_id}, call_sid={self.call_sid}, error={e}")
+        finally:
+            self._llm_in_flight = False
+            if self._llm_pending:
+                self._llm_pending = False
+                self._request_llm_check(spoken_at)
+
+    async def _alert(self, signals: List[RiskSignal], source: str, spoken_at: float,
+                     analysis: Optional[OpenAICallAnalysisResult] = None) -> None:
+        """異常を通知パイプラインへ送信（1通話につき1回）"""
+        if self.alerted:
+            return
+        self.alerted = True
+
+        detected_issues = list(dict.fromkeys(signal.label for signal in signals))
+        if analysis:
+            reason = analysis.reason
+            evidence = analysis.evidence
+        else:
+            reason = f"通話中の発言から緊急性の高い兆候を検出しました: {'、'.join(detected_issues)}"
+            evidence = [
+                Evidence(call_id=self.call_sid, statement=statement, speaker="user")
+                for statement in dict.fromkeys(signal.statement for signal in signals)
+            ]
+
+        result = CallCheckResult(
+            reason=reason,
+            severity_level=SeverityLevel.ABNORMAL,
+            detected_issues=detected_issues,
+            evidence=evidence,
+            source_calls=[self.call_sid],
+            analyzed_at=datetime.now()
+        )
+
+        logger.warning(
+            f"通話中に異常を検知: user_id={self.user_id}, call_sid={self.call_sid}, source={source}, issues={detected_issues}")
+        try:
+            notification_result = await self.notification_policy.process(self.user_id, result)
+            latency = time.perf_counter() - spoken_at
+            metrics.observe("live_risk_alert_latency_seconds", latency, source=source)
+            metrics.increment("live_risk_alerts_total", source=source,
+                              success=bool(notification_result.get("success")))
+            logger.info(
+                f"通話中アラート送信: user_id={self.user_id}, action={notification_result.get('action')}, latency={latency:.2f}s")
+        except Exception as e:
+            metrics.increment("live_risk_alert_errors_total")
+            logger.error(f"通話中アラート送信エラー: user_id={self.user_id}, error={e}", exc_info=True)
+
+        try:
+            # チェック結果として保存する。通話中の判定は未確定のため集計（ウォッチリスト）は更新せず、通話終了後のチェックで確定する
+            await self.check_repository.save_check_result(self.user_id, result, update_rollups=False)
+        except Exception as e:
+            logger.error(f"通話中アラートの保存エラー: user_id={self.user_id}, error={e}")
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """送信中のアラートの完了を待機（通話終了時）"""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
@@ -4,12 +4,15 @@
 Spring BootのJPA/Hibernateに相当する機能を提供
 """
 from .connection import DatabaseConnection, db_connection, get_db_session
+from .instrumentation import db_operation, instrument_engine
 from .models import Base, EventTable, UserTable
 
 __all__ = [
     'DatabaseConnection',
     'db_connection', 
     'get_db_session',
+    'db_operation',
+    'instrument_engine',
     'Base',
     'UserTable',
     'EventTable'
@@ -4,10 +4,16 @@
 Spring BootのDataSourceに相当する機能を提供
 """
 import os
+import time
+import asyncio
 import logging
 from typing import Optional
+import aiomysql
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from google.cloud.sql.connector import Connector
+
+from .instrumentation import current_operation, instrument_engine
+from utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -18,8 +24,8 @@ class DatabaseConnection:
     _instance: Optional['DatabaseConnection'] = None
     _engine = None
     _session_factory = None
-    _connector = None
     _initialized = False
+    _init_lock: Optional[asyncio.Lock] = None
     
     def __new__(cls):
         """シングルトンパターンでインスタンス管理"""
@@ -32,10 +38,15 @@ class DatabaseConnection:
         pass
     
     async def initialize(self):
-        """データベース接続の初期化（非同期）"""
-        if not self._initialized:
-            await self._initialize_connection()
-            self._initialized = True
+        """データベース接続の初期化（非同期・同時に呼ばれても1回だけ初期化）"""
+        if self._initialized:
+            return
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+        async with self._init_lock:
+            if not self._initialized:
+                await self._initialize_connection()
+                self._initialized = True
     
     async def _initialize_connection(self):
         """CloudSQL接続の初期化"""
@@ -44,36 +55,46 @@ class DatabaseConnection:
         db_password = os.getenv('DEFAULT_PASSWORD', '')
         db_name = os.getenv('DB_NAME', 'default')
         instance_connection_name = os.getenv('CLOUD_SQL_CONNECTION_STRING')
+        # ローカル開発時はCloud SQL Auth Proxyなど、TCPで接続する
+        db_host = os.getenv('DB_HOST')
+        db_port = int(os.getenv('DB_PORT', '3306'))
         
-        if not instance_connection_name:
-            raise ValueError("CLOUD_SQL_CONNECTION_STRING environment variable is required")
-        
-        logger.info(f"Initializing CloudSQL connection to: {instance_connection_name}")
+        if not instance_connection_name and not db_host:
+            raise ValueError("CLOUD_SQL_CONNECTION_STRING or DB_HOST environment variable is required")
         
-        # Cloud SQL Language Connectorを使用
-        self._connector = Connector()
+        if db_host:
+            connect_args = {"host": db_host, "port": db_port}
+            logger.info(f"Initializing database connection to: {db_host}:{db_port}")
+        else:
+            # Cloud Runの--add-cloudsql-instancesでマウントされるUnixソケット
+            socket_dir = os.getenv('CLOUD_SQL_SOCKET_DIR', '/cloudsql')
+            connect_args = {"unix_socket": f"{socket_dir}/{instance_connection_name}"}
+            logger.info(f"Initializing CloudSQL connection to: {instance_connection_name}")
         
-        def getconn():
-            """CloudSQL接続用のコネクター関数"""
-            conn = self._connector.connect(
-                instance_connection_name,
-                "pymysql",
+        async def getconn():
+            """CloudSQL接続用のコネクター関数（aiomysqlで非同期に接続）"""
+            return await aiomysql.connect(
                 user=db_user,
                 password=db_password,
                 db=db_name,
+                charset="utf8mb4",
+                connect_timeout=int(os.getenv('DB_CONNECT_TIMEOUT', '10')),
+                **connect_args,
             )
-            return conn
         
-        # 非同期エンジンの作成
+        # 非同期エンジンの作成（接続の確立・再接続もイベントループをブロックしない）
         self._engine = create_async_engine(
             "mysql+aiomysql://",
-            creator=getconn,
+            async_creator=getconn,
             echo=False,  # SQLログ出力（開発時はTrueに変更可能）
             pool_pre_ping=True,
-            pool_size=5,
-            max_overflow=10,
-            pool_recycle=3600,  # 1時間でコネクションをリサイクル
+            pool_size=int(os.getenv('DB_POOL_SIZE', '5')),
+            max_overflow=int(os.getenv('DB_MAX_OVERFLOW', '10')),
+            pool_timeout=float(os.getenv('DB_POOL_TIMEOUT', '30')),
+            pool_recycle=int(os.getenv('DB_POOL_RECYCLE', '3600')),  # デフォルト1時間でコネクションをリサイクル
         )
+        # クエリのレイテンシ・スロークエリ・プール使用状況を計測
+        instrument_engine(self._engine)
         
         # セッションファクトリーの作成
         self._session_factory = async_sessionmaker(
@@ -84,6 +105,33 @@ class DatabaseConnection:
         
         logger.info("CloudSQL connection initialized successfully")
     
+    async def warm_up(self, connections: Optional[int] = None) -> int:
+        """
+        コネクションプールを事前に確立（コールドスタート直後の接続待ちを避ける）
+        
+        Args:
+            connections: 確立する接続数（環境変数DB_WARMUP_CONNECTIONS、プールサイズが上限）
+            
+        Returns:
+            確立できた接続数
+        """
+        await self.initialize()
+        count = connections if connections is not None else int(os.getenv('DB_WARMUP_CONNECTIONS', '2'))
+        count = min(count, self._engine.pool.size())
+        
+        async def _open():
+            async with self._engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        
+        results = await asyncio.gather(*(_open() for _ in range(count)), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, Exception)]
+        for error in errors:
+            logger.warning(f"Database warm-up connection failed: {error}")
+        
+        established = count - len(errors)
+        logger.info(f"Database pool warmed up: {established}/{count} connections")
+        return established
+    
     @property
     def engine(self):
         """SQLAlchemyエンジンを取得"""
@@ -95,7 +143,18 @@ class DatabaseConnection:
             await self.initialize()
         if self._session_factory is None:
             raise RuntimeError("Database connection not initialized")
-        return self._session_factory()
+        session = self._session_factory()
+        # プールからの取得待ち時間を計測するため、コネクションを先に確保する
+        started = time.perf_counter()
+        try:
+            await session.connection()
+        except Exception:
+            metrics.increment("db_pool_checkout_errors_total")
+            await session.close()
+            raise
+        metrics.observe("db_pool_checkout_seconds", time.perf_counter() - started,
+                        operation=current_operation())
+        return session
     
     async def close(self):
         """データベース接続をクローズ"""
@@ -103,16 +162,16 @@ class DatabaseConnection:
             await self._engine.dispose()
             logger.info("Database engine disposed")
         
-        if self._connector:
-            await self._connector.close_async()
-            logger.info("CloudSQL connector closed")
+        self._engine = None
+        self._session_factory = None
+        self._initialized = False
     
     async def health_check(self) -> bool:
         """データベース接続の健全性チェック"""
         try:
             session = await self.get_session()
             async with session:
-                result = await session.execute("SELECT 1")
+                result = await session.execute(text("SELECT 1"))
                 return result.scalar() == 1
         except Exception as e:
             logger.error(f"Database health check failed: {e}")
@@ -0,0 +1,126 @@
+"""
+SQLAlchemyエンジンの計測
+
+クエリごとのレイテンシ（リポジトリのメソッド単位）・スロークエリログ・
+コネクションプールの使用状況を記録し、/metrics エンドポイントから参照できるようにする。
+"""
+import os
+import time
+import inspect
+import logging
+import functools
+from contextvars import ContextVar
+from typing import Any, Callable, Optional, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 実行中のリポジトリメソッド名（クエリのタグとして使用）
+_current_operation: ContextVar[str] = ContextVar("db_operation", default="unknown")
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def db_operation(name: Optional[str] = None) -> Callable[[F], F]:
+    """
+    リポジトリの非同期メソッド（非同期ジェネレーターを含む）に付与し、実行されるクエリに「クラス名.メソッド名」のタグを付けるデコレーター
+
+    Args:
+        name: タグ名（省略時は「クラス名.メソッド名」）
+    """
+    def decorator(func: F) -> F:
+        def _operation(args) -> str:
+            if name is not None:
+                return name
+            owner = type(args[0]).__name__ if args else func.__module__
+            return f"{owner}.{func.__name__}"
+
+        if inspect.isasyncgenfunction(func):
+            # 非同期ジェネレーターは呼び出し元のタスクで1件ずつ進むため、取得のたびにタグを設定する
+            @functools.wraps(func)
+            async def gen_wrapper(*args, **kwargs):
+                operation = _operation(args)
+                agen = func(*args, **kwargs)
+                try:
+                    while True:
+                        token = _current_operation.set(operation)
+                        try:
+                            item = await agen.__anext__()
+                        except StopAsyncIteration:
+                            return
+                        finally:
+                            _current_operation.reset(token)
+                        yield item
+                finally:
+                    await agen.aclose()
+            return gen_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = _current_operation.set(_operation(args))
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _current_operation.reset(token)
+        return wrapper  # type: ignore[return-value]
+    return decorator
+
+
+def current_operation() -> str:
+    """実行中のリポジトリメソッド名を取得"""
+    return _current_operation.get()
+
+
+def instrument_engine(engine: AsyncEngine, slow_query_ms: Optional[float] = None) -> None:
+    """
+    エンジンに計測用のイベントフックを登録
+
+    Args:
+        engine: 非同期エンジン
+        slow_query_ms: スロークエリとしてログ出力するしきい値（環境変数DB_SLOW_QUERY_MS）
+    """
+    threshold = (slow_query_ms if slow_query_ms is not None
+                 else float(os.getenv("DB_SLOW_QUERY_MS", "200"))) / 1000
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        elapsed = time.perf_counter() - started
+        operation = current_operation()
+        metrics.observe("db_query_seconds", elapsed, operation=operation)
+        if elapsed >= threshold:
+            metrics.increment("db_slow_queries_total", operation=operation)
+            logger.warning(
+                f"Slow query ({elapsed * 1000:.1f}ms, operation={operation}): {' '.join(statement.split())[:500]}")
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+        metrics.increment("db_query_errors_total", operation=current_operation())
+
+    @event.listens_for(sync_engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        metrics.increment("db_connections_created_total")
+
+    pool = sync_engine.pool
+
+    def _pool_gauges():
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        }
+
+    metrics.register_gauge_callback("db_pool", _pool_gauges)
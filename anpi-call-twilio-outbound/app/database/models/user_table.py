@@ -2,6 +2,7 @@
 ユーザーテーブルORM定義
 """
 from sqlalchemy import Column, String, Date, Time, Enum, CHAR, VARCHAR, TIMESTAMP
+from sqlalchemy.dialects.mysql import TINYINT
 from models.schemas import Gender, Weekday
 from .base import Base
 
@@ -25,5 +26,6 @@ class UserTable(Base):
     birth_date = Column(Date, nullable=True)
     call_time = Column(Time, nullable=True)
     call_weekday = Column(Enum(Weekday), nullable=True)
+    call_weekdays_mask = Column(TINYINT(unsigned=True), nullable=True)
     created_at = Column(TIMESTAMP, nullable=False)
     updated_at = Column(TIMESTAMP, nullable=False)
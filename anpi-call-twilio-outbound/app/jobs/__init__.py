@@ -0,0 +1,6 @@
+"""Post-call job modules."""
+
+from .handlers import JOB_TYPE_CALL_CHECK, JOB_TYPE_DIARY, NonRetryableJobError
+from .runner import PostCallJobRunner
+
+__all__ = ["JOB_TYPE_CALL_CHECK", "JOB_TYPE_DIARY", "NonRetryableJobError", "PostCallJobRunner"]
@@ -0,0 +1,87 @@
+"""通話終了後ジョブのハンドラー
+
+各ハンドラーはジョブの入力（payload）を受け取り、結果をdictで返す。
+一時的な障害は例外をそのまま送出し（再試行される）、再試行しても成功しない場合はNonRetryableJobErrorを送出する。
+"""
+
+import os
+import asyncio
+import logging
+from typing import Any, Dict
+
+import aiohttp
+
+from analysis.check_call import CallChecker
+from utils.http_session import get_http_session
+
+logger = logging.getLogger(__name__)
+
+# ジョブ種別
+JOB_TYPE_CALL_CHECK = "call_check"
+JOB_TYPE_DIARY = "diary"
+
+DEFAULT_DIARY_API_URL = "https://ai-diary-894704565810.asia-northeast1.run.app/generate-diary"
+
+
+class NonRetryableJobError(Exception):
+    """再試行しても成功しないジョブのエラー（入力不正など）"""
+
+
+async def run_call_check(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    通話チェックを実行
+
+    Args:
+        payload: user_id を含むジョブの入力
+
+    Returns:
+        Dict[str, Any]: 重要度とチェックID
+    """
+    user_id = payload["user_id"]
+    checker = CallChecker()
+    result, check_id = await checker.check_user_calls(user_id)
+    logger.info(
+        f"通話終了後チェック完了: user_id={user_id}, severity_level={result.severity_level}, check_id={check_id}")
+    if result.error:
+        # CallCheckerは例外を結果に変換するため、ここで再試行対象に戻す
+        raise RuntimeError(result.error)
+    return {"severity_level": result.severity_level.value, "check_id": check_id}
+
+
+async def run_diary(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    AI絵日記生成APIを呼び出す（共有セッションを使用し、イベントループをブロックしない）
+
+    Args:
+        payload: user_id, call_sid を含むジョブの入力
+
+    Returns:
+        Dict[str, Any]: APIのステータスコード
+    """
+    url = os.getenv("DIARY_API_URL", DEFAULT_DIARY_API_URL)
+    timeout = float(os.getenv("DIARY_API_TIMEOUT_SECONDS", "300"))
+    body = {
+        "userID": payload["user_id"],
+        "callID": payload["call_sid"]
+    }
+
+    session = await get_http_session()
+    try:
+        async with session.post(
+            url,
+            json=body,
+            headers={"Content-Type": "application/json"},
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            response_text = await response.text()
+            if response.status == 200:
+                return {"status_code": response.status}
+
+            error = f"HTTP {response.status}: {response_text[:500]}"
+            # 429・5xxは一時的な障害とみなして再試行する
+            if response.status == 429 or response.status >= 500:
+                raise RuntimeError(error)
+            raise NonRetryableJobError(error)
+
+    except asyncio.TimeoutError:
+        raise RuntimeError(f"AI絵日記生成APIタイムアウト: {timeout}秒")
@@ -0,0 +1,139 @@
+"""発言記録をv2形式に移行するバッチジョブ
+
+すべてのユーザーの通話ドキュメント（コレクショングループ calls）を順に走査し、
+v1形式（transcriptions）の通話をv2形式（messages）に書き換える。
+
+- 走査時は schema_version のみをプロジェクションで取得し、v1の通話だけ全体を読み込む
+- 更新は読み込み時の更新日時を前提条件にするため、同時に書き込まれた通話は上書きせずスキップする
+- ページごとに最後の通話のパスを出力するので、中断した場合は --resume-after で再開できる
+
+実行例（appディレクトリで実行）:
+    python -m jobs.migrate_transcripts --dry-run
+    python -m jobs.migrate_transcripts --page-size 200 --concurrency 10
+"""
+
+import asyncio
+import argparse
+import logging
+from typing import Any, Dict, Optional
+
+from google.api_core.exceptions import FailedPrecondition
+from google.cloud import firestore
+from google.cloud.firestore_v1.async_client import AsyncClient
+from google.cloud.firestore_v1.field_path import FieldPath
+
+from repositories.transcript_codec import LEGACY_TRANSCRIPTIONS_FIELD, TRANSCRIPT_SCHEMA_VERSION, to_v2
+from utils.clients import clients
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptMigration:
+    """発言記録のv2移行"""
+
+    def __init__(self, db: Optional[AsyncClient] = None, dry_run: bool = False, concurrency: int = 10):
+        """
+        Args:
+            db: Firestoreクライアント（省略時はプロセス共有のクライアント）
+            dry_run: 書き込みを行わず件数のみ集計する
+            concurrency: 同時に更新する通話数
+        """
+        self.db: AsyncClient = db or clients.firestore()
+        self.dry_run = dry_run
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.stats: Dict[str, int] = {"scanned": 0, "migrated": 0, "already_v2": 0, "skipped": 0, "conflicts": 0}
+
+    async def _migrate_call(self, doc_ref) -> None:
+        async with self.semaphore:
+            snapshot = await doc_ref.get()
+            if not snapshot.exists:
+                self.stats["skipped"] += 1
+                return
+
+            data = snapshot.to_dict()
+            if data.get("schema_version", 1) >= TRANSCRIPT_SCHEMA_VERSION:
+                self.stats["already_v2"] += 1
+                return
+
+            update = to_v2(data)
+            if update is None:
+                logger.warning(f"通話開始日時・発言がないため移行をスキップ: {doc_ref.path}")
+                self.stats["skipped"] += 1
+                return
+
+            if self.dry_run:
+                self.stats["migrated"] += 1
+                return
+
+            update[LEGACY_TRANSCRIPTIONS_FIELD] = firestore.DELETE_FIELD
+            try:
+                # 読み込み後に通話が更新されていた場合は上書きしない
+                await doc_ref.update(update, option=self.db.write_option(last_update_time=snapshot.update_time))
+                self.stats["migrated"] += 1
+            except FailedPrecondition:
+                logger.warning(f"移行中に通話が更新されたためスキップ（再実行で移行されます）: {doc_ref.path}")
+                self.stats["conflicts"] += 1
+
+    async def run(self, page_size: int = 200, resume_after: Optional[str] = None) -> Dict[str, Any]:
+        """
+        移行を実行
+
+        Args:
+            page_size: 1ページの通話数
+            resume_after: 再開位置（前回出力された通話ドキュメントのパス）
+
+        Returns:
+            Dict[str, Any]: 件数の集計
+        """
+        query = (self.db.collection_group("calls")
+                 .select(["schema_version"])
+                 .order_by(FieldPath.document_id())
+                 .limit(page_size))
+        last_doc = await self.db.document(resume_after).get() if resume_after else None
+
+        while True:
+            page_query = query.start_after(last_doc) if last_doc is not None else query
+            docs = await page_query.get()
+            if not docs:
+                break
+
+            self.stats["scanned"] += len(docs)
+            targets = []
+            for doc in docs:
+                if (doc.to_dict() or {}).get("schema_version", 1) >= TRANSCRIPT_SCHEMA_VERSION:
+                    self.stats["already_v2"] += 1
+                else:
+                    targets.append(self._migrate_call(doc.reference))
+            await asyncio.gather(*targets)
+
+            last_doc = docs[-1]
+            logger.info(f"移行中: last={last_doc.reference.path}, stats={self.stats}")
+            if len(docs) < page_size:
+                break
+
+        return self.stats
+
+
+async def _main(args) -> None:
+    try:
+        migration = TranscriptMigration(dry_run=args.dry_run, concurrency=args.concurrency)
+        stats = await migration.run(page_size=args.page_size, resume_after=args.resume_after)
+        logger.info(f"発言記録の移行が完了しました{'（dry-run）' if args.dry_run else ''}: {stats}")
+    finally:
+        await clients.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="発言記録をv2形式に移行")
+    parser.add_argument("--page-size", type=int, default=200, help="1ページの通話数")
+    parser.add_argument("--concurrency", type=int, default=10, help="同時に更新する通話数")
+    parser.add_argument("--resume-after", help="再開位置（ログに出力された通話ドキュメントのパス）")
+    parser.add_argument("--dry-run", action="store_true", help="書き込みを行わず件数のみ集計")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""通話終了後ジョブのランナー
+
+ジョブはFirestoreに永続化してから実行するため、インスタンスが停止しても別インスタンスが引き継ぐ。
+
+- 登録したジョブはプロセス内キューにも積み、ワーカーが即時に実行する
+- ポーラーが実行時刻を過ぎたジョブ（再試行待ち・リース切れ）を定期的に拾う
+- ジョブ種別ごとにセマフォで同時実行数を制限する（実行枠を確保してからリースを取得する）
+- 失敗時は指数バックオフ＋ジッターで再試行時刻を設定し、上限に達したら失敗として終了する
+"""
+
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from jobs.handlers import (
+    JOB_TYPE_CALL_CHECK,
+    JOB_TYPE_DIARY,
+    NonRetryableJobError,
+    run_call_check,
+    run_diary,
+)
+from repositories.firestore_post_call_job_repository import FirestorePostCallJobRepository
+from utils.metrics import metrics
+from utils.retry import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class PostCallJobRunner:
+    """通話終了後ジョブのキューとワーカープール"""
+
+    def __init__(
+        self,
+        repository: Optional[FirestorePostCallJobRepository] = None,
+        worker_count: Optional[int] = None,
+        lease_seconds: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+    ):
+        """
+        Args:
+            repository: ジョブリポジトリ
+            worker_count: ワーカー数（環境変数POST_CALL_JOB_WORKERS）
+            lease_seconds: 実行中ジョブのリース秒数（環境変数POST_CALL_JOB_LEASE_SECONDS）。最長のジョブより長くする
+            max_attempts: 最大試行回数（環境変数POST_CALL_JOB_MAX_ATTEMPTS）
+            base_delay: 再試行バックオフの基準秒数（環境変数POST_CALL_JOB_RETRY_BASE_SECONDS）
+            max_delay: 再試行バックオフの上限秒数（環境変数POST_CALL_JOB_RETRY_MAX_SECONDS）
+        """
+        self.repository = repository or FirestorePostCallJobRepository()
+        self.worker_count = worker_count or int(os.getenv("POST_CALL_JOB_WORKERS", "4"))
+        self.lease_seconds = lease_seconds or int(os.getenv("POST_CALL_JOB_LEASE_SECONDS", "600"))
+        self.max_attempts = max_attempts or int(os.getenv("POST_CALL_JOB_MAX_ATTEMPTS", "5"))
+        self.base_delay = base_delay or float(os.getenv("POST_CALL_JOB_RETRY_BASE_SECONDS", "10"))
+        self.max_delay = max_delay or float(os.getenv("POST_CALL_JOB_RETRY_MAX_SECONDS", "900"))
+
+        self.handlers: Dict[str, JobHandler] = {}
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+        self.register(JOB_TYPE_CALL_CHECK, run_call_check,
+                      int(os.getenv("POST_CALL_JOB_CONCURRENCY_CALL_CHECK", "2")))
+        self.register(JOB_TYPE_DIARY, run_diary,
+                      int(os.getenv("POST_CALL_JOB_CONCURRENCY_DIARY", "2")))
+
+    def register(self, job_type: str, handler: JobHandler, concurrency: int) -> None:
+        """
+        ジョブ種別とハンドラーを登録
+
+        Args:
+            job_type: ジョブ種別
+            handler: ハンドラー
+            concurrency: 同時実行数の上限
+        """
+        self.handlers[job_type] = handler
+        self.semaphores[job_type] = asyncio.Semaphore(concurrency)
+
+    @staticmethod
+    def job_id_for(call_sid: str, job_type: str) -> str:
+        """通話IDとジョブ種別からジョブIDを生成（同じ通話の同じジョブは1件のみ登録される）"""
+        return f"{call_sid}_{job_type}"
+
+    def job_type_of(self, job_id: str) -> Optional[str]:
+        """ジョブIDからジョブ種別を取得（未登録の種別の場合はNone）"""
+        return next((job_type for job_type in self.handlers if job_id.endswith(f"_{job_type}")), None)
+
+    async def submit(self, job_type: str, user_id: str, call_sid: str,
+                     payload: Optional[Dict[str, Any]] = None) -> str:
+        """
+        ジョブを登録（永続化してからプロセス内キューに積む）
+
+        Args:
+            job_type: ジョブ種別
+            user_id: ユーザーID
+            call_sid: 通話ID
+            payload: 追加の入力
+
+        Returns:
+            str: ジョブID
+        """
+        if job_type not in self.handlers:
+            raise ValueError(f"未登録のジョブ種別です: {job_type}")
+
+        job_id = self.job_id_for(call_sid, job_type)
+        job_payload = {"user_id": user_id, "call_sid": call_sid, **(payload or {})}
+        created = await self.repository.enqueue(
+            job_id, job_type, user_id, job_payload, self.max_attempts)
+        if created:
+            metrics.increment("post_call_jobs_submitted_total", job_type=job_type)
+            self.queue.put_nowait(job_id)
+            metrics.set_gauge("post_call_job_queue_depth", self.queue.qsize())
+        else:
+            logger.info(f"ジョブ登録済みのためスキップ: job_id={job_id}")
+        return job_id
+
+    async def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """ジョブの状態を取得"""
+        return await self.repository.get_job(job_id)
+
+    async def _execute(self, job_id: str) -> None:
+        """ジョブを1件実行（リースを取得できなかった場合は何もしない）"""
+        job_type = self.job_type_of(job_id)
+        if job_type is None:
+            job = await self.repository.claim(job_id, self.lease_seconds)
+            if job:
+                await self.repository.mark_retry(job_id, f"未登録のジョブ種別です: {job.get('job_type')}", None)
+            return
+
+        started = time.perf_counter()
+        # セマフォの待ち時間でリースが切れて他のインスタンスに二重実行されないよう、実行枠を確保してからリースを取得する
+        async with self.semaphores[job_type]:
+            wait = time.perf_counter() - started
+            job = await self.repository.claim(job_id, self.lease_seconds)
+            if not job:
+                return
+            metrics.observe("post_call_job_wait_seconds", wait, job_type=job_type)
+
+            attempts = job.get("attempts", 1)
+            max_attempts = job.get("max_attempts", self.max_attempts)
+            try:
+                result = await self.handlers[job_type](job.get("payload") or {})
+            except Exception as e:
+                elapsed = time.perf_counter() - started - wait
+                metrics.observe("post_call_job_seconds", elapsed, job_type=job_type)
+
+                retryable = not isinstance(e, NonRetryableJobError)
+                next_attempt_at = None
+                if retryable and attempts < max_attempts:
+                    delay = max(backoff_delay(attempts, self.base_delay, self.max_delay), self.base_delay)
+                    next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+
+                status = "retry" if next_attempt_at else "failed"
+                metrics.increment("post_call_jobs_total", job_type=job_type, status=status)
+                logger.error(
+                    f"ジョブ失敗: job_id={job_id}, attempts={attempts}/{max_attempts}, status={status}, error={e}")
+                await self.repository.mark_retry(job_id, str(e), next_attempt_at)
+                return
+
+        elapsed = time.perf_counter() - started - wait
+        metrics.observe("post_call_job_seconds", elapsed, job_type=job_type)
+        metrics.increment("post_call_jobs_total", job_type=job_type, status="succeeded")
+        logger.info(f"ジョブ完了: job_id={job_id}, attempts={attempts}, elapsed={elapsed:.2f}s")
+        await self.repository.mark_succeeded(job_id, result)
+
+    async def _worker(self, stop_event: asyncio.Event) -> None:
+        while not stop_event.is_set():
+            try:
+                job_id = await asyncio.wait_for(self.queue.get(), timeout=1.0)
+            except asyncio.TimeoutError:
+                continue
+
+            metrics.set_gauge("post_call_job_queue_depth", self.queue.qsize())
+            try:
+                await self._execute(job_id)
+            except Exception as e:
+                logger.error(f"ジョブ実行エラー: job_id={job_id}, error={e}", exc_info=True)
+            finally:
+                self.queue.task_done()
+
+    async def _poller(self, stop_event: asyncio.Event, interval_seconds: float) -> None:
+        while not stop_event.is_set():
+            try:
+                # キューに積み残しがある間は重複して拾わない
+                if self.queue.empty():
+                    for job_id in await self.repository.get_due_job_ids(self.worker_count * 5):
+                        self.queue.put_nowait(job_id)
+            except Exception as e:
+                logger.error(f"実行待ちジョブ取得エラー: {e}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self, stop_event: asyncio.Event, interval_seconds: float = 15.0) -> None:
+        """
+        ワーカープールとポーラーを起動（アプリ起動中に常駐）
+
+        Args:
+            stop_event: 停止シグナル
+            interval_seconds: 実行待ちジョブのポーリング間隔
+        """
+        logger.info(f"通話終了後ジョブランナー開始: workers={self.worker_count}")
+        tasks: List[asyncio.Task] = [
+            asyncio.create_task(self._worker(stop_event)) for _ in range(self.worker_count)
+        ]
+        tasks.append(asyncio.create_task(self._poller(stop_event, interval_seconds)))
+        # 停止時は実行中のジョブの完了を待つ（未実行のジョブは永続化済みのため次回起動時に再開される）
+        await asyncio.gather(*tasks)
+        logger.info("通話終了後ジョブランナー停止")
@@ -15,10 +15,17 @@ import uvicorn
 import logging
 from pydantic import BaseModel
 from typing import Optional
+from contextlib import asynccontextmanager
 from agents.call_agent import CallAgent
 from models.server_event_types import ServerEventType
 from analysis.check_call import CallChecker
-import requests
+from repositories.firestore_call_check_repository import FirestoreCallCheckRepository
+from notification.dispatcher import NotificationDispatcher
+from notification.policy import NotificationPolicy
+from jobs import JOB_TYPE_CALL_CHECK, JOB_TYPE_DIARY, PostCallJobRunner
+from utils.clients import clients
+from database.connection import db_connection
+from utils.metrics import metrics
 
 # ログ設定 - デバッグレベルに変更
 logging.basicConfig(
@@ -39,7 +46,42 @@ PORT = int(os.getenv('PORT', 8080))
 
 
 client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """アプリのライフサイクル管理（バックグラウンドワーカーの起動・停止）"""
+    # Firestore・OpenAIクライアントはプロセスで1つずつ生成して共有する
+    await clients.initialize()
+    try:
+        # 最初の通話でDB接続の確立を待たないよう、起動時にプールを温めておく
+        await db_connection.warm_up()
+    except Exception as e:
+        logger.warning(f"DBコネクションプールの事前確立に失敗しました: {e}")
+
+    # 通話終了後ジョブ（通話チェック・絵日記生成）のランナー
+    # モジュールのインポート時にFirestoreクライアントを生成しないよう、起動時に生成する
+    job_runner = PostCallJobRunner()
+    app.state.job_runner = job_runner
+
+    stop_event = asyncio.Event()
+    outbox_worker = asyncio.create_task(
+        NotificationDispatcher().run_outbox_worker(
+            stop_event, float(os.getenv('NOTIFICATION_OUTBOX_POLL_SECONDS', '30'))))
+    digest_worker = asyncio.create_task(
+        NotificationPolicy().run_digest_worker(
+            stop_event, float(os.getenv('NOTIFICATION_DIGEST_POLL_SECONDS', '60'))))
+    job_worker = asyncio.create_task(
+        job_runner.run(stop_event, float(os.getenv('POST_CALL_JOB_POLL_SECONDS', '15'))))
+    try:
+        yield
+    finally:
+        stop_event.set()
+        await asyncio.gather(outbox_worker, digest_worker, job_worker)
+        await clients.close()
+        await db_connection.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # システムメッセージ
 SYSTEM_MESSAGE = """
@@ -67,6 +109,8 @@ class OutboundCallRequest(BaseModel):
     to_number: str
     message: str = None
     user_id: str = None
+    # 通話終了時の結果（completed / busy / no-answer / failed / canceled）の通知先（タスクAPIの /call-status）
+    status_callback_url: str = None
 
 
 class CallCheckRequest(BaseModel):
@@ -79,6 +123,12 @@ async def index_page():
     return {"message": "Twilio Outbound Call Server is running!"}
 
 
+@app.get('/metrics', response_class=JSONResponse)
+async def metrics_endpoint():
+    """プロセス内メトリクスを取得"""
+    return metrics.snapshot()
+
+
 @app.post("/outbound-call")
 async def outbound_call_endpoint(request: OutboundCallRequest, http_request: Request):
     """API endpoint to initiate outbound calls"""
@@ -105,6 +155,15 @@ async def outbound_call_endpoint(request: OutboundCallRequest, http_request: Req
         else:
             stream_element += ' />'
 
+        # 応答なし・話し中などを再発信に使うため、通話終了時の結果を通知させる
+        status_callback = {}
+        if request.status_callback_url:
+            status_callback = {
+                "status_callback": request.status_callback_url,
+                "status_callback_event": ["completed"],
+                "status_callback_method": "POST",
+            }
+
         call = client.calls.create(
             twiml=f'''<Response>
                 <Pause length="1"/>
@@ -113,7 +172,8 @@ async def outbound_call_endpoint(request: OutboundCallRequest, http_request: Req
                 </Connect>
             </Response>''',
             to=request.to_number,
-            from_=PHONE_NUMBER_FROM
+            from_=PHONE_NUMBER_FROM,
+            **status_callback
         )
 
         logger.info(f"Call initiated with SID: {call.sid}")
@@ -176,6 +236,36 @@ async def check_call_content(request: CallCheckRequest):
         }
 
 
+@app.get("/client/call/watchlist")
+async def get_call_watchlist():
+    """現在の重要度が要観察・異常のユーザー一覧を取得（クライアント向け）"""
+    try:
+        repository = FirestoreCallCheckRepository()
+        watchlist = await repository.get_watchlist()
+        return {
+            "success": True,
+            "watchlist": json.loads(json.dumps(watchlist, default=str))
+        }
+
+    except Exception as e:
+        logger.error(f"要注意ユーザー一覧取得エラー: {e}", exc_info=True)
+        return {
+            "success": False,
+            "error": str(e),
+            "watchlist": {}
+        }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """通話終了後ジョブの状態を取得"""
+    job = await app.state.job_runner.get_status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+
+    return json.loads(json.dumps(job, default=str))
+
+
 @app.websocket("/media-stream")
 async def handle_media_stream(websocket: WebSocket):
     """Handle WebSocket connections between Twilio and OpenAI."""
@@ -344,60 +434,19 @@ async def handle_media_stream(websocket: WebSocket):
         logger.info("WebSocket session ended")
         await call_agent.close()
 
-        # 通話終了後に自動的に通話チェックを実行（非同期・結果待たず）
-        if user_id:
-            asyncio.create_task(trigger_call_check(user_id))
-            generate_diary(user_id, call_sid)
+        # 通話終了後の処理はジョブとして登録し、ワーカーが非同期に実行する
+        if user_id and call_sid:
+            for job_type in (JOB_TYPE_CALL_CHECK, JOB_TYPE_DIARY):
+                try:
+                    job_id = await app.state.job_runner.submit(job_type, user_id, call_sid)
+                    logger.info(f"通話終了後ジョブ登録: job_id={job_id}")
+                except Exception as e:
+                    logger.error(
+                        f"通話終了後ジョブ登録エラー: user_id={user_id}, job_type={job_type}, error={e}", exc_info=True)
         else:
             logger.warning("user_idが設定されていないため通話チェックをスキップします")
 
 
-def generate_diary(user_id: str, call_id: str) -> None:
-    """
-    AI絵日記生成API を呼び出す関数
-
-    :param user_id: ユーザーID
-    :param call_id: 通話ID
-    :return: レスポンスのJSONまたはエラーメッセージ
-    """
-    DIARY_API_URL = "https://ai-diary-894704565810.asia-northeast1.run.app/generate-diary"
-    payload = {
-        "userID": user_id,
-        "callID": call_id
-    }
-    headers = {
-        "Content-Type": "application/json"
-    }
-
-    try:
-        response = requests.post(DIARY_API_URL, json=payload, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.HTTPError as http_err:
-        return {"status": "error", "message": f"HTTP error occurred: {http_err}"}
-    except Exception as err:
-        return {"status": "error", "message": f"Other error occurred: {err}"}
-
-
-
-async def trigger_call_check(user_id: str) -> None:
-    """
-    通話チェックを非同期で実行（結果を待たない）
-
-    Args:
-        user_id: チェック対象のユーザーID
-    """
-    try:
-        logger.info(f"通話終了後チェック開始: user_id={user_id}")
-        checker = CallChecker()
-        result, check_id = await checker.check_user_calls(user_id)
-        logger.info(
-            f"通話終了後チェック完了: user_id={user_id}, severity_level={result.severity_level}, check_id={check_id}")
-    except Exception as e:
-        logger.error(
-            f"通話終了後チェックエラー: user_id={user_id}, error={e}", exc_info=True)
-
-
 # These functions are now handled internally by CallAgent
 
 
@@ -2,6 +2,7 @@
 
 from .schemas import User, Event
 from .transcription import TranscriptionMessage
+from .call import Call, CallMetadata
 from .call_check import CallCheckResult, OpenAICallAnalysisResult
 
-__all__ = ["User", "Event", "TranscriptionMessage", "CallCheckResult", "OpenAICallAnalysisResult"]
\ No newline at end of file
+__all__ = ["User", "Event", "TranscriptionMessage", "Call", "CallMetadata", "CallCheckResult", "OpenAICallAnalysisResult"]
\ No newline at end of file
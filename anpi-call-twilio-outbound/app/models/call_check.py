@@ -1,6 +1,6 @@
 """通話チェック結果のモデル定義"""
 
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import datetime
 from pydantic import BaseModel
 from enum import Enum
@@ -51,4 +51,5 @@ class CallCheckResult(BaseModel):
     detected_issues: List[str]  # 検出された具体的な問題
     evidence: List[Evidence]  # 判断根拠となる発言
     source_calls: List[str]  # 分析に使用した通話ID
-    analyzed_at: datetime  # 分析実行日時
\ No newline at end of file
+    analyzed_at: datetime  # 分析実行日時
+    error: Optional[str] = None  # チェックに失敗した場合のエラー内容（重要度は判定できていない）
\ No newline at end of file
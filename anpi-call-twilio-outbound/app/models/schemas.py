@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, List, Optional
 from datetime import datetime, date, time
 from enum import Enum
 from models.client_event_types import ClientEventType
@@ -20,6 +20,28 @@ class Weekday(str, Enum):
     sun = "sun"
 
 
+# users.call_weekdays_mask のビット順（月=1, 火=2, 水=4, 木=8, 金=16, 土=32, 日=64）
+WEEKDAY_ORDER = [Weekday.mon, Weekday.tue, Weekday.wed, Weekday.thu, Weekday.fri, Weekday.sat, Weekday.sun]
+
+
+def weekday_bit(weekday: Weekday) -> int:
+    """曜日のビット"""
+    return 1 << WEEKDAY_ORDER.index(Weekday(weekday))
+
+
+def weekdays_to_mask(weekdays: Iterable[Weekday]) -> int:
+    """曜日のリストをビットマスクに変換"""
+    mask = 0
+    for weekday in weekdays:
+        mask |= weekday_bit(weekday)
+    return mask
+
+
+def weekdays_from_mask(mask: Optional[int]) -> List[Weekday]:
+    """ビットマスクを曜日のリスト（月曜から順）に変換"""
+    return [weekday for i, weekday in enumerate(WEEKDAY_ORDER) if (mask or 0) & (1 << i)]
+
+
 class User(BaseModel):
     user_id: str
     last_name: str
@@ -35,7 +57,8 @@ class User(BaseModel):
     gender: Gender
     birth_date: date
     call_time: time
-    call_weekday: Weekday
+    call_weekday: Optional[Weekday] = None
+    call_weekdays: List[Weekday] = []
     created_at: datetime
     updated_at: datetime
 
@@ -0,0 +1,6 @@
+"""Notification delivery modules."""
+
+from .dispatcher import NotificationDispatcher
+from .policy import NotificationPolicy
+
+__all__ = ["NotificationDispatcher", "NotificationPolicy"]
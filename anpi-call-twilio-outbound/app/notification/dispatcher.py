@@ -0,0 +1,209 @@
+"""通知ディスパッチャー
+
+アウトボックスへの永続化・指数バックオフ付き再送・送信メトリクス記録を担当する。
+"""
+
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from models.call_check import CallCheckResult
+from repositories.notification_repository import NotificationRepository
+from repositories.webhook_notification_repository import WebhookNotificationRepository
+from repositories.firestore_notification_outbox_repository import FirestoreNotificationOutboxRepository
+from utils.metrics import metrics
+from utils.retry import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    """
+    通知ディスパッチャー
+
+    1. 送信前にペイロードをアウトボックスへ保存（少なくとも1回の配信を保証）
+    2. その場で指数バックオフ＋ジッター付きで数回送信を試行
+    3. 失敗した場合はアウトボックスに残し、バックグラウンドワーカーが再送する
+    """
+
+    def __init__(
+        self,
+        repository: Optional[NotificationRepository] = None,
+        outbox: Optional[FirestoreNotificationOutboxRepository] = None,
+        max_inline_attempts: Optional[int] = None,
+        max_total_attempts: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        lease_seconds: int = 300,
+    ):
+        """
+        Args:
+            repository: 通知送信リポジトリ
+            outbox: アウトボックスリポジトリ
+            max_inline_attempts: 即時送信での最大試行回数（環境変数NOTIFICATION_INLINE_ATTEMPTS）
+            max_total_attempts: 再送を含む最大試行回数（環境変数NOTIFICATION_MAX_ATTEMPTS）
+            base_delay: バックオフの基準秒数（環境変数NOTIFICATION_RETRY_BASE_SECONDS）
+            max_delay: バックオフの上限秒数（環境変数NOTIFICATION_RETRY_MAX_SECONDS）
+            lease_seconds: アウトボックスのリース秒数
+        """
+        self.repository = repository or WebhookNotificationRepository()
+        self.outbox = outbox or FirestoreNotificationOutboxRepository()
+        self.max_inline_attempts = max_inline_attempts or int(
+            os.getenv("NOTIFICATION_INLINE_ATTEMPTS", "3"))
+        self.max_total_attempts = max_total_attempts or int(
+            os.getenv("NOTIFICATION_MAX_ATTEMPTS", "10"))
+        self.base_delay = base_delay or float(
+            os.getenv("NOTIFICATION_RETRY_BASE_SECONDS", "1"))
+        self.max_delay = max_delay or float(
+            os.getenv("NOTIFICATION_RETRY_MAX_SECONDS", "300"))
+        self.lease_seconds = lease_seconds
+
+    async def dispatch(self, user_id: str, result: CallCheckResult) -> Dict[str, Any]:
+        """
+        通話チェック結果の通知を送信
+
+        Args:
+            user_id: ユーザーID
+            result: 通話チェック結果
+
+        Returns:
+            Dict[str, Any]: 送信結果（outbox_idを含む）
+        """
+        payload = self.repository.build_call_check_payload(user_id, result)
+        return await self.dispatch_payload(
+            user_id, payload, {"severity_level": result.severity_level.value})
+
+    async def dispatch_payload(self, user_id: str, payload: Dict[str, Any],
+                               metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        生成済みペイロードをアウトボックス経由で送信
+
+        Args:
+            user_id: ユーザーID（ダイジェストの場合は宛先キー）
+            payload: 送信ペイロード
+            metadata: アウトボックスに保存する付加情報
+
+        Returns:
+            Dict[str, Any]: 送信結果
+        """
+        outbox_id = None
+        try:
+            outbox_id = await self.outbox.enqueue(
+                user_id, payload, self.lease_seconds, metadata)
+        except Exception as e:
+            # 永続化できなくても通知自体は試みる
+            metrics.increment("notification_outbox_errors_total")
+            logger.error(f"アウトボックス保存失敗（直接送信します）: user_id={user_id}, error={e}")
+
+        return await self._deliver(outbox_id, user_id, payload, previous_attempts=0)
+
+    async def _deliver(self, outbox_id: Optional[str], user_id: str, payload: Dict[str, Any],
+                       previous_attempts: int) -> Dict[str, Any]:
+        """即時にバックオフ付きで送信を試行し、結果をアウトボックスに記録"""
+        attempts = previous_attempts
+        result: Dict[str, Any] = {"success": False, "error": "not attempted"}
+
+        for inline_attempt in range(1, self.max_inline_attempts + 1):
+            if attempts >= self.max_total_attempts:
+                break
+
+            attempts += 1
+            started = time.perf_counter()
+            result = await self.repository.send_payload(payload, user_id=user_id)
+            elapsed = time.perf_counter() - started
+
+            metrics.observe("notification_delivery_seconds", elapsed)
+            metrics.increment("notification_attempts_total")
+
+            if result.get("success"):
+                metrics.increment("notification_delivered_total")
+                if attempts > 1:
+                    metrics.increment("notification_delivered_after_retry_total")
+                if outbox_id:
+                    try:
+                        await self.outbox.mark_sent(outbox_id, attempts)
+                    except Exception as e:
+                        # 送信済みだが記録に失敗した場合は再送の可能性がある（少なくとも1回の配信）
+                        logger.error(f"アウトボックス送信済み記録失敗: outbox_id={outbox_id}, error={e}")
+                result["outbox_id"] = outbox_id
+                result["attempts"] = attempts
+                return result
+
+            metrics.increment("notification_failures_total",
+                              retryable=bool(result.get("retryable")))
+            if not result.get("retryable"):
+                break
+
+            if inline_attempt < self.max_inline_attempts:
+                await asyncio.sleep(backoff_delay(inline_attempt, self.base_delay, self.max_delay))
+
+        # 再送可能ならアウトボックスに残し、ワーカーに任せる
+        next_attempt_at = None
+        if result.get("retryable") and attempts < self.max_total_attempts:
+            delay = backoff_delay(attempts, self.base_delay, self.max_delay)
+            next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=max(delay, self.base_delay))
+        else:
+            metrics.increment("notification_dead_lettered_total")
+
+        if outbox_id:
+            try:
+                await self.outbox.mark_retry(
+                    outbox_id, attempts, result.get("error", ""), next_attempt_at)
+            except Exception as e:
+                logger.error(f"アウトボックス失敗記録エラー: outbox_id={outbox_id}, error={e}")
+
+        result["outbox_id"] = outbox_id
+        result["attempts"] = attempts
+        return result
+
+    async def drain_outbox(self, limit: int = 20) -> int:
+        """
+        再送期限を過ぎたアウトボックスのエントリを送信
+
+        Args:
+            limit: 1回で処理する最大件数
+
+        Returns:
+            int: 送信に成功した件数
+        """
+        delivered = 0
+        entries = await self.outbox.get_due_entries(limit)
+        for entry in entries:
+            claimed = await self.outbox.claim(entry["outbox_id"], self.lease_seconds)
+            if not claimed:
+                continue
+
+            result = await self._deliver(
+                claimed["outbox_id"], claimed.get("user_id"), claimed["payload"],
+                previous_attempts=claimed.get("attempts", 0))
+            if result.get("success"):
+                delivered += 1
+
+        metrics.set_gauge("notification_outbox_last_batch", len(entries))
+        return delivered
+
+    async def run_outbox_worker(self, stop_event: asyncio.Event, interval_seconds: float = 30.0) -> None:
+        """
+        アウトボックスの再送ワーカー（アプリ起動中に常駐）
+
+        Args:
+            stop_event: 停止シグナル
+            interval_seconds: ポーリング間隔
+        """
+        logger.info("通知アウトボックスワーカー開始")
+        while not stop_event.is_set():
+            try:
+                delivered = await self.drain_outbox()
+                if delivered:
+                    logger.info(f"アウトボックス再送成功: {delivered}件")
+            except Exception as e:
+                logger.error(f"アウトボックス再送処理エラー: {e}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("通知アウトボックスワーカー停止")
@@ -0,0 +1,256 @@
+"""通知ポリシーエンジン
+
+通話チェック結果ごとに「即時送信・抑制・ダイジェストにまとめる」を判定する。
+
+- 重要度が直近の通知より上がった場合（エスカレーション）は即時送信
+- 重要度と検出された問題のカテゴリが直近の通知と同じで、抑制期間内の場合は送信しない
+- 要観察レベルのアラートは宛先ごとにまとめ、一定間隔でダイジェストとして送信
+"""
+
+import os
+import re
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from models.call_check import CallCheckResult, SeverityLevel
+from notification.dispatcher import NotificationDispatcher
+from repositories.firestore_notification_state_repository import FirestoreNotificationStateRepository
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 判定結果
+ACTION_SEND = "send"
+ACTION_SUPPRESS = "suppress"
+ACTION_DIGEST = "digest"
+
+# 検出された問題（LLMの自由記述）を分類するカテゴリ（パターン, カテゴリ）
+# 同じ内容でも言い回しが通話ごとに変わるため、指紋は問題文ではなくカテゴリから生成する
+ISSUE_CATEGORIES = [
+    (r"(転倒|転ん|倒れ|転落)", "転倒"),
+    (r"(動け|起き上がれ|立て|歩け|寝たきり)", "身体機能低下"),
+    (r"(呼吸|息切れ|息が)", "呼吸困難"),
+    (r"(出血|吐血|血が)", "出血"),
+    (r"痛", "痛み"),
+    (r"(自殺|希死|死にたい|消えたい)", "自殺念慮"),
+    (r"(虐待|暴力|殴|叩かれ|蹴られ|詐欺|盗|被害)", "虐待・犯罪被害"),
+    (r"(見当識|認知|物忘れ|忘れ|記憶|思い出せ)", "認知機能低下"),
+    (r"(食欲|食事|食べ|体重)", "食欲低下"),
+    (r"(睡眠|眠れ|不眠|寝られ)", "睡眠障害"),
+    (r"(孤立|孤独|寂し|さみし|話し相手)", "孤立感"),
+    (r"(めまい|ふらつ|ふらふら)", "めまい・ふらつき"),
+    (r"(倦怠|だるい|しんどい|疲れ)", "倦怠感"),
+    (r"(発熱|熱が|風邪|咳)", "発熱・感冒症状"),
+    (r"(服薬|薬)", "服薬"),
+    (r"(気分|落ち込|不安|抑うつ|憂うつ)", "気分の落ち込み"),
+]
+# どのカテゴリにも一致しない問題
+ISSUE_CATEGORY_OTHER = "その他"
+
+_COMPILED_ISSUE_CATEGORIES = [(re.compile(pattern), category) for pattern, category in ISSUE_CATEGORIES]
+
+
+@dataclass
+class PolicyDecision:
+    """通知ポリシーの判定結果"""
+    action: str
+    reason: str
+    fingerprint: str
+
+
+def issue_categories(issues: List[str]) -> List[str]:
+    """検出された問題をカテゴリに分類（重複を除いて並べ替えたリスト）"""
+    categories = set()
+    for issue in issues:
+        matched = [category for pattern, category in _COMPILED_ISSUE_CATEGORIES if pattern.search(issue)]
+        categories.update(matched or [ISSUE_CATEGORY_OTHER])
+    return sorted(categories)
+
+
+def issue_fingerprint(result: CallCheckResult) -> str:
+    """重要度と問題のカテゴリから指紋を生成（LLMの言い回しの揺れで抑制が外れないようにする）"""
+    key = "|".join([result.severity_level.name] + issue_categories(result.detected_issues))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+class NotificationPolicy:
+    """通知ポリシーエンジン"""
+
+    def __init__(
+        self,
+        dispatcher: Optional[NotificationDispatcher] = None,
+        state_repository: Optional[FirestoreNotificationStateRepository] = None,
+        suppress_window_minutes: Optional[int] = None,
+        digest_interval_minutes: Optional[int] = None,
+        digest_level: Optional[SeverityLevel] = None,
+    ):
+        """
+        Args:
+            dispatcher: 通知ディスパッチャー
+            state_repository: 通知状態リポジトリ
+            suppress_window_minutes: 同一内容の再通知を抑制する期間（環境変数NOTIFICATION_SUPPRESS_WINDOW_MINUTES）
+            digest_interval_minutes: ダイジェスト送信間隔（環境変数NOTIFICATION_DIGEST_INTERVAL_MINUTES）
+            digest_level: この重要度以下のアラートをダイジェストにまとめる（環境変数NOTIFICATION_DIGEST_LEVEL）
+        """
+        self.dispatcher = dispatcher or NotificationDispatcher()
+        self.state_repository = state_repository or FirestoreNotificationStateRepository()
+        self.suppress_window = timedelta(minutes=suppress_window_minutes or int(
+            os.getenv("NOTIFICATION_SUPPRESS_WINDOW_MINUTES", "360")))
+        self.digest_interval = timedelta(minutes=digest_interval_minutes or int(
+            os.getenv("NOTIFICATION_DIGEST_INTERVAL_MINUTES", "60")))
+        self.digest_level = digest_level or getattr(
+            SeverityLevel, os.getenv("NOTIFICATION_DIGEST_LEVEL", "OBSERVATION"), SeverityLevel.OBSERVATION)
+        # 1通のダイジェストにまとめる最大件数（超えた分は次回のダイジェストで送信する）
+        self.digest_max_items = int(os.getenv("NOTIFICATION_DIGEST_MAX_ITEMS", "200"))
+
+    def decide(self, result: CallCheckResult, last: Optional[Dict[str, Any]],
+               now: Optional[datetime] = None) -> PolicyDecision:
+        """
+        通知方法を判定（状態の読み書きは行わない）
+
+        Args:
+            result: 通話チェック結果
+            last: 直近の通知状態（未通知の場合はNone）
+            now: 判定時刻
+
+        Returns:
+            PolicyDecision: 判定結果
+        """
+        now = now or datetime.now(timezone.utc)
+        fingerprint = issue_fingerprint(result)
+        level = result.severity_level.level
+
+        last_level = None
+        if last and last.get("severity_level"):
+            try:
+                last_level = SeverityLevel(last["severity_level"]).level
+            except ValueError:
+                last_level = None
+
+        if last_level is not None and level > last_level:
+            return PolicyDecision(ACTION_SEND, "escalated", fingerprint)
+
+        notified_at = last.get("notified_at") if last else None
+        if (last_level == level
+                and last.get("fingerprint") == fingerprint
+                and notified_at is not None
+                and now - notified_at < self.suppress_window):
+            return PolicyDecision(ACTION_SUPPRESS, "duplicate_within_window", fingerprint)
+
+        if level <= self.digest_level.level:
+            return PolicyDecision(ACTION_DIGEST, "digest_level", fingerprint)
+
+        return PolicyDecision(ACTION_SEND, "new_alert", fingerprint)
+
+    async def process(self, user_id: str, result: CallCheckResult) -> Dict[str, Any]:
+        """
+        通話チェック結果をポリシーに従って通知
+
+        Args:
+            user_id: ユーザーID
+            result: 通話チェック結果
+
+        Returns:
+            Dict[str, Any]: 処理結果（action, success など）
+        """
+        try:
+            last = await self.state_repository.get_last_notification(user_id)
+        except Exception as e:
+            # 状態が読めない場合は通知漏れを避けるため抑制しない
+            logger.error(f"通知状態取得失敗（抑制なしで判定）: user_id={user_id}, error={e}")
+            last = None
+
+        decision = self.decide(result, last)
+        metrics.increment("notification_policy_decisions_total", action=decision.action)
+        logger.info(
+            f"通知ポリシー判定: user_id={user_id}, severity_level={result.severity_level}, action={decision.action}, reason={decision.reason}")
+
+        if decision.action == ACTION_SUPPRESS:
+            return {"success": True, "action": decision.action, "reason": decision.reason}
+
+        notification_result = None
+        if decision.action == ACTION_DIGEST:
+            recipient = self.dispatcher.repository.to_email
+            try:
+                await self.state_repository.add_digest_item(recipient, {
+                    "user_id": user_id,
+                    "severity_level": result.severity_level.value,
+                    "reason": result.reason,
+                    "detected_issues": result.detected_issues,
+                    "source_calls": result.source_calls,
+                    "analyzed_at": result.analyzed_at.strftime('%Y-%m-%d %H:%M:%S'),
+                })
+                notification_result = {"success": True}
+            except Exception as e:
+                # ダイジェストに積めない場合はアラートを失わないよう即時送信する
+                logger.error(f"ダイジェスト追加失敗（即時送信に切り替え）: user_id={user_id}, error={e}")
+                metrics.increment("notification_digest_fallbacks_total")
+                decision = PolicyDecision(ACTION_SEND, "digest_fallback", decision.fingerprint)
+
+        if notification_result is None:
+            notification_result = await self.dispatcher.dispatch(user_id, result)
+
+        try:
+            await self.state_repository.save_last_notification(
+                user_id, result.severity_level.value, decision.fingerprint, decision.action)
+        except Exception as e:
+            logger.error(f"通知状態保存失敗: user_id={user_id}, error={e}")
+
+        notification_result.update({"action": decision.action, "reason": decision.reason})
+        return notification_result
+
+    async def flush_digests(self, now: Optional[datetime] = None) -> int:
+        """
+        送信間隔に達したダイジェストを送信
+
+        Args:
+            now: 判定時刻
+
+        Returns:
+            int: 送信したダイジェスト数
+        """
+        now = now or datetime.now(timezone.utc)
+        recipients = await self.state_repository.get_due_digest_recipients(now - self.digest_interval)
+
+        sent = 0
+        for recipient in recipients:
+            items = await self.state_repository.pop_digest_items(recipient, self.digest_max_items)
+            if not items:
+                continue
+
+            payload = self.dispatcher.repository.build_digest_payload(items)
+            payload["to_email"] = recipient
+            # アウトボックス経由で送信するため、失敗しても後で再送される
+            await self.dispatcher.dispatch_payload(
+                f"digest:{recipient}", payload, {"digest_items": len(items)})
+            metrics.increment("notification_digests_sent_total")
+            metrics.observe("notification_digest_items", len(items))
+            sent += 1
+        return sent
+
+    async def run_digest_worker(self, stop_event: asyncio.Event, interval_seconds: float = 60.0) -> None:
+        """
+        ダイジェスト送信ワーカー（アプリ起動中に常駐）
+
+        Args:
+            stop_event: 停止シグナル
+            interval_seconds: ポーリング間隔
+        """
+        logger.info("通知ダイジェストワーカー開始")
+        while not stop_event.is_set():
+            try:
+                sent = await self.flush_digests()
+                if sent:
+                    logger.info(f"ダイジェスト送信: {sent}件")
+            except Exception as e:
+                logger.error(f"ダイジェスト送信処理エラー: {e}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("通知ダイジェストワーカー停止")
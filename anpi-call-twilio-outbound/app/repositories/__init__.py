@@ -5,6 +5,9 @@ from .firestore_transcription_repository import FirestoreTranscriptionRepository
 from .firestore_call_check_repository import FirestoreCallCheckRepository
 from .notification_repository import NotificationRepository
 from .webhook_notification_repository import WebhookNotificationRepository
+from .firestore_notification_outbox_repository import FirestoreNotificationOutboxRepository
+from .firestore_notification_state_repository import FirestoreNotificationStateRepository
+from .firestore_post_call_job_repository import FirestorePostCallJobRepository
 
 __all__ = [
     "CloudSQLEventRepository",
@@ -12,5 +15,8 @@ __all__ = [
     "FirestoreTranscriptionRepository",
     "FirestoreCallCheckRepository",
     "NotificationRepository",
-    "WebhookNotificationRepository"
+    "WebhookNotificationRepository",
+    "FirestoreNotificationOutboxRepository",
+    "FirestoreNotificationStateRepository",
+    "FirestorePostCallJobRepository"
 ]
\ No newline at end of file
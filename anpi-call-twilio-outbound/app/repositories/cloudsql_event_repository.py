@@ -6,7 +6,7 @@ import logging
 from sqlalchemy import select, and_
 
 from models.schemas import Event
-from database import get_db_session, EventTable
+from database import get_db_session, db_operation, EventTable
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +18,7 @@ class CloudSQLEventRepository:
     データベース接続は分離され、ビジネスロジックに集中
     """
 
+    @db_operation()
     async def get_all_events(self) -> List[Event]:
         """全てのイベントを取得"""
         try:
@@ -33,6 +34,7 @@ class CloudSQLEventRepository:
             logger.error(f"イベント取得中にエラーが発生しました: {e}")
             raise Exception(f"イベント取得中にエラーが発生しました: {str(e)}")
 
+    @db_operation()
     async def get_events_by_prefecture(self, prefecture: str) -> List[Event]:
         """都道府県でイベントをフィルタリング"""
         try:
@@ -50,6 +52,7 @@ class CloudSQLEventRepository:
             logger.error(f"都道府県別イベント取得中にエラーが発生しました: {e}")
             raise Exception(f"都道府県別イベント取得中にエラーが発生しました: {str(e)}")
 
+    @db_operation()
     async def get_events_by_date_range(
         self,
         start_date: datetime,
@@ -76,6 +79,7 @@ class CloudSQLEventRepository:
             logger.error(f"日付範囲別イベント取得中にエラーが発生しました: {e}")
             raise Exception(f"日付範囲別イベント取得中にエラーが発生しました: {str(e)}")
 
+    @db_operation()
     async def get_events_by_prefecture_and_date_range(
         self,
         prefecture: str,
@@ -106,6 +110,7 @@ class CloudSQLEventRepository:
             logger.error(f"都道府県・日付範囲別イベント取得中にエラーが発生しました: {e}")
             raise Exception(f"都道府県・日付範囲別イベント取得中にエラーが発生しました: {str(e)}")
 
+    @db_operation()
     async def get_upcoming_events_by_prefecture(
         self,
         prefecture: str,
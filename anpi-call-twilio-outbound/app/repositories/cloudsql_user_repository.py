@@ -1,10 +1,11 @@
 """CloudSQL implementation of UserRepository."""
-from typing import Optional
+from typing import AsyncIterator, Dict, Iterable, Optional
+import os
 import logging
 from sqlalchemy import select
 
-from models.schemas import User
-from database import get_db_session, UserTable
+from models.schemas import User, weekday_bit, weekdays_from_mask
+from database import get_db_session, db_operation, UserTable
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +17,7 @@ class CloudSQLUserRepository:
     データベース接続は分離され、ビジネスロジックに集中
     """
 
+    @db_operation()
     async def get_user_by_id(self, user_id: str) -> Optional[User]:
         """
         ユーザーIDでユーザー情報を取得
@@ -43,8 +45,92 @@ class CloudSQLUserRepository:
             logger.error(f"Error fetching user {user_id}: {str(e)}")
             raise Exception(f"ユーザー取得中にエラーが発生しました: {str(e)}")
 
+    @db_operation()
+    async def get_users_by_ids(self, user_ids: Iterable[str], chunk_size: Optional[int] = None) -> Dict[str, User]:
+        """
+        複数のユーザー情報を一括取得
+
+        IN句をchunk_size件ずつに分割して実行するため、N件の取得にかかるクエリ数はN/chunk_size回
+
+        Args:
+            user_ids: ユーザーIDのリスト（重複は除外）
+            chunk_size: 1クエリあたりのID数（環境変数USER_LOOKUP_CHUNK_SIZE）
+
+        Returns:
+            Dict[str, User]: ユーザーIDをキーとするユーザー情報（見つからないIDは含まない）
+        """
+        chunk_size = chunk_size or int(os.getenv("USER_LOOKUP_CHUNK_SIZE", "500"))
+        unique_ids = list(dict.fromkeys(user_ids))
+        users: Dict[str, User] = {}
+        if not unique_ids:
+            return users
+
+        try:
+            session = await get_db_session()
+            async with session:
+                for start in range(0, len(unique_ids), chunk_size):
+                    chunk = unique_ids[start:start + chunk_size]
+                    stmt = select(UserTable).where(UserTable.user_id.in_(chunk))
+                    result = await session.execute(stmt)
+                    for user_row in result.scalars():
+                        users[user_row.user_id] = self._to_user_model(user_row)
+                    # 変換済みの行をセッションから解放してメモリを一定に保つ
+                    session.expunge_all()
+
+            missing = len(unique_ids) - len(users)
+            if missing:
+                logger.warning(f"Users not found: {missing} of {len(unique_ids)}")
+            return users
+
+        except Exception as e:
+            logger.error(f"Error fetching users in bulk ({len(unique_ids)} ids): {str(e)}")
+            raise Exception(f"ユーザー一括取得中にエラーが発生しました: {str(e)}")
+
+    @db_operation()
+    async def iter_users(self, prefecture: Optional[str] = None, call_weekday: Optional[str] = None,
+                         scheduled_only: bool = False, batch_size: Optional[int] = None) -> AsyncIterator[User]:
+        """
+        条件に一致するユーザーを1件ずつ取得（サーバーサイドカーソルで逐次読み込み）
+
+        結果全体をメモリに読み込まないため、ユーザー数にかかわらずメモリ使用量はbatch_size件分で一定。
+        取得中はDB接続を1本占有するため、呼び出し側は最後まで読み進めるか途中でbreakすること。
+
+        Args:
+            prefecture: 都道府県で絞り込む
+            call_weekday: 発信曜日で絞り込む（その曜日を含む複数曜日の指定も対象）
+            scheduled_only: 発信時刻・曜日が設定されたユーザーのみ
+            batch_size: カーソルから1回に読み込む件数（環境変数USER_STREAM_BATCH_SIZE）
+
+        Yields:
+            User: ユーザー情報（user_id順）
+        """
+        batch_size = batch_size or int(os.getenv("USER_STREAM_BATCH_SIZE", "1000"))
+        stmt = select(UserTable).order_by(UserTable.user_id)
+        if prefecture is not None:
+            stmt = stmt.where(UserTable.prefecture == prefecture)
+        if call_weekday is not None:
+            stmt = stmt.where(UserTable.call_weekdays_mask.op("&")(weekday_bit(call_weekday)) != 0)
+        if scheduled_only:
+            stmt = stmt.where(UserTable.call_time.is_not(None), UserTable.call_weekdays_mask != 0)
+
+        try:
+            session = await get_db_session()
+            async with session:
+                result = await session.stream(stmt.execution_options(yield_per=batch_size))
+                async for partition in result.scalars().partitions():
+                    for user_row in partition:
+                        yield self._to_user_model(user_row)
+                    session.expunge_all()
+
+        except Exception as e:
+            logger.error(f"Error streaming users: {str(e)}")
+            raise Exception(f"ユーザー一覧取得中にエラーが発生しました: {str(e)}")
+
     def _to_user_model(self, user_table: UserTable) -> User:
         """UserTableオブジェクトをUserモデルに変換"""
+        call_weekdays = weekdays_from_mask(user_table.call_weekdays_mask)
+        # 曜日マスクのみ設定された利用者は call_weekday が NULL のため、マスクの最初の曜日で補う
+        call_weekday = user_table.call_weekday or (call_weekdays[0] if call_weekdays else None)
         return User(
             user_id=user_table.user_id,
             last_name=user_table.last_name,
@@ -60,7 +146,8 @@ class CloudSQLUserRepository:
             gender=user_table.gender,
             birth_date=user_table.birth_date,
             call_time=user_table.call_time,
-            call_weekday=user_table.call_weekday,
+            call_weekday=call_weekday,
+            call_weekdays=call_weekdays,
             created_at=user_table.created_at,
             updated_at=user_table.updated_at
         )
@@ -2,28 +2,61 @@
 
 import os
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict, Any
 from google.cloud import firestore
 from google.cloud.firestore_v1.async_client import AsyncClient
+from google.cloud.firestore_v1.async_transaction import async_transactional
 
-from models.call_check import CallCheckResult
+from models.call_check import CallCheckResult, SeverityLevel
+from utils.clients import clients
 
 
 class FirestoreCallCheckRepository:
-    """通話チェック結果をFirestoreに保存するリポジトリ"""
+    """
+    通話チェック結果をFirestoreに保存するリポジトリ
 
-    def __init__(self, project_id: Optional[str] = None):
+    チェック結果の保存時に以下の集計ドキュメントを同一トランザクションで更新する。
+    - /users/{user_id}/call_check_rollups/summary : 最新の重要度と日別・重要度別の件数
+    - /municipalities/{municipality_id}/severity_index/{LEVEL}/users/{user_id} : 現在の重要度（要観察・異常）のユーザー
+
+    重要度別インデックスはユーザーごとに1ドキュメントとし、同時に完了したチェックが同じドキュメントを
+    奪い合わないようにする。通常（NORMAL）のユーザーはインデックスに含めない。
+    """
+
+    def __init__(self, project_id: Optional[str] = None,
+                 db: Optional[AsyncClient] = None):
         self.project_id = project_id or os.getenv("GCP_PROJECT_ID")
-        self.db: AsyncClient = firestore.AsyncClient(project=self.project_id)
+        # クライアントはプロセスで共有する（テスト時はフェイクを注入可能）
+        self.db: AsyncClient = db or clients.firestore(self.project_id)
+        self.municipality_id = os.getenv("MUNICIPALITY_ID", "default")
+        # 日別集計の保持日数
+        self.rollup_retention_days = int(os.getenv("CALL_CHECK_ROLLUP_RETENTION_DAYS", "180"))
+
+    def _summary_ref(self, user_id: str):
+        return (self.db.collection("users")
+                .document(user_id)
+                .collection("call_check_rollups")
+                .document("summary"))
+
+    def _severity_index_users(self, level: SeverityLevel):
+        return (self.db.collection("municipalities")
+                .document(self.municipality_id)
+                .collection("severity_index")
+                .document(level.name)
+                .collection("users"))
 
-    async def save_check_result(self, user_id: str, result: CallCheckResult) -> str:
+    def _severity_index_ref(self, level: SeverityLevel, user_id: str):
+        return self._severity_index_users(level).document(user_id)
+
+    async def save_check_result(self, user_id: str, result: CallCheckResult, update_rollups: bool = True) -> str:
         """
         通話チェック結果を保存
         
         Args:
             user_id: ユーザーID
             result: チェック結果
+            update_rollups: 集計ドキュメントを更新するか（分析エラー時の結果などはFalse）
             
         Returns:
             保存されたドキュメントID
@@ -42,13 +75,77 @@ class FirestoreCallCheckRepository:
             check_data = result.model_dump()
             check_data["created_at"] = firestore.SERVER_TIMESTAMP
             
-            await doc_ref.set(check_data)
+            if not update_rollups:
+                await doc_ref.set(check_data)
+                return check_id
+
+            summary_ref = self._summary_ref(user_id)
+
+            @async_transactional
+            async def _save(transaction):
+                # トランザクション内の読み取りは書き込みより先に行う
+                snapshot = await summary_ref.get(transaction=transaction)
+                summary = snapshot.to_dict() if snapshot.exists else {}
+
+                transaction.set(doc_ref, check_data)
+                self._apply_rollups(transaction, user_id, check_id, result, summary)
+
+            await _save(self.db.transaction())
             
             return check_id
             
         except Exception as e:
             raise Exception(f"チェック結果保存エラー: {str(e)}")
 
+    def _apply_rollups(self, transaction, user_id: str, check_id: str, result: CallCheckResult,
+                       summary: Dict[str, Any]) -> None:
+        """集計ドキュメント（ユーザー別サマリー・重要度別インデックス）の更新をトランザクションに追加"""
+        analyzed_at = result.analyzed_at
+        if analyzed_at.tzinfo is None:
+            # Firestoreはタイムゾーンなしの日時をUTCとして保存するため、比較時も同様に扱う
+            analyzed_at = analyzed_at.replace(tzinfo=timezone.utc)
+        level = result.severity_level
+
+        # 日別・重要度別の件数（保持期間を過ぎた日は削除）
+        day_key = result.analyzed_at.strftime("%Y-%m-%d")
+        oldest_key = (result.analyzed_at - timedelta(days=self.rollup_retention_days)).strftime("%Y-%m-%d")
+        daily = {day: counts for day, counts in (summary.get("daily") or {}).items() if day >= oldest_key}
+        day_counts = dict(daily.get(day_key) or {})
+        day_counts[level.name] = day_counts.get(level.name, 0) + 1
+        daily[day_key] = day_counts
+
+        previous_level_name = summary.get("latest_severity")
+        previous_analyzed_at = summary.get("latest_analyzed_at")
+        is_latest = previous_analyzed_at is None or analyzed_at >= previous_analyzed_at
+
+        new_summary = dict(summary)
+        new_summary.update({
+            "daily": daily,
+            "total_checks": summary.get("total_checks", 0) + 1,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        })
+        if is_latest:
+            new_summary.update({
+                "latest_severity": level.name,
+                "latest_analyzed_at": analyzed_at,
+                "latest_check_id": check_id,
+                "latest_detected_issues": result.detected_issues,
+            })
+        transaction.set(self._summary_ref(user_id), new_summary)
+
+        if not is_latest:
+            return
+
+        # 重要度別インデックスの移動（古いレベルから削除し、新しいレベルに追加。通常は登録しない）
+        if previous_level_name and previous_level_name != level.name \
+                and previous_level_name != SeverityLevel.NORMAL.name:
+            transaction.delete(self._severity_index_ref(SeverityLevel[previous_level_name], user_id))
+        if level != SeverityLevel.NORMAL:
+            transaction.set(
+                self._severity_index_ref(level, user_id),
+                {"user_id": user_id, "analyzed_at": analyzed_at, "check_id": check_id,
+                 "updated_at": firestore.SERVER_TIMESTAMP})
+
     async def get_check_result(self, user_id: str, check_id: str) -> Optional[Dict[str, Any]]:
         """
         特定のチェック結果を取得
@@ -132,7 +229,7 @@ class FirestoreCallCheckRepository:
 
     async def get_check_history_stats(self, user_id: str, days: int = 30) -> Dict[str, Any]:
         """
-        ユーザーのチェック履歴統計を取得
+        ユーザーのチェック履歴統計を取得（集計ドキュメント1件の読み取り）
         
         Args:
             user_id: ユーザーID
@@ -142,41 +239,104 @@ class FirestoreCallCheckRepository:
             統計データ
         """
         try:
-            from datetime import timedelta
-            
-            cutoff_date = datetime.now() - timedelta(days=days)
-            
-            query = (self.db.collection("users")
-                    .document(user_id)
-                    .collection("call_checks")
-                    .where("analyzed_at", ">=", cutoff_date)
-                    .order_by("analyzed_at"))
-            
-            docs = await query.get()
-            
-            total_checks = len(docs)
+            snapshot = await self._summary_ref(user_id).get()
+            if not snapshot.exists:
+                # 集計ドキュメント導入前のユーザーは従来通りチェック結果を走査する
+                return await self._scan_check_history_stats(user_id, days)
+
+            summary = snapshot.to_dict()
+            cutoff_key = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+
+            total_checks = 0
             issue_count = 0
-            latest_check = None
-            
-            for doc in docs:
-                data = doc.to_dict()
-                
-                severity_level = data.get("severity_level", "通常")
-                if severity_level in ["要観察", "異常"]:
-                    issue_count += 1
-                
-                if latest_check is None or data.get("analyzed_at") > latest_check:
-                    latest_check = data.get("analyzed_at")
-            
+            for day, counts in (summary.get("daily") or {}).items():
+                if day < cutoff_key:
+                    continue
+                total_checks += sum(counts.values())
+                issue_count += counts.get(SeverityLevel.OBSERVATION.name, 0)
+                issue_count += counts.get(SeverityLevel.ABNORMAL.name, 0)
+
+            latest_severity = summary.get("latest_severity")
             return {
                 "user_id": user_id,
                 "period_days": days,
                 "total_checks": total_checks,
                 "issue_count": issue_count,
                 "issue_rate": issue_count / total_checks if total_checks > 0 else 0.0,
-                "latest_check": latest_check
+                "latest_check": summary.get("latest_analyzed_at"),
+                "latest_severity": SeverityLevel[latest_severity].value if latest_severity else None
             }
             
         except Exception as e:
             raise Exception(f"チェック履歴統計取得エラー: {str(e)}")
 
+    async def _scan_check_history_stats(self, user_id: str, days: int) -> Dict[str, Any]:
+        """チェック結果を走査して統計を算出（集計ドキュメントがない場合のフォールバック）"""
+        cutoff_date = datetime.now() - timedelta(days=days)
+        
+        query = (self.db.collection("users")
+                .document(user_id)
+                .collection("call_checks")
+                .where("analyzed_at", ">=", cutoff_date)
+                .order_by("analyzed_at")
+                .select(["severity_level", "analyzed_at"]))
+        
+        docs = await query.get()
+        
+        total_checks = len(docs)
+        issue_count = 0
+        latest_check = None
+        latest_severity = None
+        
+        for doc in docs:
+            data = doc.to_dict()
+            
+            severity_level = data.get("severity_level", "通常")
+            if severity_level in ["要観察", "異常"]:
+                issue_count += 1
+            
+            if latest_check is None or data.get("analyzed_at") > latest_check:
+                latest_check = data.get("analyzed_at")
+                latest_severity = severity_level
+        
+        return {
+            "user_id": user_id,
+            "period_days": days,
+            "total_checks": total_checks,
+            "issue_count": issue_count,
+            "issue_rate": issue_count / total_checks if total_checks > 0 else 0.0,
+            "latest_check": latest_check,
+            "latest_severity": latest_severity
+        }
+
+    async def get_watchlist(self, levels: Optional[List[SeverityLevel]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        現在の重要度ごとのユーザー一覧を取得（重要度ごとのインデックスのクエリ）
+        
+        Args:
+            levels: 取得する重要度（デフォルト: 要観察・異常。通常はインデックスに含めないため常に空）
+            
+        Returns:
+            重要度（表示名）をキーとしたユーザー一覧（user_id, analyzed_at, check_id）。新しい順
+        """
+        try:
+            levels = levels or [SeverityLevel.OBSERVATION, SeverityLevel.ABNORMAL]
+            
+            watchlist: Dict[str, List[Dict[str, Any]]] = {level.value: [] for level in levels}
+            for level in levels:
+                if level == SeverityLevel.NORMAL:
+                    continue
+                query = (self._severity_index_users(level)
+                         .order_by("analyzed_at", direction=firestore.Query.DESCENDING))
+                async for snapshot in query.stream():
+                    data = snapshot.to_dict()
+                    watchlist[level.value].append({
+                        "user_id": snapshot.id,
+                        "analyzed_at": data.get("analyzed_at"),
+                        "check_id": data.get("check_id"),
+                    })
+            
+            return watchlist
+            
+        except Exception as e:
+            raise Exception(f"要注意ユーザー一覧取得エラー: {str(e)}")
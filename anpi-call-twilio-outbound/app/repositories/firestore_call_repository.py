@@ -2,202 +2,199 @@
 
 import os
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Union
 from google.cloud import firestore
 from google.cloud.firestore_v1.async_client import AsyncClient
 
-from models.call import Call
+from models.call import Call, CallMetadata
 from models.transcription import TranscriptionMessage
+from repositories.transcript_codec import TRANSCRIPT_FIELDS, decode_transcriptions
+from utils.clients import clients
+
+# メタデータのみ取得する場合にプロジェクションで取得するフィールド
+CALL_METADATA_FIELDS = ["user_id", "call_started_at", "call_ended_at"]
 
 
 class FirestoreCallRepository:
-    """Firestoreから通話データを取得するリポジトリ"""
+    """
+    Firestoreから通話データを取得するリポジトリ
+
+    一覧系のメソッドは metadata_only=True を指定すると、発言記録（messages / v1のtranscriptions）を
+    フィールドプロジェクションで除外し、メタデータ分の転送量で取得できる。
+    発言記録は必要になった時点で get_transcriptions / load_transcriptions で取得する。
+    """
 
-    def __init__(self, project_id: Optional[str] = None):
+    def __init__(self, project_id: Optional[str] = None,
+                 db: Optional[AsyncClient] = None):
         self.project_id = project_id or os.getenv("GCP_PROJECT_ID")
-        self.db: AsyncClient = firestore.AsyncClient(project=self.project_id)
+        # クライアントはプロセスで共有する（テスト時はフェイクを注入可能）
+        self.db: AsyncClient = db or clients.firestore(self.project_id)
+
+    def _calls_ref(self, user_id: str):
+        return (self.db.collection("users")
+                .document(user_id)
+                .collection("calls"))
+
+    def _to_call(self, doc_id: str, data: Dict[str, Any],
+                 metadata_only: bool = False) -> Union[Call, CallMetadata]:
+        """Firestoreドキュメントを通話データに変換"""
+        if metadata_only:
+            return CallMetadata(
+                call_id=doc_id,
+                user_id=data.get("user_id"),
+                call_started_at=data.get("call_started_at"),
+                call_ended_at=data.get("call_ended_at")
+            )
+
+        return Call(
+            call_id=doc_id,
+            user_id=data.get("user_id"),
+            call_started_at=data.get("call_started_at"),
+            call_ended_at=data.get("call_ended_at"),
+            transcriptions=decode_transcriptions(doc_id, data)
+        )
+
+    async def _query_calls(self, query, metadata_only: bool) -> List[Union[Call, CallMetadata]]:
+        """クエリを実行して通話データのリストに変換"""
+        if metadata_only:
+            query = query.select(CALL_METADATA_FIELDS)
 
-    async def get_recent_calls(self, user_id: str, days: int = 7, max_calls: int = 5) -> List[Call]:
+        docs = await query.get()
+        return [self._to_call(doc.id, doc.to_dict(), metadata_only) for doc in docs]
+
+    async def get_recent_calls(self, user_id: str, days: int = 7, max_calls: int = 5,
+                               metadata_only: bool = False) -> List[Union[Call, CallMetadata]]:
         """
         指定ユーザーの最近の通話データを取得
-        
+
         Args:
             user_id: ユーザーID
             days: 取得期間（日数）
             max_calls: 最大取得件数
-            
+            metadata_only: 発言記録を取得せずメタデータのみ返す
+
         Returns:
             通話データのリスト
         """
         try:
             cutoff_date = datetime.now() - timedelta(days=days)
-            
-            calls_ref = (self.db.collection("users")
-                        .document(user_id)
-                        .collection("calls"))
-            
+
             # 最近の通話を取得
-            query = (calls_ref
+            query = (self._calls_ref(user_id)
                     .where("call_started_at", ">=", cutoff_date)
                     .order_by("call_started_at", direction=firestore.Query.DESCENDING)
                     .limit(max_calls))
-            
-            docs = await query.get()
-            
-            calls = []
-            for doc in docs:
-                data = doc.to_dict()
-                # transcriptionsをTranscriptionMessageのリストに変換
-                transcriptions = [
-                    TranscriptionMessage(**msg) 
-                    for msg in data.get("transcriptions", [])
-                ]
-                
-                call = Call(
-                    call_id=doc.id,
-                    user_id=data.get("user_id"),
-                    call_started_at=data.get("call_started_at"),
-                    call_ended_at=data.get("call_ended_at"),
-                    transcriptions=transcriptions
-                )
-                calls.append(call)
-            
-            return calls
-            
+
+            return await self._query_calls(query, metadata_only)
+
         except Exception as e:
             raise Exception(f"通話データ取得エラー: {str(e)}")
 
     async def get_call_by_id(self, user_id: str, call_sid: str) -> Optional[Call]:
         """
         特定の通話データを取得
-        
+
         Args:
             user_id: ユーザーID
             call_sid: 通話ID
-            
+
         Returns:
             通話データ
         """
         try:
-            doc_ref = (self.db.collection("users")
-                      .document(user_id)
-                      .collection("calls")
-                      .document(call_sid))
-            
-            doc = await doc_ref.get()
-            
+            doc = await self._calls_ref(user_id).document(call_sid).get()
+
             if doc.exists:
-                data = doc.to_dict()
-                # transcriptionsをTranscriptionMessageのリストに変換
-                transcriptions = [
-                    TranscriptionMessage(**msg) 
-                    for msg in data.get("transcriptions", [])
-                ]
-                
-                return Call(
-                    call_id=doc.id,
-                    user_id=data.get("user_id"),
-                    call_started_at=data.get("call_started_at"),
-                    call_ended_at=data.get("call_ended_at"),
-                    transcriptions=transcriptions
-                )
-            
+                return self._to_call(doc.id, doc.to_dict())
+
             return None
-            
+
         except Exception as e:
             raise Exception(f"通話データ取得エラー: {str(e)}")
 
-    async def get_latest_calls(self, user_id: str, n: int = 10) -> List[Call]:
+    async def get_latest_calls(self, user_id: str, n: int = 10,
+                               metadata_only: bool = False) -> List[Union[Call, CallMetadata]]:
         """
         指定ユーザーの直近n件の通話データを取得
-        
+
         Args:
             user_id: ユーザーID
             n: 取得する通話数
-            
+            metadata_only: 発言記録を取得せずメタデータのみ返す
+
         Returns:
             通話データのリスト（新しい順）
         """
         try:
-            calls_ref = (self.db.collection("users")
-                        .document(user_id)
-                        .collection("calls"))
-            
-            query = (calls_ref
+            query = (self._calls_ref(user_id)
                     .order_by("call_started_at", direction=firestore.Query.DESCENDING)
                     .limit(n))
-            
-            docs = await query.get()
-            
-            calls = []
-            for doc in docs:
-                data = doc.to_dict()
-                # transcriptionsをTranscriptionMessageのリストに変換
-                transcriptions = [
-                    TranscriptionMessage(**msg) 
-                    for msg in data.get("transcriptions", [])
-                ]
-                
-                call = Call(
-                    call_id=doc.id,
-                    user_id=data.get("user_id"),
-                    call_started_at=data.get("call_started_at"),
-                    call_ended_at=data.get("call_ended_at"),
-                    transcriptions=transcriptions
-                )
-                calls.append(call)
-            
-            return calls
-            
+
+            return await self._query_calls(query, metadata_only)
+
         except Exception as e:
             raise Exception(f"直近通話データ取得エラー: {str(e)}")
 
-    async def get_calls_by_date_range(self, user_id: str, start_date: datetime, end_date: datetime, max_calls: int = 5) -> List[Call]:
+    async def get_calls_by_date_range(self, user_id: str, start_date: datetime, end_date: datetime,
+                                      max_calls: int = 5,
+                                      metadata_only: bool = False) -> List[Union[Call, CallMetadata]]:
         """
         日付範囲で通話データを取得
-        
+
         Args:
             user_id: ユーザーID
             start_date: 開始日時
             end_date: 終了日時
             max_calls: 最大取得件数
-            
+            metadata_only: 発言記録を取得せずメタデータのみ返す
+
         Returns:
             通話データのリスト
         """
         try:
-            calls_ref = (self.db.collection("users")
-                        .document(user_id)
-                        .collection("calls"))
-            
-            query = (calls_ref
+            query = (self._calls_ref(user_id)
                     .where("call_started_at", ">=", start_date)
                     .where("call_started_at", "<=", end_date)
                     .order_by("call_started_at", direction=firestore.Query.DESCENDING)
                     .limit(max_calls))
-            
-            docs = await query.get()
-            
-            calls = []
-            for doc in docs:
-                data = doc.to_dict()
-                # transcriptionsをTranscriptionMessageのリストに変換
-                transcriptions = [
-                    TranscriptionMessage(**msg) 
-                    for msg in data.get("transcriptions", [])
-                ]
-                
-                call = Call(
-                    call_id=doc.id,
-                    user_id=data.get("user_id"),
-                    call_started_at=data.get("call_started_at"),
-                    call_ended_at=data.get("call_ended_at"),
-                    transcriptions=transcriptions
-                )
-                calls.append(call)
-            
-            return calls
-            
+
+            return await self._query_calls(query, metadata_only)
+
         except Exception as e:
             raise Exception(f"日付範囲通話データ取得エラー: {str(e)}")
 
+    async def get_transcriptions(self, user_id: str, call_sid: str) -> List[TranscriptionMessage]:
+        """
+        特定の通話の発言記録のみを取得
+
+        Args:
+            user_id: ユーザーID
+            call_sid: 通話ID
+
+        Returns:
+            発言記録のリスト（通話が存在しない場合は空）
+        """
+        try:
+            doc = await self._calls_ref(user_id).document(call_sid).get(field_paths=TRANSCRIPT_FIELDS)
+            if not doc.exists:
+                return []
+            return decode_transcriptions(doc.id, doc.to_dict())
+
+        except Exception as e:
+            raise Exception(f"発言記録取得エラー: {str(e)}")
+
+    async def load_transcriptions(self, call: Union[Call, CallMetadata]) -> Call:
+        """
+        メタデータのみの通話データに発言記録を読み込む（取得済みの場合はそのまま返す）
+
+        Args:
+            call: 通話データ
+
+        Returns:
+            発言記録を含む通話データ
+        """
+        if isinstance(call, Call):
+            return call
+
+        transcriptions = await self.get_transcriptions(call.user_id, call.call_id)
+        return Call(**call.model_dump(), transcriptions=transcriptions)
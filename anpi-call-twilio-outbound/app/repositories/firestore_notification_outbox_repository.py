@@ -0,0 +1,171 @@
+"""通知アウトボックスをFirestoreに永続化するリポジトリ"""
+
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Dict, Any
+from google.cloud import firestore
+from google.cloud.firestore_v1.async_client import AsyncClient
+from google.cloud.firestore_v1.async_transaction import async_transactional
+
+from utils.clients import clients
+
+# アウトボックスのステータス
+STATUS_PENDING = "pending"  # 未送信（再送待ちを含む）
+STATUS_SENT = "sent"  # 送信済み
+STATUS_FAILED = "failed"  # 再送上限に達した
+
+
+class FirestoreNotificationOutboxRepository:
+    """
+    通知アウトボックスのリポジトリ
+
+    パス: /notification_outbox/{outbox_id}
+    送信前に通知を永続化し、インスタンス停止後も別インスタンスが再送できるようにする。
+    処理中のエントリはリース（lease_until）で排他し、同時に複数インスタンスが送信しないようにする。
+    """
+
+    COLLECTION = "notification_outbox"
+
+    def __init__(self, project_id: Optional[str] = None,
+                 db: Optional[AsyncClient] = None):
+        self.project_id = project_id or os.getenv("GCP_PROJECT_ID")
+        # クライアントはプロセスで共有する（テスト時はフェイクを注入可能）
+        self.db: AsyncClient = db or clients.firestore(self.project_id)
+
+    async def enqueue(self, user_id: str, payload: Dict[str, Any], lease_seconds: int = 300,
+                      metadata: Optional[Dict[str, Any]] = None) -> str:
+        """
+        通知をアウトボックスに追加（呼び出し元が即時送信するためリースを取得した状態で保存）
+
+        Args:
+            user_id: ユーザーID
+            payload: 送信ペイロード
+            lease_seconds: リース秒数
+            metadata: 付加情報（重要度など）
+
+        Returns:
+            str: アウトボックスID
+        """
+        try:
+            outbox_id = str(uuid.uuid4())
+            now = datetime.now(timezone.utc)
+            await self.db.collection(self.COLLECTION).document(outbox_id).set({
+                "user_id": user_id,
+                "payload": payload,
+                "metadata": metadata or {},
+                "status": STATUS_PENDING,
+                "attempts": 0,
+                "next_attempt_at": now,
+                "lease_until": now + timedelta(seconds=lease_seconds),
+                "last_error": None,
+                "created_at": firestore.SERVER_TIMESTAMP,
+                "sent_at": None,
+            })
+            return outbox_id
+
+        except Exception as e:
+            raise Exception(f"通知アウトボックス追加エラー: {str(e)}")
+
+    async def get_due_entries(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        再送期限を過ぎた未送信エントリを取得
+
+        Args:
+            limit: 取得件数
+
+        Returns:
+            エントリのリスト（outbox_idを含む）
+        """
+        try:
+            now = datetime.now(timezone.utc)
+            query = (self.db.collection(self.COLLECTION)
+                     .where("status", "==", STATUS_PENDING)
+                     .where("next_attempt_at", "<=", now)
+                     .order_by("next_attempt_at")
+                     .limit(limit))
+
+            docs = await query.get()
+
+            entries = []
+            for doc in docs:
+                data = doc.to_dict()
+                data["outbox_id"] = doc.id
+                entries.append(data)
+            return entries
+
+        except Exception as e:
+            raise Exception(f"通知アウトボックス取得エラー: {str(e)}")
+
+    async def claim(self, outbox_id: str, lease_seconds: int = 300) -> Optional[Dict[str, Any]]:
+        """
+        エントリのリースを取得（他インスタンスが処理中の場合はNone）
+
+        Args:
+            outbox_id: アウトボックスID
+            lease_seconds: リース秒数
+
+        Returns:
+            取得できた場合はエントリ、できなかった場合はNone
+        """
+        doc_ref = self.db.collection(self.COLLECTION).document(outbox_id)
+
+        @async_transactional
+        async def _claim(transaction):
+            snapshot = await doc_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None
+
+            data = snapshot.to_dict()
+            now = datetime.now(timezone.utc)
+            lease_until = data.get("lease_until")
+            if data.get("status") != STATUS_PENDING or (lease_until and lease_until > now):
+                return None
+
+            transaction.update(doc_ref, {
+                "lease_until": now + timedelta(seconds=lease_seconds)})
+            data["outbox_id"] = outbox_id
+            return data
+
+        try:
+            return await _claim(self.db.transaction())
+        except Exception as e:
+            raise Exception(f"通知アウトボックスのリース取得エラー: {str(e)}")
+
+    async def mark_sent(self, outbox_id: str, attempts: int) -> None:
+        """送信済みとして記録"""
+        try:
+            await self.db.collection(self.COLLECTION).document(outbox_id).update({
+                "status": STATUS_SENT,
+                "attempts": attempts,
+                "lease_until": None,
+                "sent_at": firestore.SERVER_TIMESTAMP,
+            })
+        except Exception as e:
+            raise Exception(f"通知アウトボックス更新エラー: {str(e)}")
+
+    async def mark_retry(self, outbox_id: str, attempts: int, error: str,
+                         next_attempt_at: Optional[datetime]) -> None:
+        """
+        送信失敗を記録
+
+        Args:
+            outbox_id: アウトボックスID
+            attempts: これまでの試行回数
+            error: エラー内容
+            next_attempt_at: 次回再送時刻（Noneの場合は再送上限に達したものとして失敗扱い）
+        """
+        try:
+            update = {
+                "attempts": attempts,
+                "last_error": error,
+                "lease_until": None,
+            }
+            if next_attempt_at is None:
+                update["status"] = STATUS_FAILED
+            else:
+                update["next_attempt_at"] = next_attempt_at
+
+            await self.db.collection(self.COLLECTION).document(outbox_id).update(update)
+        except Exception as e:
+            raise Exception(f"通知アウトボックス更新エラー: {str(e)}")
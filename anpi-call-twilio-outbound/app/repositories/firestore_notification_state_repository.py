@@ -0,0 +1,179 @@
+"""通知ポリシーの状態（直近の通知・ダイジェスト待ち）をFirestoreに保存するリポジトリ"""
+
+import os
+import hashlib
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any
+from google.api_core.exceptions import AlreadyExists
+from google.cloud import firestore
+from google.cloud.firestore_v1.async_client import AsyncClient
+from google.cloud.firestore_v1.async_transaction import async_transactional
+
+from utils.clients import clients
+
+
+class FirestoreNotificationStateRepository:
+    """
+    通知ポリシーの状態リポジトリ
+
+    パス:
+    - /users/{user_id}/notification_state/latest : ユーザーごとの直近の通知内容
+    - /notification_digests/{recipient_key} : 宛先ごとのダイジェスト待ちの有無（最初のアラートの時刻）
+    - /notification_digests/{recipient_key}/items/{auto_id} : ダイジェスト待ちのアラート（1件1ドキュメント）
+
+    宛先は1つ（NOTIFICATION_EMAIL_TO）のため、アラートを宛先のドキュメントに積むと
+    ドキュメントあたりの書き込み上限（約1回/秒）とサイズ上限（1MiB）に達する。
+    アラートは個別のドキュメントとして追加し、宛先のドキュメントはダイジェストの送信ごとに1回だけ作成する
+    """
+
+    DIGEST_COLLECTION = "notification_digests"
+    DIGEST_ITEMS_COLLECTION = "items"
+
+    def __init__(self, project_id: Optional[str] = None,
+                 db: Optional[AsyncClient] = None):
+        self.project_id = project_id or os.getenv("GCP_PROJECT_ID")
+        # クライアントはプロセスで共有する（テスト時はフェイクを注入可能）
+        self.db: AsyncClient = db or clients.firestore(self.project_id)
+
+    def _state_ref(self, user_id: str):
+        return (self.db.collection("users")
+                .document(user_id)
+                .collection("notification_state")
+                .document("latest"))
+
+    def _digest_ref(self, recipient: str):
+        # メールアドレスをそのままドキュメントIDにしないようハッシュ化する
+        recipient_key = hashlib.sha256(recipient.encode("utf-8")).hexdigest()[:32]
+        return self.db.collection(self.DIGEST_COLLECTION).document(recipient_key)
+
+    async def get_last_notification(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        ユーザーの直近の通知状態を取得
+
+        Args:
+            user_id: ユーザーID
+
+        Returns:
+            直近の通知状態（severity_level, fingerprint, notified_at）。未通知の場合はNone
+        """
+        try:
+            doc = await self._state_ref(user_id).get()
+            return doc.to_dict() if doc.exists else None
+        except Exception as e:
+            raise Exception(f"通知状態取得エラー: {str(e)}")
+
+    async def save_last_notification(self, user_id: str, severity_level: str, fingerprint: str,
+                                     action: str) -> None:
+        """
+        ユーザーの直近の通知状態を保存
+
+        Args:
+            user_id: ユーザーID
+            severity_level: 通知した重要度
+            fingerprint: 検出された問題の指紋
+            action: 実施したアクション（send / digest）
+        """
+        try:
+            await self._state_ref(user_id).set({
+                "severity_level": severity_level,
+                "fingerprint": fingerprint,
+                "action": action,
+                "notified_at": datetime.now(timezone.utc),
+            })
+        except Exception as e:
+            raise Exception(f"通知状態保存エラー: {str(e)}")
+
+    async def add_digest_item(self, recipient: str, item: Dict[str, Any]) -> None:
+        """
+        ダイジェスト待ちのアラートを追加
+
+        Args:
+            recipient: 宛先メールアドレス
+            item: アラート内容
+        """
+        doc_ref = self._digest_ref(recipient)
+        try:
+            # アラートを先に追加してから宛先のドキュメントを確認する
+            # （送信と同時に追加された場合も、宛先のドキュメントが作り直されて次回の送信対象になる）
+            await doc_ref.collection(self.DIGEST_ITEMS_COLLECTION).add({
+                **item,
+                "queued_at": datetime.now(timezone.utc),
+            })
+            snapshot = await doc_ref.get()
+            if not snapshot.exists:
+                try:
+                    # 最初のアラートの時刻を基準にダイジェストを送信する
+                    await doc_ref.create({
+                        "recipient": recipient,
+                        "first_item_at": datetime.now(timezone.utc),
+                    })
+                except AlreadyExists:
+                    pass
+        except Exception as e:
+            raise Exception(f"ダイジェスト追加エラー: {str(e)}")
+
+    async def get_due_digest_recipients(self, cutoff: datetime, limit: int = 50) -> List[str]:
+        """
+        送信時刻に達したダイジェストの宛先を取得
+
+        Args:
+            cutoff: この時刻以前に最初のアラートが追加された宛先を対象とする
+            limit: 取得件数
+
+        Returns:
+            宛先メールアドレスのリスト
+        """
+        try:
+            query = (self.db.collection(self.DIGEST_COLLECTION)
+                     .where("first_item_at", "<=", cutoff)
+                     .limit(limit))
+            docs = await query.get()
+            return [doc.to_dict().get("recipient") for doc in docs if doc.to_dict().get("recipient")]
+        except Exception as e:
+            raise Exception(f"ダイジェスト宛先取得エラー: {str(e)}")
+
+    async def pop_digest_items(self, recipient: str, limit: int = 200) -> List[Dict[str, Any]]:
+        """
+        宛先のダイジェスト待ちアラートを古い順に最大limit件取り出して削除
+
+        残りがある場合は宛先のドキュメントを残し、次回の送信で続きを取り出す
+
+        Args:
+            recipient: 宛先メールアドレス
+            limit: 取り出す最大件数（最大499件）
+
+        Returns:
+            アラートのリスト
+        """
+        # アラートの削除と宛先のドキュメントの更新を1回のトランザクション（書き込み500件まで）で行う
+        limit = max(1, min(limit, 499))
+        doc_ref = self._digest_ref(recipient)
+        query = (doc_ref.collection(self.DIGEST_ITEMS_COLLECTION)
+                 .order_by("queued_at")
+                 .limit(limit + 1))
+
+        @async_transactional
+        async def _pop(transaction):
+            docs = await query.get(transaction=transaction)
+            batch, has_more = docs[:limit], len(docs) > limit
+            for doc in batch:
+                transaction.delete(doc.reference)
+            if has_more:
+                # 残りのアラートは次回の送信対象にする
+                transaction.set(doc_ref, {
+                    "recipient": recipient,
+                    "first_item_at": docs[limit].to_dict().get("queued_at"),
+                })
+            else:
+                transaction.delete(doc_ref)
+            items = []
+            for doc in batch:
+                item = doc.to_dict()
+                item.pop("queued_at", None)
+                items.append(item)
+            return items
+
+        try:
+            return await _pop(self.db.transaction())
+        except Exception as e:
+            raise Exception(f"ダイジェスト取得エラー: {str(e)}")
@@ -0,0 +1,217 @@
+"""通話終了後ジョブをFirestoreに永続化するリポジトリ"""
+
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Dict, Any
+from google.api_core.exceptions import AlreadyExists
+from google.cloud import firestore
+from google.cloud.firestore_v1.async_client import AsyncClient
+from google.cloud.firestore_v1.async_transaction import async_transactional
+
+from utils.clients import clients
+
+# ジョブのステータス
+JOB_PENDING = "pending"  # 実行待ち（再試行待ちを含む）
+JOB_RUNNING = "running"  # 実行中（リース取得済み）
+JOB_SUCCEEDED = "succeeded"  # 成功
+JOB_FAILED = "failed"  # 再試行上限に達した、または再試行不可のエラー
+
+
+class FirestorePostCallJobRepository:
+    """
+    通話終了後ジョブ（絵日記生成・通話チェックなど）のリポジトリ
+
+    パス: /post_call_jobs/{job_id}
+    実行中のジョブはリース（lease_until）で排他し、インスタンスが停止した場合はリース切れ後に別インスタンスが再実行する。
+    """
+
+    COLLECTION = "post_call_jobs"
+
+    def __init__(self, project_id: Optional[str] = None,
+                 db: Optional[AsyncClient] = None):
+        self.project_id = project_id or os.getenv("GCP_PROJECT_ID")
+        # クライアントはプロセスで共有する（テスト時はフェイクを注入可能）
+        self.db: AsyncClient = db or clients.firestore(self.project_id)
+
+    async def enqueue(self, job_id: str, job_type: str, user_id: str, payload: Dict[str, Any],
+                      max_attempts: int) -> bool:
+        """
+        ジョブを追加（同じjob_idのジョブが既にある場合は追加しない）
+
+        Args:
+            job_id: ジョブID（通話IDとジョブ種別から生成し、重複登録を防ぐ）
+            job_type: ジョブ種別
+            user_id: ユーザーID
+            payload: ジョブの入力
+            max_attempts: 最大試行回数
+
+        Returns:
+            bool: 追加した場合はTrue、既に存在した場合はFalse
+        """
+        try:
+            now = datetime.now(timezone.utc)
+            await self.db.collection(self.COLLECTION).document(job_id).create({
+                "job_type": job_type,
+                "user_id": user_id,
+                "payload": payload,
+                "status": JOB_PENDING,
+                "attempts": 0,
+                "max_attempts": max_attempts,
+                "next_attempt_at": now,
+                "lease_until": None,
+                "last_error": None,
+                "result": None,
+                "created_at": firestore.SERVER_TIMESTAMP,
+                "updated_at": firestore.SERVER_TIMESTAMP,
+                "finished_at": None,
+            })
+            return True
+
+        except AlreadyExists:
+            return False
+        except Exception as e:
+            raise Exception(f"ジョブ追加エラー: {str(e)}")
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        ジョブを取得
+
+        Args:
+            job_id: ジョブID
+
+        Returns:
+            ジョブ（job_idを含む）。存在しない場合はNone
+        """
+        try:
+            doc = await self.db.collection(self.COLLECTION).document(job_id).get()
+            if not doc.exists:
+                return None
+            data = doc.to_dict()
+            data["job_id"] = doc.id
+            return data
+
+        except Exception as e:
+            raise Exception(f"ジョブ取得エラー: {str(e)}")
+
+    async def get_due_job_ids(self, limit: int = 20) -> List[str]:
+        """
+        実行時刻を過ぎた実行待ちジョブのIDを取得
+
+        Args:
+            limit: 取得件数
+
+        Returns:
+            ジョブIDのリスト
+        """
+        try:
+            now = datetime.now(timezone.utc)
+            query = (self.db.collection(self.COLLECTION)
+                     .where("status", "in", [JOB_PENDING, JOB_RUNNING])
+                     .where("next_attempt_at", "<=", now)
+                     .order_by("next_attempt_at")
+                     .limit(limit))
+
+            docs = await query.get()
+            return [doc.id for doc in docs]
+
+        except Exception as e:
+            raise Exception(f"実行待ちジョブ取得エラー: {str(e)}")
+
+    async def claim(self, job_id: str, lease_seconds: int) -> Optional[Dict[str, Any]]:
+        """
+        ジョブのリースを取得して実行中にする（他インスタンスが実行中の場合はNone）
+
+        Args:
+            job_id: ジョブID
+            lease_seconds: リース秒数
+
+        Returns:
+            取得できた場合はジョブ（attemptsは今回の試行を含む）、できなかった場合はNone
+            （試行回数が上限に達している場合は失敗として終了し、Noneを返す）
+        """
+        doc_ref = self.db.collection(self.COLLECTION).document(job_id)
+
+        @async_transactional
+        async def _claim(transaction):
+            snapshot = await doc_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None
+
+            data = snapshot.to_dict()
+            now = datetime.now(timezone.utc)
+            lease_until = data.get("lease_until")
+            if data.get("status") not in (JOB_PENDING, JOB_RUNNING):
+                return None
+            if lease_until and lease_until > now:
+                return None
+            next_attempt_at = data.get("next_attempt_at")
+            if next_attempt_at and next_attempt_at > now:
+                return None
+
+            if data.get("attempts", 0) >= data.get("max_attempts", 1):
+                # 実行中のインスタンス停止・リース切れで上限まで試行済みのジョブは失敗として終了する
+                transaction.update(doc_ref, {
+                    "status": JOB_FAILED,
+                    "lease_until": None,
+                    "last_error": data.get("last_error") or "試行回数の上限に達しました（リース切れ）",
+                    "updated_at": firestore.SERVER_TIMESTAMP,
+                    "finished_at": firestore.SERVER_TIMESTAMP,
+                })
+                return None
+
+            attempts = data.get("attempts", 0) + 1
+            lease_until = now + timedelta(seconds=lease_seconds)
+            transaction.update(doc_ref, {
+                "status": JOB_RUNNING,
+                "attempts": attempts,
+                "lease_until": lease_until,
+                # リース切れ時に再取得できるよう、実行時刻もリース期限に合わせる
+                "next_attempt_at": lease_until,
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            })
+            data.update({"job_id": job_id, "attempts": attempts})
+            return data
+
+        try:
+            return await _claim(self.db.transaction())
+        except Exception as e:
+            raise Exception(f"ジョブのリース取得エラー: {str(e)}")
+
+    async def mark_succeeded(self, job_id: str, result: Optional[Dict[str, Any]] = None) -> None:
+        """成功として記録"""
+        try:
+            await self.db.collection(self.COLLECTION).document(job_id).update({
+                "status": JOB_SUCCEEDED,
+                "result": result,
+                "lease_until": None,
+                "updated_at": firestore.SERVER_TIMESTAMP,
+                "finished_at": firestore.SERVER_TIMESTAMP,
+            })
+        except Exception as e:
+            raise Exception(f"ジョブ更新エラー: {str(e)}")
+
+    async def mark_retry(self, job_id: str, error: str, next_attempt_at: Optional[datetime]) -> None:
+        """
+        失敗を記録
+
+        Args:
+            job_id: ジョブID
+            error: エラー内容
+            next_attempt_at: 次回実行時刻（Noneの場合は失敗として終了）
+        """
+        try:
+            update = {
+                "last_error": error,
+                "lease_until": None,
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            }
+            if next_attempt_at is None:
+                update["status"] = JOB_FAILED
+                update["finished_at"] = firestore.SERVER_TIMESTAMP
+            else:
+                update["status"] = JOB_PENDING
+                update["next_attempt_at"] = next_attempt_at
+
+            await self.db.collection(self.COLLECTION).document(job_id).update(update)
+        except Exception as e:
+            raise Exception(f"ジョブ更新エラー: {str(e)}")
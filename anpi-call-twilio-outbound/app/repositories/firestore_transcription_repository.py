@@ -8,14 +8,22 @@ from google.cloud.firestore_v1.async_client import AsyncClient
 from google.cloud.firestore_v1.async_batch import AsyncWriteBatch
 
 from models.transcription import TranscriptionMessage
+from repositories.transcript_codec import MESSAGES_FIELD, TRANSCRIPT_SCHEMA_VERSION, encode_message
+from utils.clients import clients
 
 
 class FirestoreTranscriptionRepository:
-    """Firestoreを使用した文字起こしストレージリポジトリの実装"""
+    """
+    Firestoreを使用した文字起こしストレージリポジトリの実装
 
-    def __init__(self, project_id: Optional[str] = None, auto_save_interval: int = 1000):
+    発言記録はv2形式（transcript_codec参照）で保存する。
+    """
+
+    def __init__(self, project_id: Optional[str] = None, auto_save_interval: int = 1000,
+                 db: Optional[AsyncClient] = None):
         self.project_id = project_id or os.getenv("GCP_PROJECT_ID")
-        self.db: AsyncClient = firestore.AsyncClient(project=self.project_id)
+        # クライアントはプロセスで共有する（テスト時はフェイクを注入可能）
+        self.db: AsyncClient = db or clients.firestore(self.project_id)
         self.auto_save_interval = auto_save_interval
         self.transcriptions: List[TranscriptionMessage] = []
         self.message_count = 0
@@ -66,6 +74,7 @@ class FirestoreTranscriptionRepository:
         batch.set(
             doc_ref,
             {
+                "schema_version": TRANSCRIPT_SCHEMA_VERSION,
                 "user_id": self.user_id,
                 "call_sid": self.call_sid,
                 "call_started_at": self.call_started_at,
@@ -76,8 +85,8 @@ class FirestoreTranscriptionRepository:
         batch.update(
             doc_ref,
             {
-                "transcriptions": firestore.ArrayUnion(
-                    [msg.model_dump() for msg in self.transcriptions]
+                MESSAGES_FIELD: firestore.ArrayUnion(
+                    [encode_message(msg, self.call_started_at) for msg in self.transcriptions]
                 )
             },
         )
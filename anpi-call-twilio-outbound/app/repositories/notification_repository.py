@@ -1,7 +1,7 @@
 """通話チェック結果の通知を送信するリポジトリの抽象インターフェース"""
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from models.call_check import CallCheckResult
 
 
@@ -20,4 +20,45 @@ class NotificationRepository(ABC):
         Returns:
             Dict[str, Any]: 送信結果
         """
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def build_call_check_payload(self, user_id: str, result: CallCheckResult) -> Dict[str, Any]:
+        """
+        通話チェック結果から送信ペイロードを生成
+
+        Args:
+            user_id: ユーザーID
+            result: 通話チェック結果
+
+        Returns:
+            Dict[str, Any]: 送信ペイロード（アウトボックスに永続化される）
+        """
+        pass
+
+    @abstractmethod
+    def build_digest_payload(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        複数アラートをまとめたダイジェストの送信ペイロードを生成
+
+        Args:
+            items: ダイジェスト待ちのアラート
+
+        Returns:
+            Dict[str, Any]: 送信ペイロード
+        """
+        pass
+
+    @abstractmethod
+    async def send_payload(self, payload: Dict[str, Any], user_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        生成済みペイロードを送信
+
+        Args:
+            payload: 送信ペイロード
+            user_id: ユーザーID（ログ用）
+
+        Returns:
+            Dict[str, Any]: 送信結果（success, retryable を含む）
+        """
+        pass
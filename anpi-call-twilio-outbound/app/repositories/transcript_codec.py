@@ -0,0 +1,121 @@
+"""通話ドキュメントの発言記録のエンコード・デコード
+
+スキーマ（/users/{user_id}/calls/{call_sid}）:
+
+- v1（schema_versionなし）: transcriptions = [{speaker, text, timestamp, call_sid, user_id}, ...]
+- v2（schema_version = 2）: messages = [{s, t, o}, ...]
+    - s: 話者コード（"u" = user, "a" = assistant）
+    - t: 発言テキスト
+    - o: call_started_at からの経過ミリ秒
+  通話ID・ユーザーIDはドキュメントのパスと通話レベルのフィールドに1回だけ保存する。
+
+読み取り側は decode_transcriptions を使えば、どちらのスキーマでも同じ TranscriptionMessage のリストを得られる。
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from models.transcription import TranscriptionMessage
+
+TRANSCRIPT_SCHEMA_VERSION = 2
+
+# v2の発言を保存するフィールド
+MESSAGES_FIELD = "messages"
+# v1の発言を保存していたフィールド
+LEGACY_TRANSCRIPTIONS_FIELD = "transcriptions"
+# 発言記録のデコードに必要なフィールド（フィールドプロジェクション用）
+TRANSCRIPT_FIELDS = ["schema_version", "user_id", "call_started_at", MESSAGES_FIELD, LEGACY_TRANSCRIPTIONS_FIELD]
+
+SPEAKER_CODES = {"user": "u", "assistant": "a"}
+SPEAKER_NAMES = {code: speaker for speaker, code in SPEAKER_CODES.items()}
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Firestoreはタイムゾーンなしの日時をUTCとして保存するため、比較時も同様に扱う
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def encode_message(message: TranscriptionMessage, call_started_at: datetime) -> Dict[str, Any]:
+    """
+    発言をv2形式に変換
+
+    Args:
+        message: 発言
+        call_started_at: 通話開始日時
+
+    Returns:
+        Dict[str, Any]: {s, t, o}
+    """
+    offset = _as_utc(message.timestamp) - _as_utc(call_started_at)
+    return {
+        "s": SPEAKER_CODES.get(message.speaker, message.speaker),
+        "t": message.text,
+        "o": max(0, int(offset.total_seconds() * 1000)),
+    }
+
+
+def decode_messages(messages: List[Dict[str, Any]], call_sid: str, user_id: Optional[str],
+                    call_started_at: datetime) -> List[TranscriptionMessage]:
+    """v2形式の発言をTranscriptionMessageのリストに変換"""
+    result = []
+    for msg in messages:
+        speaker = SPEAKER_NAMES.get(msg.get("s"), msg.get("s"))
+        # 保存時に生成したデータのため、検証を省略して高速に生成する
+        result.append(TranscriptionMessage.model_construct(
+            speaker=speaker,
+            text=msg.get("t", ""),
+            timestamp=call_started_at + timedelta(milliseconds=msg.get("o", 0)),
+            call_sid=call_sid,
+            user_id=user_id if speaker == "user" else None,
+        ))
+    return result
+
+
+def decode_transcriptions(call_sid: str, data: Dict[str, Any]) -> List[TranscriptionMessage]:
+    """
+    通話ドキュメントから発言記録を取得（v1・v2の両方に対応）
+
+    Args:
+        call_sid: 通話ID（ドキュメントID）
+        data: 通話ドキュメントのデータ
+
+    Returns:
+        List[TranscriptionMessage]: 発言記録のリスト
+    """
+    if data.get("schema_version", 1) >= 2:
+        call_started_at = data.get("call_started_at")
+        if call_started_at is None:
+            return []
+        return decode_messages(data.get(MESSAGES_FIELD, []), call_sid, data.get("user_id"), call_started_at)
+
+    return [TranscriptionMessage.model_construct(**msg) for msg in data.get(LEGACY_TRANSCRIPTIONS_FIELD, [])]
+
+
+def to_v2(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    v1の通話ドキュメントからv2のフィールドを生成（移行用）
+
+    Args:
+        data: v1の通話ドキュメントのデータ
+
+    Returns:
+        更新するフィールド（transcriptionsの削除は呼び出し側で行う）。変換できない場合はNone
+    """
+    legacy = data.get(LEGACY_TRANSCRIPTIONS_FIELD) or []
+    call_started_at = data.get("call_started_at")
+    if call_started_at is None:
+        # 通話開始日時がない場合は最初の発言を基準にする
+        if not legacy or not legacy[0].get("timestamp"):
+            return None
+        call_started_at = min(msg["timestamp"] for msg in legacy if msg.get("timestamp"))
+
+    messages = [
+        encode_message(TranscriptionMessage.model_construct(
+            **{**msg, "timestamp": msg.get("timestamp") or call_started_at}), call_started_at)
+        for msg in legacy
+    ]
+    return {
+        "schema_version": TRANSCRIPT_SCHEMA_VERSION,
+        "call_started_at": call_started_at,
+        MESSAGES_FIELD: messages,
+    }
@@ -1,14 +1,14 @@
 """Email API を使用した通知リポジトリの実装"""
 
 import os
-import json
+import asyncio
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import aiohttp
-from datetime import datetime
 
 from .notification_repository import NotificationRepository
 from models.call_check import CallCheckResult
+from utils.http_session import get_http_session
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +29,7 @@ class WebhookNotificationRepository(NotificationRepository):
 
     async def send_call_check_notification(self, user_id: str, result: CallCheckResult) -> Dict[str, Any]:
         """
-        通話チェック結果の通知をEmail APIに送信
+        通話チェック結果の通知をEmail APIに送信（1回のみ試行）
 
         Args:
             user_id: ユーザーID
@@ -38,96 +38,171 @@ class WebhookNotificationRepository(NotificationRepository):
         Returns:
             Dict[str, Any]: 送信結果
         """
-        try:
-            # メール件名と本文を生成
-            severity_level = result.severity_level
-            subject = f"【AnpiCall】通話チェック結果通知 - {severity_level}"
-
-            # 証拠を整理
-            evidence_html = ""
-            if result.evidence:
-                evidence_html = "<h3>判断根拠となる発言:</h3><ul>"
-                for ev in result.evidence:
-                    speaker_label = "利用者" if ev.speaker == "user" else "オペレーター"
-                    evidence_html += f"<li><strong>{speaker_label}:</strong> {ev.statement} <em>(通話ID: {ev.call_id})</em></li>"
-                evidence_html += "</ul>"
-
-            # 検出された問題を整理
-            issues_html = ""
-            if result.detected_issues:
-                issues_html = "<h3>検出された問題:</h3><ul>"
-                for issue in result.detected_issues:
-                    issues_html += f"<li>{issue}</li>"
-                issues_html += "</ul>"
-
-            # HTML本文を作成
-            content = f"""
-            <h1>通話チェック結果通知</h1>
-            <p><strong>ユーザーID:</strong> {user_id}</p>
-            <p><strong>重要度:</strong> {severity_level}</p>
-            <p><strong>分析日時:</strong> {result.analyzed_at.strftime('%Y-%m-%d %H:%M:%S')}</p>
-            
-            <h2>分析結果</h2>
-            <p>{result.reason}</p>
-            
-            {issues_html}
-            {evidence_html}
-            
-            <h3>分析対象通話:</h3>
-            <p>通話数: {len(result.source_calls)}件</p>
-            <p>通話ID: {', '.join(result.source_calls)}</p>
-            
-            <hr>
-            <p><em>このメールはAnpiCallシステムから自動送信されています。</em></p>
-            """
-
-            # Email API向けのペイロードを準備
-            payload = {
-                "to_email": self.to_email,
-                "subject": subject,
-                "content": content
-            }
+        payload = self.build_call_check_payload(user_id, result)
+        return await self.send_payload(payload, user_id=user_id)
 
-            # ヘッダーを準備
-            headers = {
-                "Content-Type": "application/json",
-                "User-Agent": "anpi-call-system/1.0"
-            }
+    def build_call_check_payload(self, user_id: str, result: CallCheckResult) -> Dict[str, Any]:
+        """
+        通話チェック結果からEmail API向けのペイロードを生成
+
+        Args:
+            user_id: ユーザーID
+            result: 通話チェック結果
+
+        Returns:
+            Dict[str, Any]: Email API向けペイロード
+        """
+        # メール件名と本文を生成
+        severity_level = result.severity_level
+        subject = f"【AnpiCall】通話チェック結果通知 - {severity_level}"
+
+        # 証拠を整理
+        evidence_html = ""
+        if result.evidence:
+            evidence_html = "<h3>判断根拠となる発言:</h3><ul>"
+            for ev in result.evidence:
+                speaker_label = "利用者" if ev.speaker == "user" else "オペレーター"
+                evidence_html += f"<li><strong>{speaker_label}:</strong> {ev.statement} <em>(通話ID: {ev.call_id})</em></li>"
+            evidence_html += "</ul>"
+
+        # 検出された問題を整理
+        issues_html = ""
+        if result.detected_issues:
+            issues_html = "<h3>検出された問題:</h3><ul>"
+            for issue in result.detected_issues:
+                issues_html += f"<li>{issue}</li>"
+            issues_html += "</ul>"
+
+        # HTML本文を作成
+        content = f"""
+        <h1>通話チェック結果通知</h1>
+        <p><strong>ユーザーID:</strong> {user_id}</p>
+        <p><strong>重要度:</strong> {severity_level}</p>
+        <p><strong>分析日時:</strong> {result.analyzed_at.strftime('%Y-%m-%d %H:%M:%S')}</p>
+        
+        <h2>分析結果</h2>
+        <p>{result.reason}</p>
+        
+        {issues_html}
+        {evidence_html}
+        
+        <h3>分析対象通話:</h3>
+        <p>通話数: {len(result.source_calls)}件</p>
+        <p>通話ID: {', '.join(result.source_calls)}</p>
+        
+        <hr>
+        <p><em>このメールはAnpiCallシステムから自動送信されています。</em></p>
+        """
+
+        # Email API向けのペイロードを準備
+        return {
+            "to_email": self.to_email,
+            "subject": subject,
+            "content": content
+        }
+
+    def build_digest_payload(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        要観察アラートのダイジェスト（まとめ通知）ペイロードを生成
+
+        Args:
+            items: ダイジェスト待ちのアラート（user_id, severity_level, reason, detected_issues, analyzed_at）
 
-            # Email APIに送信
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                async with session.post(
-                    self.email_api_url,
-                    json=payload,
-                    headers=headers
-                ) as response:
-                    response_text = await response.text()
-
-                    if response.status == 200:
-                        logger.info(
-                            f"通話チェック通知送信成功: user_id={user_id}, severity={severity_level}")
-                        return {
-                            "success": True,
-                            "status_code": response.status,
-                            "response": response_text
-                        }
-                    else:
-                        logger.warning(
-                            f"通話チェック通知送信失敗: user_id={user_id}, status={response.status}, response={response_text}")
-                        return {
-                            "success": False,
-                            "status_code": response.status,
-                            "response": response_text,
-                            "error": f"HTTP {response.status}: {response_text}"
-                        }
-
-        except aiohttp.ClientTimeout:
+        Returns:
+            Dict[str, Any]: Email API向けペイロード
+        """
+        subject = f"【AnpiCall】要観察アラートまとめ - {len(items)}件"
+
+        rows_html = ""
+        for item in items:
+            issues = "、".join(item.get("detected_issues") or []) or "-"
+            rows_html += (
+                f"<tr><td>{item.get('user_id')}</td><td>{item.get('severity_level')}</td>"
+                f"<td>{item.get('analyzed_at')}</td><td>{issues}</td><td>{item.get('reason')}</td></tr>"
+            )
+
+        content = f"""
+        <h1>要観察アラートまとめ</h1>
+        <p>前回のまとめ通知以降に検出された要観察アラートは以下の通りです。</p>
+        <table border="1" cellpadding="4">
+            <tr><th>ユーザーID</th><th>重要度</th><th>分析日時</th><th>検出された問題</th><th>分析結果</th></tr>
+            {rows_html}
+        </table>
+        
+        <hr>
+        <p><em>このメールはAnpiCallシステムから自動送信されています。</em></p>
+        """
+
+        return {
+            "to_email": self.to_email,
+            "subject": subject,
+            "content": content
+        }
+
+    async def send_payload(self, payload: Dict[str, Any], user_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        ペイロードをEmail APIに送信（共有セッションを使用し、1回のみ試行）
+
+        Args:
+            payload: Email API向けペイロード
+            user_id: ユーザーID（ログ用）
+
+        Returns:
+            Dict[str, Any]: 送信結果（retryable: 再試行すべき失敗かどうか）
+        """
+        # ヘッダーを準備
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": "anpi-call-system/1.0"
+        }
+
+        try:
+            session = await get_http_session()
+            async with session.post(
+                self.email_api_url,
+                json=payload,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            ) as response:
+                response_text = await response.text()
+
+                if response.status == 200:
+                    logger.info(
+                        f"通話チェック通知送信成功: user_id={user_id}, subject={payload.get('subject')}")
+                    return {
+                        "success": True,
+                        "status_code": response.status,
+                        "response": response_text
+                    }
+
+                logger.warning(
+                    f"通話チェック通知送信失敗: user_id={user_id}, status={response.status}, response={response_text}")
+                return {
+                    "success": False,
+                    "status_code": response.status,
+                    "response": response_text,
+                    "error": f"HTTP {response.status}: {response_text}",
+                    # 429・5xxは一時的な障害とみなして再試行する
+                    "retryable": response.status == 429 or response.status >= 500
+                }
+
+        except asyncio.TimeoutError:
             error_msg = f"Email API送信タイムアウト: {self.timeout}秒"
             logger.error(
                 f"通話チェック通知タイムアウト: user_id={user_id}, error={error_msg}")
             return {
                 "success": False,
-                "error": error_msg
+                "error": error_msg,
+                "retryable": True
+            }
+        except aiohttp.ClientError as e:
+            error_msg = f"Email API接続エラー: {str(e)}"
+            logger.error(
+                f"通話チェック通知接続エラー: user_id={user_id}, error={e}")
+            return {
+                "success": False,
+                "error": error_msg,
+                "retryable": True
             }
         except Exception as e:
             error_msg = f"Email API送信エラー: {str(e)}"
@@ -135,5 +210,6 @@ class WebhookNotificationRepository(NotificationRepository):
                 f"通話チェック通知送信エラー: user_id={user_id}, error={e}", exc_info=True)
             return {
                 "success": False,
-                "error": error_msg
+                "error": error_msg,
+                "retryable": False
             }
@@ -0,0 +1,113 @@
+"""プロセス共有の外部サービスクライアント
+
+Firestore・OpenAIのクライアントをプロセスで1つずつ生成し、リポジトリやエージェントで共有する。
+通話ごとにgRPCチャネルやHTTPクライアントを作り直さないため、通話開始時の初期化時間とメモリを抑えられる。
+テストではset_*でフェイクに差し替えられる。
+"""
+
+import os
+import inspect
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from google.cloud import firestore
+from google.cloud.firestore_v1.async_client import AsyncClient
+from openai import AsyncOpenAI, OpenAI
+
+from utils.http_session import close_http_session, get_http_session
+
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry:
+    """外部サービスクライアントのレジストリ（初回利用時に生成し、以降は同じインスタンスを返す）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._firestore: Dict[Optional[str], Any] = {}
+        self._openai: Optional[Any] = None
+        self._async_openai: Optional[Any] = None
+
+    def firestore(self, project_id: Optional[str] = None) -> AsyncClient:
+        """
+        Firestoreの非同期クライアントを取得
+
+        Args:
+            project_id: GCPプロジェクトID（省略時は環境変数GCP_PROJECT_ID）
+
+        Returns:
+            AsyncClient: プロジェクトごとに共有されるクライアント
+        """
+        project_id = project_id or os.getenv("GCP_PROJECT_ID")
+        client = self._firestore.get(project_id)
+        if client is None:
+            with self._lock:
+                client = self._firestore.get(project_id)
+                if client is None:
+                    client = firestore.AsyncClient(project=project_id)
+                    self._firestore[project_id] = client
+        return client
+
+    def openai(self) -> OpenAI:
+        """OpenAIの同期クライアントを取得"""
+        if self._openai is None:
+            with self._lock:
+                if self._openai is None:
+                    self._openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._openai
+
+    def async_openai(self) -> AsyncOpenAI:
+        """OpenAIの非同期クライアントを取得"""
+        if self._async_openai is None:
+            with self._lock:
+                if self._async_openai is None:
+                    self._async_openai = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._async_openai
+
+    def set_firestore(self, client: Any, project_id: Optional[str] = None) -> None:
+        """Firestoreクライアントを差し替え（テスト用）"""
+        self._firestore[project_id or os.getenv("GCP_PROJECT_ID")] = client
+
+    def set_openai(self, client: Any) -> None:
+        """OpenAIの同期クライアントを差し替え（テスト用）"""
+        self._openai = client
+
+    def set_async_openai(self, client: Any) -> None:
+        """OpenAIの非同期クライアントを差し替え（テスト用）"""
+        self._async_openai = client
+
+    async def initialize(self) -> None:
+        """アプリ起動時にクライアントを生成（最初の通話で生成を待たないようにする）"""
+        self.firestore()
+        self.openai()
+        self.async_openai()
+        await get_http_session()
+        logger.info("共有クライアントを初期化しました")
+
+    async def close(self) -> None:
+        """生成済みのクライアントをすべてクローズ"""
+        clients = list(self._firestore.values()) + [self._openai, self._async_openai]
+        for client in clients:
+            close = getattr(client, "close", None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"クライアントのクローズに失敗しました: {e}")
+        await close_http_session()
+        self.reset()
+
+    def reset(self) -> None:
+        """保持しているクライアントを破棄（次回利用時に再生成される）"""
+        with self._lock:
+            self._firestore.clear()
+            self._openai = None
+            self._async_openai = None
+
+
+# グローバルインスタンス
+clients = ClientRegistry()
@@ -0,0 +1,38 @@
+"""プロセス共有のaiohttpセッション
+
+通知送信などの外部HTTP呼び出しでTCP/TLS接続を再利用するため、セッションを1つだけ生成して共有する。
+"""
+
+import asyncio
+import os
+from typing import Optional
+
+import aiohttp
+
+_session: Optional[aiohttp.ClientSession] = None
+_lock = asyncio.Lock()
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """共有セッションを取得（未生成またはクローズ済みなら生成）"""
+    global _session
+    if _session is not None and not _session.closed:
+        return _session
+
+    async with _lock:
+        if _session is None or _session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=int(os.getenv("HTTP_POOL_LIMIT", "100")),
+                limit_per_host=int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20")),
+                ttl_dns_cache=300,
+            )
+            _session = aiohttp.ClientSession(connector=connector)
+    return _session
+
+
+async def close_http_session() -> None:
+    """共有セッションをクローズ"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
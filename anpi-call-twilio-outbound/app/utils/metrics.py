@@ -0,0 +1,115 @@
+"""プロセス内メトリクス収集
+
+カウンター・ゲージ・レイテンシ分布をプロセス内に保持し、/metrics エンドポイントから参照できるようにする。
+"""
+
+import threading
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, Tuple
+
+# レイテンシ分布として保持する直近サンプル数
+_RESERVOIR_SIZE = 1024
+
+
+def _key(name: str, labels: Dict[str, Any]) -> str:
+    """メトリクス名とラベルからキーを生成（例: name{a=1,b=2}）"""
+    if not labels:
+        return name
+    label_str = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{label_str}}}"
+
+
+def _percentile(sorted_values, ratio: float) -> float:
+    """ソート済みリストからパーセンタイル値を取得"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(ratio * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class _Histogram:
+    """件数・合計・最大と直近サンプルを保持する分布"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=_RESERVOIR_SIZE)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def summary(self) -> Dict[str, float]:
+        values = sorted(self.samples)
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": _percentile(values, 0.50),
+            "p95": _percentile(values, 0.95),
+            "p99": _percentile(values, 0.99),
+        }
+
+
+class MetricsRegistry:
+    """スレッドセーフなメトリクスレジストリ"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._histograms: Dict[str, _Histogram] = defaultdict(_Histogram)
+        self._gauge_callbacks: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+    def increment(self, name: str, value: float = 1, **labels: Any) -> None:
+        """カウンターを加算"""
+        with self._lock:
+            self._counters[_key(name, labels)] += value
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        """ゲージ値を設定"""
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """分布（レイテンシ等）に値を記録"""
+        with self._lock:
+            self._histograms[_key(name, labels)].observe(value)
+
+    def register_gauge_callback(self, name: str, callback: Callable[[], Dict[str, float]]) -> None:
+        """スナップショット取得時に評価されるゲージを登録"""
+        with self._lock:
+            self._gauge_callbacks[name] = callback
+
+    def snapshot(self) -> Dict[str, Any]:
+        """現在のメトリクスを辞書で取得"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {k: h.summary() for k, h in self._histograms.items()}
+            callbacks: Tuple = tuple(self._gauge_callbacks.items())
+
+        # コールバックはロック外で評価する（コールバック内でのメトリクス記録を許容）
+        for name, callback in callbacks:
+            try:
+                for sub_name, value in callback().items():
+                    gauges[f"{name}.{sub_name}"] = value
+            except Exception:
+                continue
+
+        return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+    def reset(self) -> None:
+        """全メトリクスを初期化（テスト用）"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+# グローバルインスタンス
+metrics = MetricsRegistry()
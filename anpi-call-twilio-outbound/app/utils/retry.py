@@ -0,0 +1,19 @@
+"""リトライ用のバックオフ計算"""
+
+import random
+
+
+def backoff_delay(attempt: int, base_delay: float = 1.0, max_delay: float = 60.0) -> float:
+    """
+    指数バックオフ（フルジッター）の待機秒数を計算
+
+    Args:
+        attempt: 試行回数（1始まり）
+        base_delay: 初回の基準待機秒数
+        max_delay: 待機秒数の上限
+
+    Returns:
+        float: 待機秒数（0〜min(max_delay, base_delay * 2^(attempt-1)) の一様乱数）
+    """
+    cap = min(max_delay, base_delay * (2 ** max(attempt - 1, 0)))
+    return random.uniform(0, cap)
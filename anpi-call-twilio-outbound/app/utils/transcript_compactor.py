@@ -0,0 +1,210 @@
+"""トークン予算付きの文字起こし圧縮ユーティリティ
+
+分析・日記生成プロンプトに渡す会話履歴を、指定したトークン予算に収まるよう圧縮する。
+
+- 最新の通話は可能な限りそのまま残す
+- 古い通話は相づちなどのフィラー発言を除去し、利用者の発言を優先して要約・トリミングする
+- 通話IDは常に保持し、Evidenceの通話ID参照が解決できるようにする
+
+外部依存を持たないため、ai-diary（create_diary_entry/transcript_compactor.py）にも同一の実装を配置して利用している。
+変更する場合は必ず両方のファイルを同じ内容に更新すること（モジュール docstring のこの段落のみ異なる）。
+"""
+
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+# 相づち・フィラーとみなす発言（句読点・空白除去後に完全一致で判定）
+FILLER_UTTERANCES = frozenset([
+    "はい", "はいはい", "ええ", "ええええ", "うん", "うんうん", "ああ", "あー", "えー", "えっと",
+    "あの", "あのー", "そう", "そうそう", "そうですね", "そうですか", "そうなんですね", "なるほど",
+    "へえ", "へー", "ほう", "ふーん", "おお", "はあ", "ok", "okay", "yes", "mhm", "uhhuh",
+])
+
+# 正規化時に除去する記号
+_PUNCTUATION_PATTERN = re.compile(r"[\s、。，．,.!！?？…・ー〜~「」『』（）()]+")
+
+# 省略した発言の代わりに挿入するマーカー
+OMISSION_MARKER = "…（中略）…"
+
+
+@dataclass
+class Utterance:
+    """発言1件"""
+    speaker: str  # 'user' または 'assistant'
+    text: str
+
+
+@dataclass
+class CallTranscript:
+    """圧縮対象の通話1件"""
+    call_id: str
+    started_at: Optional[datetime]
+    utterances: List[Utterance] = field(default_factory=list)
+
+
+@dataclass
+class CompactedCall:
+    """圧縮後の通話1件"""
+    call_id: str
+    started_at: Optional[datetime]
+    utterances: List[Utterance]
+    is_latest: bool = False
+    omitted_count: int = 0  # 除去・省略した発言数
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    テキストのトークン数を概算
+
+    日本語（非ASCII）は1文字1トークン、ASCIIは4文字1トークンとして保守的に見積もる。
+
+    Args:
+        text: 対象テキスト
+
+    Returns:
+        int: 概算トークン数
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
+
+
+def is_filler(text: str) -> bool:
+    """相づち・フィラーのみの発言かどうかを判定"""
+    normalized = _PUNCTUATION_PATTERN.sub("", text).lower()
+    return not normalized or normalized in FILLER_UTTERANCES
+
+
+class TranscriptCompactor:
+    """会話履歴をトークン予算内に圧縮するクラス"""
+
+    # 通話ヘッダー（通話ID・日時）1行分の見積もりトークン数
+    HEADER_TOKENS = 24
+    # 発言1行あたりの話者ラベル等のオーバーヘッド
+    LINE_OVERHEAD_TOKENS = 4
+
+    def __init__(self, token_budget: int = 6000, min_tail_utterances: int = 6, latest_share: float = 0.6):
+        """
+        Args:
+            token_budget: 会話履歴全体に割り当てるトークン数
+            min_tail_utterances: 中間を省略する場合に末尾から必ず残す発言数（予算が許す限り。余った予算でさらに末尾を残す）
+            latest_share: 最新通話が予算に収まらない場合に最新通話へ割り当てる予算の割合
+        """
+        self.token_budget = token_budget
+        self.min_tail_utterances = min_tail_utterances
+        self.latest_share = latest_share
+
+    def compact(self, calls: List[CallTranscript]) -> List[CompactedCall]:
+        """
+        通話リストを予算内に圧縮
+
+        Args:
+            calls: 通話リスト（順不同）
+
+        Returns:
+            List[CompactedCall]: 圧縮後の通話リスト（古い順）
+        """
+        if not calls:
+            return []
+
+        # 開始日時のない通話は最も古いものとして扱う（naiveなdatetime.minとtz付きの日時は比較できないため）
+        sorted_calls = sorted(
+            calls, key=lambda c: (c.started_at is not None, c.started_at))
+        latest, older = sorted_calls[-1], sorted_calls[:-1]
+
+        # 全通話のヘッダーは必ず出力するため先に確保する
+        remaining = self.token_budget - self.HEADER_TOKENS * len(sorted_calls)
+
+        # 最新通話がそのまま収まらない場合は、古い通話の分も残しておく
+        latest_budget = max(remaining, 0)
+        if older and self._cost(latest.utterances) > latest_budget:
+            latest_budget = int(latest_budget * self.latest_share)
+
+        compacted_latest = self._compact_latest(latest, latest_budget)
+        remaining -= self._cost(compacted_latest.utterances)
+
+        # 古い通話は新しいものから順に予算を配分（余りはさらに古い通話へ繰り越す）
+        compacted_older: List[CompactedCall] = []
+        for index, call in enumerate(reversed(older)):
+            calls_left = len(older) - index
+            share = max(remaining, 0) // calls_left
+            compacted = self._compact_older(call, share)
+            remaining -= self._cost(compacted.utterances)
+            compacted_older.append(compacted)
+
+        return list(reversed(compacted_older)) + [compacted_latest]
+
+    def _compact_latest(self, call: CallTranscript, budget: int) -> CompactedCall:
+        """最新通話を圧縮（予算内ならそのまま残す）"""
+        utterances = [u for u in call.utterances if u.text]
+        if self._cost(utterances) <= budget:
+            return CompactedCall(call.call_id, call.started_at, utterances, is_latest=True)
+
+        # 予算超過時はフィラーを除去し、それでも超過すれば中間を省略
+        meaningful = [u for u in utterances if not is_filler(u.text)]
+        kept = self._trim_middle(meaningful, budget)
+        return CompactedCall(
+            call.call_id, call.started_at, kept, is_latest=True,
+            omitted_count=len(utterances) - self._count_real(kept))
+
+    def _compact_older(self, call: CallTranscript, budget: int) -> CompactedCall:
+        """古い通話を圧縮（フィラー除去→利用者発言優先→中間省略）"""
+        utterances = [u for u in call.utterances if u.text]
+        meaningful = [u for u in utterances if not is_filler(u.text)]
+
+        if self._cost(meaningful) > budget:
+            # 異常の兆候は利用者の発言に現れるため、利用者発言を優先して残す
+            meaningful = [u for u in meaningful if u.speaker == "user"]
+
+        kept = self._trim_middle(meaningful, budget)
+        return CompactedCall(
+            call.call_id, call.started_at, kept,
+            omitted_count=len(utterances) - self._count_real(kept))
+
+    def _trim_middle(self, utterances: List[Utterance], budget: int) -> List[Utterance]:
+        """先頭と末尾を残して中間の発言を省略し、予算内に収める"""
+        if self._cost(utterances) <= budget:
+            return utterances
+
+        marker = Utterance(speaker="system", text=OMISSION_MARKER)
+        available = budget - self._cost([marker])
+        if available <= 0:
+            return [marker] if utterances else []
+
+        # 直近の発言ほど重要なため、まず末尾の min_tail_utterances 件を確保する
+        start, end = 0, len(utterances)
+        while end > start and len(utterances) - end < self.min_tail_utterances:
+            cost = self._cost([utterances[end - 1]])
+            if cost > available:
+                break
+            end -= 1
+            available -= cost
+
+        # 残りの予算は半分を先頭（通話の導入）に、残りを末尾の延長に割り当て、余りは再び先頭へ回す
+        head_available = available // 2
+        while start < end and self._cost([utterances[start]]) <= head_available:
+            cost = self._cost([utterances[start]])
+            head_available -= cost
+            available -= cost
+            start += 1
+
+        while end > start and self._cost([utterances[end - 1]]) <= available:
+            end -= 1
+            available -= self._cost([utterances[end]])
+
+        while start < end and self._cost([utterances[start]]) <= available:
+            available -= self._cost([utterances[start]])
+            start += 1
+
+        head, tail = utterances[:start], utterances[end:]
+        return head + [marker] + tail
+
+    def _cost(self, utterances: List[Utterance]) -> int:
+        """発言リストの概算トークン数"""
+        return sum(estimate_tokens(u.text) + self.LINE_OVERHEAD_TOKENS for u in utterances)
+
+    @staticmethod
+    def _count_real(utterances: List[Utterance]) -> int:
+        """省略マーカーを除いた発言数"""
+        return sum(1 for u in utterances if u.speaker != "system")
@@ -0,0 +1,313 @@
+"""
+Firestoreリポジトリのベンチマーク（Firestoreエミュレーター使用）
+
+通話件数・発言数の異なる合成ユーザーをエミュレーターに投入し、リポジトリの各メソッドについて
+書き込みスループット・読み取りレイテンシ・取得データ量を計測する。
+
+- 書き込み: FirestoreTranscriptionRepository（発言記録の保存）、FirestoreCallCheckRepository.save_check_result
+- 読み取り: FirestoreCallRepository、FirestoreCallCheckRepository、ai-diaryの会話履歴サービス
+
+取得データ量はFirestoreのストレージサイズの計算方法（文字列はUTF-8バイト数+1、数値・日時は8バイトなど）で
+返却データから算出する。合成データは乱数シードで固定しているため、実装を変えない限り同じ値になる。
+
+実行例:
+    gcloud emulators firestore start --host-port=localhost:8080
+    export FIRESTORE_EMULATOR_HOST=localhost:8080 GCP_PROJECT_ID=demo-anpi OPENAI_API_KEY=dummy
+
+    # ベースラインを記録
+    python benchmarks/firestore_repositories.py --record benchmarks/baselines/firestore_repositories.json
+    # ベースラインと比較（悪化があれば終了コード1）
+    python benchmarks/firestore_repositories.py --compare benchmarks/baselines/firestore_repositories.json
+
+注意: 実行のたびにエミュレーターの全データを削除する。
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import urllib.request
+from datetime import datetime, timedelta
+from statistics import mean
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "app"))
+sys.path.insert(0, os.path.join(os.path.dirname(BASE_DIR), "ai-diary"))
+
+from models.call_check import CallCheckResult, Evidence, SeverityLevel  # noqa: E402
+from repositories.firestore_call_check_repository import FirestoreCallCheckRepository  # noqa: E402
+from repositories.firestore_call_repository import FirestoreCallRepository  # noqa: E402
+from repositories.firestore_transcription_repository import FirestoreTranscriptionRepository  # noqa: E402
+from utils.clients import clients  # noqa: E402
+
+# ユーザーごとの通話件数と1通話あたりの発言数の分布（件数, 重み）
+CALL_COUNT_DISTRIBUTION = [(1, 3), (10, 4), (50, 2), (200, 1)]
+MESSAGES_PER_CALL_DISTRIBUTION = [(10, 3), (40, 4), (120, 2), (400, 1)]
+
+UTTERANCES = [
+    "おはようございます。今日の体調はいかがですか。",
+    "元気ですよ。朝は少し散歩をしてきました。",
+    "昨日は孫が遊びに来てくれて、一緒にご飯を食べました。",
+    "最近は膝が少し痛むので、無理をしないようにしています。",
+    "今週末に公民館で健康体操の教室があるそうです。参加してみませんか。",
+    "はい。",
+]
+
+
+def firestore_size(value) -> int:
+    """Firestoreのストレージサイズの計算方法で値のバイト数を算出"""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, str):
+        return len(value.encode("utf-8")) + 1
+    if isinstance(value, (int, float, datetime)):
+        return 8
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(firestore_size(k) + firestore_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(firestore_size(v) for v in value)
+    if hasattr(value, "model_dump"):
+        return firestore_size(value.model_dump())
+    return len(str(value).encode("utf-8")) + 1
+
+
+def _percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(ratio * (len(values) - 1))))]
+
+
+def _weighted_choice(rng, distribution):
+    values, weights = zip(*distribution)
+    return rng.choices(values, weights=weights)[0]
+
+
+def reset_emulator(project_id: str) -> None:
+    """エミュレーターの全ドキュメントを削除"""
+    host = os.environ["FIRESTORE_EMULATOR_HOST"]
+    request = urllib.request.Request(
+        f"http://{host}/emulator/v1/projects/{project_id}/databases/(default)/documents",
+        method="DELETE")
+    urllib.request.urlopen(request).read()
+
+
+class Recorder:
+    """メソッドごとの計測結果を集計"""
+
+    def __init__(self):
+        self.results = {}
+
+    def add(self, name: str, seconds: float, payload_bytes: int = 0, items: int = 1) -> None:
+        entry = self.results.setdefault(name, {"seconds": [], "bytes": [], "items": 0})
+        entry["seconds"].append(seconds)
+        entry["bytes"].append(payload_bytes)
+        entry["items"] += items
+
+    async def measure(self, name: str, coro):
+        started = time.perf_counter()
+        result = await coro
+        self.add(name, time.perf_counter() - started, firestore_size(result))
+        return result
+
+    def measure_sync(self, name: str, func, *args, **kwargs):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.add(name, time.perf_counter() - started, firestore_size(result))
+        return result
+
+    def summary(self):
+        summary = {}
+        for name, entry in self.results.items():
+            seconds = entry["seconds"]
+            total = sum(seconds)
+            summary[name] = {
+                "n": len(seconds),
+                "p50_ms": round(_percentile(seconds, 0.50) * 1000, 3),
+                "p95_ms": round(_percentile(seconds, 0.95) * 1000, 3),
+                "items_per_sec": round(entry["items"] / total, 1) if total else None,
+                "avg_bytes": round(mean(entry["bytes"])),
+            }
+        return summary
+
+
+async def seed(recorder: Recorder, rng: random.Random, user_count: int, save_interval: int):
+    """合成ユーザーの通話・発言記録を投入（書き込みスループットを計測）"""
+    db = clients.firestore()
+    dataset = []
+    base_time = datetime(2025, 7, 1, 9, 0, 0)
+
+    for u in range(user_count):
+        user_id = f"bench-user-{u:04d}"
+        await db.collection("users").document(user_id).set({"userID": user_id, "name": f"検証 利用者{u}"})
+
+        call_count = _weighted_choice(rng, CALL_COUNT_DISTRIBUTION)
+        call_ids = []
+        for c in range(call_count):
+            call_sid = f"CA{rng.getrandbits(128):032x}"
+            message_count = _weighted_choice(rng, MESSAGES_PER_CALL_DISTRIBUTION)
+
+            repository = FirestoreTranscriptionRepository(auto_save_interval=save_interval)
+            repository.start_transcription(user_id, call_sid)
+            repository.call_started_at = base_time - timedelta(days=call_count - c)
+
+            started = time.perf_counter()
+            for m in range(message_count):
+                speaker = "assistant" if m % 2 == 0 else "user"
+                await repository.add_transcription(speaker, rng.choice(UTTERANCES))
+            await repository.close()
+            recorder.add("transcription.write_call", time.perf_counter() - started, items=message_count)
+            call_ids.append(call_sid)
+
+        dataset.append((user_id, call_ids))
+    return dataset
+
+
+async def run_benchmarks(recorder: Recorder, rng: random.Random, dataset, checks_per_user: int):
+    call_repository = FirestoreCallRepository()
+    check_repository = FirestoreCallCheckRepository()
+
+    # 通話チェック結果の書き込み（集計ドキュメントの更新を含む）
+    for user_id, call_ids in dataset:
+        for i in range(checks_per_user):
+            level = rng.choice(list(SeverityLevel))
+            result = CallCheckResult(
+                reason="定期チェック",
+                severity_level=level,
+                detected_issues=[] if level == SeverityLevel.NORMAL else ["食欲低下"],
+                evidence=[Evidence(call_id=call_ids[-1], statement=UTTERANCES[1], speaker="user")],
+                source_calls=call_ids[-5:],
+                analyzed_at=datetime(2025, 7, 1, 9, 0, 0) - timedelta(days=checks_per_user - i),
+            )
+            await recorder.measure("call_check.save_check_result",
+                                   check_repository.save_check_result(user_id, result))
+
+    # 通話データの読み取り
+    for user_id, call_ids in dataset:
+        await recorder.measure("call.get_latest_calls",
+                               call_repository.get_latest_calls(user_id, n=10))
+        await recorder.measure("call.get_latest_calls(metadata_only)",
+                               call_repository.get_latest_calls(user_id, n=10, metadata_only=True))
+        await recorder.measure("call.get_calls_by_date_range",
+                               call_repository.get_calls_by_date_range(
+                                   user_id, datetime(2025, 6, 1), datetime(2025, 7, 1), max_calls=5))
+        await recorder.measure("call.get_call_by_id",
+                               call_repository.get_call_by_id(user_id, call_ids[-1]))
+        await recorder.measure("call.get_transcriptions",
+                               call_repository.get_transcriptions(user_id, call_ids[-1]))
+        await recorder.measure("call_check.get_recent_check_results",
+                               check_repository.get_recent_check_results(user_id, limit=10))
+        await recorder.measure("call_check.get_check_history_stats",
+                               check_repository.get_check_history_stats(user_id, days=30))
+    await recorder.measure("call_check.get_watchlist", check_repository.get_watchlist())
+
+    # ai-diaryの会話履歴サービス（同期クライアント）
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", os.getenv("GCP_PROJECT_ID", ""))
+    os.environ.setdefault("CALL_HISTORY_ORDER_FIELD", "call_started_at")
+    from get_history.subcollection_conversation_service import SubcollectionConversationHistoryService
+    history_service = SubcollectionConversationHistoryService()
+    for user_id, call_ids in dataset:
+        recorder.measure_sync("diary.get_conversation_by_call_id",
+                              history_service.get_conversation_by_call_id, user_id, call_ids[-1])
+        recorder.measure_sync("diary.get_user_calls_page",
+                              history_service.get_user_calls_page, user_id, 20)
+        recorder.measure_sync("diary.get_user_calls_page(fields)",
+                              history_service.get_user_calls_page, user_id, 20, None, ["call_started_at"])
+        recorder.measure_sync("diary.get_user_all_calls",
+                              history_service.get_user_all_calls, user_id)
+
+
+def compare(summary, baseline, latency_tolerance: float) -> int:
+    """ベースラインと比較し、悪化した項目数を返す"""
+    regressions = 0
+    for name, current in summary.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"[NEW] {name}")
+            continue
+
+        problems = []
+        if current["avg_bytes"] > base["avg_bytes"]:
+            problems.append(f"取得データ量 {base['avg_bytes']} -> {current['avg_bytes']} bytes")
+        if current["p50_ms"] > base["p50_ms"] * (1 + latency_tolerance):
+            problems.append(f"p50 {base['p50_ms']} -> {current['p50_ms']} ms")
+        if (base["items_per_sec"] and current["items_per_sec"]
+                and current["items_per_sec"] < base["items_per_sec"] * (1 - latency_tolerance)):
+            problems.append(f"スループット {base['items_per_sec']} -> {current['items_per_sec']} items/s")
+
+        print(f"[{'NG' if problems else 'OK'}] {name}")
+        for problem in problems:
+            print(f"      - {problem}")
+        regressions += 1 if problems else 0
+    return regressions
+
+
+async def main_async(args):
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        print("FIRESTORE_EMULATOR_HOST が未設定です（本番のFirestoreには書き込みません）")
+        sys.exit(2)
+
+    project_id = os.getenv("GCP_PROJECT_ID", "demo-anpi")
+    os.environ["GCP_PROJECT_ID"] = project_id
+    reset_emulator(project_id)
+
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    try:
+        dataset = await seed(recorder, rng, args.users, args.save_interval)
+        await run_benchmarks(recorder, rng, dataset, args.checks_per_user)
+    finally:
+        await clients.close()
+    return recorder.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Firestoreリポジトリのベンチマーク（エミュレーター使用）")
+    parser.add_argument("--users", type=int, default=20, help="投入するユーザー数")
+    parser.add_argument("--checks-per-user", type=int, default=5, help="ユーザーごとに保存するチェック結果数")
+    parser.add_argument("--save-interval", type=int, default=1000, help="発言記録の自動保存間隔（件数）")
+    parser.add_argument("--seed", type=int, default=42, help="合成データの乱数シード")
+    parser.add_argument("--record", help="計測結果をベースラインとして保存するJSONファイル")
+    parser.add_argument("--compare", help="比較するベースラインのJSONファイル")
+    parser.add_argument("--latency-tolerance", type=float, default=0.25,
+                        help="レイテンシ・スループットの許容悪化率（エミュレーターの揺らぎを考慮）")
+    args = parser.parse_args()
+
+    summary = asyncio.run(main_async(args))
+
+    print(f"{'method':<42}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'items/s':>12}{'avg bytes':>12}")
+    for name, row in summary.items():
+        items_per_sec = "-" if row["items_per_sec"] is None else f"{row['items_per_sec']:.1f}"
+        print(f"{name:<42}{row['n']:>6}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+              f"{items_per_sec:>12}{row['avg_bytes']:>12}")
+
+    if args.record:
+        os.makedirs(os.path.dirname(os.path.abspath(args.record)), exist_ok=True)
+        with open(args.record, "w", encoding="utf-8") as f:
+            json.dump({
+                "recorded_at": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "params": {"users": args.users, "checks_per_user": args.checks_per_user,
+                           "save_interval": args.save_interval, "seed": args.seed},
+                "results": summary,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"ベースラインを保存しました: {args.record}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("params", {}).get("users") != args.users or baseline.get("params", {}).get("seed") != args.seed:
+            print(f"警告: ベースラインと計測条件が異なります（ベースライン: {baseline.get('params')}）")
+        regressions = compare(summary, baseline["results"], args.latency_tolerance)
+        if regressions:
+            print(f"{regressions}件の項目がベースラインより悪化しています")
+            sys.exit(1)
+        print("ベースラインからの悪化はありません")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+通話ごとのセットアップコスト（メモリ確保量・初期化時間）のベンチマーク
+
+1通話で生成されるオブジェクト（CallAgent と通話終了後の CallChecker）を繰り返し生成し、
+tracemalloc で1通話あたりのメモリ確保量を計測する。
+
+- shared  : プロセス共有のクライアントレジストリを使用（現在の実装）
+- unshared: 毎回レジストリをリセットし、通話ごとにクライアントを生成（共有前の挙動を再現）
+
+実行例（Firestoreエミュレーターを使い、認証情報なしで実行）:
+    export FIRESTORE_EMULATOR_HOST=localhost:8080 GCP_PROJECT_ID=demo-anpi OPENAI_API_KEY=dummy
+    python benchmarks/per_call_setup.py --calls 200
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tracemalloc
+from statistics import mean
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from agents.call_agent import CallAgent  # noqa: E402
+from analysis.check_call import CallChecker  # noqa: E402
+from utils.clients import clients  # noqa: E402
+
+
+def _percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(ratio * (len(values) - 1))))]
+
+
+async def run(mode: str, calls: int, warmup: int):
+    if mode == "shared":
+        await clients.initialize()
+
+    allocated = []
+    durations = []
+    for i in range(warmup + calls):
+        if mode == "unshared":
+            clients.reset()
+
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+
+        agent = CallAgent()
+        checker = CallChecker()
+
+        elapsed = time.perf_counter() - started
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        if i >= warmup:
+            allocated.append(current - before)
+            durations.append(elapsed)
+        del agent, checker
+
+    await clients.close()
+    return allocated, durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="通話ごとのセットアップコストのベンチマーク")
+    parser.add_argument("--calls", type=int, default=200, help="計測する通話数")
+    parser.add_argument("--warmup", type=int, default=5, help="計測前に捨てる回数")
+    parser.add_argument("--mode", choices=["shared", "unshared", "both"], default="both")
+    args = parser.parse_args()
+
+    modes = ["unshared", "shared"] if args.mode == "both" else [args.mode]
+    print(f"{'mode':<10}{'KiB/call(avg)':>15}{'KiB/call(p95)':>15}{'setup ms(p50)':>15}{'setup ms(p95)':>15}")
+    for mode in modes:
+        allocated, durations = asyncio.run(run(mode, args.calls, args.warmup))
+        print(f"{mode:<10}"
+              f"{mean(allocated) / 1024:>15.1f}"
+              f"{_percentile(allocated, 0.95) / 1024:>15.1f}"
+              f"{_percentile(durations, 0.50) * 1000:>15.2f}"
+              f"{_percentile(durations, 0.95) * 1000:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
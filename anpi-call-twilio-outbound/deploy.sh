@@ -91,6 +91,27 @@ else
     echo -e "${GREEN}✓ Artifact Registry repository created${NC}"
 fi
 
+# Firestoreの複合インデックスの作成（firestore.indexes.json と同じ内容）
+# 通知アウトボックス・通話終了後ジョブのポーラーは status の条件と next_attempt_at の範囲・並び替えで検索するため、
+# インデックスがないと FAILED_PRECONDITION で失敗する
+echo -e "${YELLOW}Checking Firestore composite indexes...${NC}"
+for collection in notification_outbox post_call_jobs; do
+    if gcloud firestore indexes composite list \
+        --format="value(name)" \
+        --filter="name~/collectionGroups/${collection}/" | grep -q .; then
+        echo -e "${GREEN}✓ Firestore index for ${collection} exists${NC}"
+    else
+        echo -e "${YELLOW}Creating Firestore index for ${collection}...${NC}"
+        gcloud firestore indexes composite create \
+            --collection-group="${collection}" \
+            --query-scope=COLLECTION \
+            --field-config=field-path=status,order=ascending \
+            --field-config=field-path=next_attempt_at,order=ascending \
+            --async
+        echo -e "${GREEN}✓ Firestore index for ${collection} requested (building in background)${NC}"
+    fi
+done
+
 # Cloud Buildサービスアカウントに権限付与
 echo -e "${YELLOW}Setting up Cloud Build permissions...${NC}"
 PROJECT_NUMBER=$(gcloud projects describe $PROJECT_ID --format="value(projectNumber)")
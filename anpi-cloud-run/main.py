@@ -62,22 +62,61 @@ curl -X POST "https://taskhandler-hkzk5xnm7q-uc.a.run.app/enqueue-task" \
   }'
 ```
 
+## Retry
+
+発信されなかった場合（発信サービスが `success: false` を返した・発信サービスに接続できなかった）と、
+通話結果が応答なし・話し中・発信失敗（Twilioのステータスコールバック `/call-status`）の場合は、再発信タスクを遅延実行で登録します。
+発信サービスの応答のタイムアウトやHTTPエラーは発信済みの可能性があるため、タスクハンドラーでは再発信せず `/call-status` に任せます
+（二重に電話をかけないため）。
+
+- 最大発信回数・間隔・発信しない時間帯は利用者ごとに設定でき（users.call_retry_* / call_quiet_*）、
+  スケジューラーが `/enqueue-task` の `retry_policy` で渡します。未設定の項目は環境変数のデフォルトを使います。
+
+| 環境変数 | デフォルト | 説明 |
+|---------|-----------|------|
+| `CALL_RETRY_MAX_ATTEMPTS` | `3` | 最大発信回数（初回を含む） |
+| `CALL_RETRY_INTERVAL_MINUTES` | `15` | 最初の再発信までの間隔（分）。以降は失敗ごとに倍 |
+| `CALL_RETRY_MAX_INTERVAL_MINUTES` | `120` | 再発信の間隔の上限（分） |
+| `CALL_RETRY_JITTER_SECONDS` | `120` | 同時刻の失敗が重ならないよう、タスクごとにずらす最大秒数 |
+| `CALL_RETRY_STATUSES` | `busy,no-answer,failed` | 再発信するTwilioの通話結果 |
+| `CALL_QUIET_HOURS_START` / `CALL_QUIET_HOURS_END` | `20:00` / `08:00` | 再発信しない時間帯（再発信予定がこの時間帯に入る場合は再発信しない） |
+| `CALL_TIMEZONE` | `Asia/Tokyo` | 発信しない時間帯のタイムゾーン |
+| `CALL_STATUS_VALIDATE_SIGNATURE` | `true` | `/call-status` でTwilioの署名（X-Twilio-Signature）を検証する |
+
+再発信のタスク名は元のタスクID + `-r{回数}` のため、同じ失敗が重複して通知されても二重に登録されません。
+発信・失敗・再発信の件数は `/metrics` で確認できます（インスタンスごとのカウンター）。
+
+```bash
+curl "https://taskhandler-hkzk5xnm7q-uc.a.run.app/metrics" \
+  -H "Authorization: Bearer $(gcloud auth print-identity-token)"
+```
+
+
 
 """
 
 import asyncio
+import base64
 import json
 import logging
 import os
-from datetime import datetime, timedelta
+import threading
+import zlib
+from collections import Counter
+from datetime import datetime, time, timedelta
 from typing import Optional
+from urllib.parse import parse_qsl, urlencode
+from zoneinfo import ZoneInfo
 
 import httpx
 import uvicorn
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from google.api_core.exceptions import AlreadyExists
 from google.cloud import tasks_v2
 from pydantic import BaseModel
+from twilio.request_validator import RequestValidator
 from twilio.rest import Client
 
 load_dotenv()
@@ -97,19 +136,81 @@ ACCOUNT_SID = os.environ["TWILIO_ACCOUNT_SID"]
 AUTH_TOKEN = os.environ["TWILIO_AUTH_TOKEN"]
 TWILIO_PHONE_NUMBER = os.environ["TWILIO_CALL_NUMBER"]
 
+SERVICE_URL = os.environ.get("SERVICE_URL", "https://taskhandler-hsr7mrfkca-uc.a.run.app")
+OUTBOUND_SERVICE_URL = os.environ.get(
+    "OUTBOUND_SERVICE_URL", "https://speech-assistant-outbound-hkzk5xnm7q-an.a.run.app"
+)
+
+# 再発信ポリシーのデフォルト（利用者ごとの設定はスケジューラーから retry_policy で渡される）
+CALL_RETRY_MAX_ATTEMPTS = int(os.environ.get("CALL_RETRY_MAX_ATTEMPTS", "3"))
+CALL_RETRY_INTERVAL_MINUTES = int(os.environ.get("CALL_RETRY_INTERVAL_MINUTES", "15"))
+CALL_RETRY_MAX_INTERVAL_MINUTES = int(os.environ.get("CALL_RETRY_MAX_INTERVAL_MINUTES", "120"))
+CALL_RETRY_JITTER_SECONDS = int(os.environ.get("CALL_RETRY_JITTER_SECONDS", "120"))
+CALL_RETRY_STATUSES = set(
+    os.environ.get("CALL_RETRY_STATUSES", "busy,no-answer,failed").split(",")
+)
+# タスクハンドラーで再発信する失敗（発信サービスが発信していないことが確実なもの）
+# タイムアウトやHTTPエラーは発信後の可能性があるため、Twilioのステータスコールバックに任せる
+CALL_NOT_PLACED_REASONS = {"outbound_failed", "connect_error"}
+CALL_QUIET_HOURS_START = os.environ.get("CALL_QUIET_HOURS_START", "20:00")
+CALL_QUIET_HOURS_END = os.environ.get("CALL_QUIET_HOURS_END", "08:00")
+CALL_TIMEZONE = ZoneInfo(os.environ.get("CALL_TIMEZONE", "Asia/Tokyo"))
+CALL_STATUS_VALIDATE_SIGNATURE = (
+    os.environ.get("CALL_STATUS_VALIDATE_SIGNATURE", "true").lower() == "true"
+)
+
 # Cloud Tasks クライアント
 tasks_client = tasks_v2.CloudTasksClient()
 
 
+class Metrics:
+    """プロセス内のカウンター（/metrics で参照）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    def increment(self, name: str, **labels) -> None:
+        if labels:
+            name += "{" + ",".join(f"{k}={labels[k]}" for k in sorted(labels)) + "}"
+        with self._lock:
+            self._counters[name] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+
+metrics = Metrics()
+
+
+class RetryPolicy(BaseModel):
+    """利用者ごとの再発信ポリシー（未指定の項目は環境変数のデフォルト）"""
+
+    max_attempts: Optional[int] = None
+    interval_minutes: Optional[int] = None
+    quiet_start: Optional[str] = None  # HH:MM
+    quiet_end: Optional[str] = None  # HH:MM
+
+
 class Message(BaseModel):
     message: Optional[str] = ""
     recipient_phone_number: str
+    user_id: Optional[str] = None
+    task_id: Optional[str] = None
+    # 何回目の発信か（初回 = 1、再発信ごとに増える）
+    attempt: int = 1
+    retry_policy: Optional[RetryPolicy] = None
 
 
 class TaskRequest(BaseModel):
     message: Optional[str] = ""
     delay_seconds: Optional[int] = 0
     recipient_phone_number: str
+    # 指定した場合はタスク名に使用し、同じIDのタスクは二重に登録しない（スケジューラーの発信台帳と対応）
+    task_id: Optional[str] = None
+    user_id: Optional[str] = None
+    retry_policy: Optional[RetryPolicy] = None
 
 
 class TaskResponse(BaseModel):
@@ -118,12 +219,136 @@ class TaskResponse(BaseModel):
     scheduled_time: Optional[str] = None
 
 
+def _parse_hhmm(value: str) -> time:
+    """HH:MM 形式の時刻を time に変換"""
+    hour, minute = value.split(":")[:2]
+    return time(int(hour), int(minute))
+
+
+def in_quiet_hours(at: datetime, quiet_start: time, quiet_end: time) -> bool:
+    """再発信しない時間帯かどうか（開始 > 終了の場合は日付をまたぐ）"""
+    current = at.astimezone(CALL_TIMEZONE).time()
+    if quiet_start == quiet_end:
+        return False
+    if quiet_start < quiet_end:
+        return quiet_start <= current < quiet_end
+    return current >= quiet_start or current < quiet_end
+
+
+def retry_delay_seconds(attempt: int, interval_minutes: int, key: str) -> int:
+    """attempt回目の発信に失敗した後、次の発信までの秒数
+
+    間隔は失敗するごとに倍にし（CALL_RETRY_MAX_INTERVAL_MINUTESで打ち切り）、
+    同じ時刻に失敗した発信が同時に再発信されないよう、タスクごとに決まった秒数ずらす
+    """
+    minutes = min(
+        interval_minutes * 2 ** (attempt - 1),
+        max(interval_minutes, CALL_RETRY_MAX_INTERVAL_MINUTES),
+    )
+    jitter = zlib.crc32(key.encode("utf-8")) % (CALL_RETRY_JITTER_SECONDS + 1)
+    return minutes * 60 + jitter
+
+
+def call_status_callback_url(payload: Message) -> str:
+    """発信結果（Twilioのステータスコールバック）の通知先URL
+
+    再発信の登録に必要なタスクの内容をクエリに含める（署名の検証でURLごと改ざんを検出する）
+    """
+    context = base64.urlsafe_b64encode(
+        payload.model_dump_json(exclude_none=True).encode("utf-8")
+    ).decode("ascii")
+    return f"{SERVICE_URL}/call-status?{urlencode({'context': context})}"
+
+
+def schedule_retry(payload: Message, reason: str) -> dict:
+    """失敗した発信の再発信タスクを遅延実行で登録する
+
+    Args:
+        payload: 失敗した発信のタスク
+        reason: 失敗の理由（outbound_failed / connect_error / busy / no-answer など）
+
+    Returns:
+        dict: retry に scheduled / duplicate / exhausted / quiet_hours / error のいずれか
+    """
+    policy = payload.retry_policy or RetryPolicy()
+    max_attempts = (
+        policy.max_attempts
+        if policy.max_attempts is not None
+        else CALL_RETRY_MAX_ATTEMPTS
+    )
+    # 0分（ずらし分のみで即時に再発信）も利用者ごとの設定として尊重する
+    interval_minutes = (
+        policy.interval_minutes
+        if policy.interval_minutes is not None
+        else CALL_RETRY_INTERVAL_MINUTES
+    )
+    quiet_start = _parse_hhmm(policy.quiet_start or CALL_QUIET_HOURS_START)
+    quiet_end = _parse_hhmm(policy.quiet_end or CALL_QUIET_HOURS_END)
+
+    metrics.increment("calls_failed", reason=reason)
+    if payload.attempt >= max_attempts:
+        metrics.increment("call_retries_exhausted")
+        logger.warning(
+            f"CALL FAILED!! 再発信の上限に達しました: user_id={payload.user_id}, "
+            f"attempt={payload.attempt}/{max_attempts}, reason={reason}"
+        )
+        return {"retry": "exhausted"}
+
+    delay_seconds = retry_delay_seconds(
+        payload.attempt,
+        interval_minutes,
+        payload.task_id or payload.recipient_phone_number,
+    )
+    retry_at = datetime.now(CALL_TIMEZONE) + timedelta(seconds=delay_seconds)
+    if in_quiet_hours(retry_at, quiet_start, quiet_end):
+        metrics.increment("call_retries_suppressed", reason="quiet_hours")
+        logger.warning(
+            f"CALL FAILED!! 再発信予定が発信しない時間帯のため再発信しません: "
+            f"user_id={payload.user_id}, attempt={payload.attempt}, retry_at={retry_at.isoformat()}"
+        )
+        return {"retry": "quiet_hours", "retry_at": retry_at.isoformat()}
+
+    retry = payload.model_copy(update={"attempt": payload.attempt + 1})
+    # 同じ発信の再発信は同じタスク名になるため、失敗の通知が重複しても二重に登録されない
+    task_id = f"{payload.task_id}-r{retry.attempt}" if payload.task_id else None
+    try:
+        response = create_call_task(
+            retry.model_dump(exclude_none=True), delay_seconds, task_id
+        )
+    except Exception as e:
+        metrics.increment("call_retries_enqueue_failed")
+        logger.error(f"Failed to enqueue retry task: {e}")
+        return {"retry": "error", "error": str(e)}
+
+    if response.status == "duplicate":
+        metrics.increment("call_retries_duplicate")
+        return {"retry": "duplicate", "task_name": response.task_name}
+
+    metrics.increment("call_retries_scheduled", attempt=retry.attempt)
+    logger.info(
+        f"Retry scheduled: user_id={payload.user_id}, attempt={retry.attempt}/{max_attempts}, "
+        f"reason={reason}, delay_seconds={delay_seconds}, task={response.task_name}"
+    )
+    return {
+        "retry": "scheduled",
+        "attempt": retry.attempt,
+        "task_name": response.task_name,
+        "scheduled_time": response.scheduled_time,
+    }
+
+
 @app.post("/task-handler")
 async def task_handler(payload: Message):
-    """Cloud Tasksから呼び出されるタスクハンドラー"""
+    """Cloud Tasksから呼び出されるタスクハンドラー
+
+    発信に失敗した場合は再発信タスクを登録する。Cloud Tasks自体の再試行で
+    同じ発信が繰り返されないよう、失敗した場合もステータス200を返す
+    """
     logger.info(
-        f"Processing task to {payload.recipient_phone_number} with message: {payload.message}"
+        f"Processing task to {payload.recipient_phone_number} with message: {payload.message} "
+        f"(attempt {payload.attempt})"
     )
+    metrics.increment("calls_attempted", attempt=payload.attempt)
 
     # try:
     #     # Find your Account SID and Auth Token at twilio.com/console
@@ -149,14 +374,19 @@ async def task_handler(payload: Message):
     #     "processed_at": datetime.utcnow().isoformat(),
     # }
 
+    reason = None
     try:
         # 外部サービスのURL
-        outbound_service_url = (
-            "https://speech-assistant-outbound-hkzk5xnm7q-an.a.run.app/outbound-call"
-        )
+        outbound_service_url = f"{OUTBOUND_SERVICE_URL}/outbound-call"
 
         # POSTで送信するデータ
-        post_data = {"to_number": payload.recipient_phone_number}
+        # 応答なし・話し中などの通話結果は /call-status に通知される
+        post_data = {
+            "to_number": payload.recipient_phone_number,
+            "status_callback_url": call_status_callback_url(payload),
+        }
+        if payload.user_id:
+            post_data["user_id"] = payload.user_id
 
         # 非同期HTTPクライアントを使用してPOSTリクエストを送信
         async with httpx.AsyncClient(timeout=30.0) as client:
@@ -167,28 +397,55 @@ async def task_handler(payload: Message):
             )
             response.raise_for_status()  # HTTPエラーの場合は例外を発生
 
-            # レスポンスをログに記録
-            logger.info(
-                f"Outbound call initiated successfully. Response: {response.text}"
-            )
-            print(f"HTTP Status: {response.status_code}")
-            print(f"Response body: {response.text}")
+            # 発信サービスはTwilioの発信エラーをステータス200（success: false）で返す
+            result = response.json()
+            if result.get("success") is False:
+                logger.error(f"Outbound call failed: {result.get('error')}")
+                reason = "outbound_failed"
+            else:
+                # レスポンスをログに記録
+                logger.info(
+                    f"Outbound call initiated successfully. Response: {response.text}"
+                )
+
+    except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+        # 接続できずリクエストを送っていないため、発信されていない
+        logger.error(f"Connection error occurred: {e}")
+        reason = "connect_error"
 
     except httpx.RequestError as e:
         logger.error(f"Network error occurred: {e}")
-        logger.warning("CALL FAILED!!")
-        # 必要に応じてリトライロジックやエラーハンドリングを追加
+        reason = "network_error"
 
     except httpx.HTTPStatusError as e:
         logger.error(
             f"HTTP error occurred: {e.response.status_code} - {e.response.text}"
         )
-        logger.warning("CALL FAILED!!")
+        reason = "http_error"
 
     except Exception as e:
         logger.error(f"Unexpected error occurred: {e}")
+        reason = "unexpected_error"
+
+    if reason is not None:
         logger.warning("CALL FAILED!!")
+        result = {
+            "status": "failed",
+            "reason": reason,
+            "processed_at": datetime.utcnow().isoformat(),
+        }
+        if reason in CALL_NOT_PLACED_REASONS:
+            result.update(await run_in_threadpool(schedule_retry, payload, reason))
+        else:
+            # 発信サービスが発信した後に失敗した可能性がある（タイムアウトなど）ため、ここでは再発信しない
+            # 発信されていれば、Twilioのステータスコールバック（/call-status）で再発信を判定する
+            metrics.increment("call_retry_skipped", reason=reason)
+            logger.warning(
+                f"Not retrying: the call may already have been placed (reason={reason})"
+            )
+        return result
 
+    metrics.increment("calls_started")
     logger.info(f"Task completed successfully: {payload.message}")
 
     return {
@@ -198,62 +455,129 @@ async def task_handler(payload: Message):
     }
 
 
-@app.post("/enqueue-task", response_model=TaskResponse)
-async def enqueue_task(task_request: TaskRequest):
-    """新しいタスクをCloud Tasksキューに追加"""
+@app.post("/call-status")
+async def call_status(request: Request):
+    """Twilioのステータスコールバック（通話終了時）
+
+    応答なし・話し中・発信失敗（CALL_RETRY_STATUSES）の場合は再発信タスクを登録する
+    """
+    # Twilioはフォーム形式で送信する
+    body = (await request.body()).decode("utf-8")
+    params = dict(parse_qsl(body, keep_blank_values=True))
+
+    if CALL_STATUS_VALIDATE_SIGNATURE:
+        url = f"{SERVICE_URL}{request.url.path}?{request.url.query}"
+        signature = request.headers.get("X-Twilio-Signature", "")
+        if not RequestValidator(AUTH_TOKEN).validate(url, params, signature):
+            logger.warning(f"Invalid Twilio signature: {params.get('CallSid')}")
+            raise HTTPException(status_code=403, detail="Invalid signature")
+
     try:
-        # キューのパスを構築
-        queue_path = tasks_client.queue_path(PROJECT_ID, LOCATION, QUEUE_NAME)
+        payload = Message.model_validate_json(
+            base64.urlsafe_b64decode(request.query_params["context"])
+        )
+    except (KeyError, ValueError) as e:
+        logger.error(f"Invalid call status context: {e}")
+        raise HTTPException(status_code=400, detail="Invalid context")
+
+    status = params.get("CallStatus", "")
+    metrics.increment("call_outcomes", status=status)
+    logger.info(
+        f"Call status: {params.get('CallSid')} {status} "
+        f"(user_id={payload.user_id}, attempt={payload.attempt})"
+    )
+    if status not in CALL_RETRY_STATUSES:
+        return {"status": status}
+
+    logger.warning("CALL FAILED!!")
+    return {"status": status, **(await run_in_threadpool(schedule_retry, payload, status))}
+
+
+def create_call_task(
+    payload: dict, delay_seconds: int = 0, task_id: Optional[str] = None
+) -> TaskResponse:
+    """発信タスクをCloud Tasksキューに追加
+
+    Args:
+        payload: /task-handler に送る内容（Message）
+        delay_seconds: 遅延時間（秒）
+        task_id: タスク名（同じ名前のタスクは二重に登録しない）
+    """
+    # キューのパスを構築
+    queue_path = tasks_client.queue_path(PROJECT_ID, LOCATION, QUEUE_NAME)
+
+    # Cloud Runサービスのエンドポイント
+    task_url = f"{SERVICE_URL}/task-handler"
+
+    json_payload = json.dumps(payload).encode("utf-8")
+
+    # HTTPリクエストを構築
+    http_request = tasks_v2.HttpRequest(
+        http_method=tasks_v2.HttpMethod.POST,
+        url=task_url,
+        headers={
+            "Content-Type": "application/json",
+        },
+        oidc_token=tasks_v2.OidcToken(
+            service_account_email="cloud-tasks-invoker@univac-aiagent.iam.gserviceaccount.com",
+        ),
+        body=json_payload,
+    )
 
-        # Cloud Runサービスのエンドポイント
-        current_url = os.environ.get(
-            "SERVICE_URL", "https://taskhandler-hsr7mrfkca-uc.a.run.app"
+    # タスクを構築
+    task = tasks_v2.Task(http_request=http_request)
+    if task_id:
+        # 名前付きタスクはCloud Tasks側で重複が拒否される（実行・削除後もしばらく同じ名前は使えない）
+        task.name = tasks_client.task_path(PROJECT_ID, LOCATION, QUEUE_NAME, task_id)
+
+    # 遅延実行の場合はスケジュール時間を設定
+    scheduled_time = None
+    if delay_seconds > 0:
+        from google.protobuf import timestamp_pb2
+
+        schedule_time = datetime.utcnow() + timedelta(seconds=delay_seconds)
+        timestamp = timestamp_pb2.Timestamp()
+        timestamp.FromDatetime(schedule_time)
+        task.schedule_time = timestamp
+        scheduled_time = schedule_time.isoformat()
+
+    # タスクを作成
+    try:
+        response = tasks_client.create_task(parent=queue_path, task=task)
+    except AlreadyExists:
+        logger.info(f"Task already exists, skipped: {task.name}")
+        return TaskResponse(
+            task_name=task.name, status="duplicate", scheduled_time=scheduled_time
         )
-        task_url = f"{current_url}/task-handler"
 
+    logger.info(f"Task created: {response.name}")
+
+    return TaskResponse(
+        task_name=response.name, status="enqueued", scheduled_time=scheduled_time
+    )
+
+
+@app.post("/enqueue-task", response_model=TaskResponse)
+async def enqueue_task(task_request: TaskRequest):
+    """新しいタスクをCloud Tasksキューに追加"""
+    try:
         # ペイロードを準備
         payload = {
             "message": task_request.message,
             "recipient_phone_number": task_request.recipient_phone_number,
         }
-        json_payload = json.dumps(payload).encode("utf-8")
-
-        # HTTPリクエストを構築
-        http_request = tasks_v2.HttpRequest(
-            http_method=tasks_v2.HttpMethod.POST,
-            url=task_url,
-            headers={
-                "Content-Type": "application/json",
-            },
-            oidc_token=tasks_v2.OidcToken(
-                service_account_email="cloud-tasks-invoker@univac-aiagent.iam.gserviceaccount.com",
-            ),
-            body=json_payload,
-        )
-
-        # タスクを構築
-        task = tasks_v2.Task(http_request=http_request)
-
-        # 遅延実行の場合はスケジュール時間を設定
-        scheduled_time = None
-        if task_request.delay_seconds > 0:
-            from google.protobuf import timestamp_pb2
-
-            schedule_time = datetime.utcnow() + timedelta(
-                seconds=task_request.delay_seconds
+        if task_request.user_id:
+            payload["user_id"] = task_request.user_id
+        if task_request.task_id:
+            # 再発信のタスク名は元のタスクIDから決める
+            payload["task_id"] = task_request.task_id
+        if task_request.retry_policy:
+            payload["retry_policy"] = task_request.retry_policy.model_dump(
+                exclude_none=True
             )
-            timestamp = timestamp_pb2.Timestamp()
-            timestamp.FromDatetime(schedule_time)
-            task.schedule_time = timestamp
-            scheduled_time = schedule_time.isoformat()
 
-        # タスクを作成
-        response = tasks_client.create_task(parent=queue_path, task=task)
-
-        logger.info(f"≈: {response.name}")
-
-        return TaskResponse(
-            task_name=response.name, status="enqueued", scheduled_time=scheduled_time
+        return create_call_task(
+            payload, task_request.delay_seconds or 0, task_request.task_id
         )
 
     except Exception as e:
@@ -292,10 +616,18 @@ async def root():
             "task_handler": "/task-handler",
             "enqueue_task": "/enqueue-task",
             "batch_enqueue": "/batch-enqueue",
+            "call_status": "/call-status",
+            "metrics": "/metrics",
         },
     }
 
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """発信・再発信のカウンター（プロセス内、インスタンスごと）"""
+    return metrics.snapshot()
+
+
 @app.get("/health")
 async def health_check():
     """ヘルスチェックエンドポイント"""